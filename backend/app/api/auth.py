@@ -29,6 +29,10 @@ class TokenResponse(BaseModel):
 
 async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
     """Get current user from token"""
+    return load_user_from_token(token, db)
+
+def load_user_from_token(token: str, db: Session):
+    """Resolve a bearer token to the minimal current-user record"""
     payload = decode_access_token(token)
     if not payload:
         raise HTTPException(status_code=401, detail="Invalid authentication")
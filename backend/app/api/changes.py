@@ -1,13 +1,17 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from uuid import UUID
-from datetime import datetime
+from datetime import datetime, timedelta
 from pydantic import BaseModel
+from sqlalchemy import func
 
 from ..models.base import get_db
 from ..models.change import Change
+from ..models.company import Company
 from ..models.user import User
+from ..core.cache import cached_response
+from ..services.exporter import apply_change_filters
 from .auth import get_current_user
 
 router = APIRouter()
@@ -20,6 +24,9 @@ class ChangeSummary(BaseModel):
     significance_score: int
     category: str
     summary: str
+    region: Optional[str] = None
+    page_url: Optional[str] = None  # Crawled subpage (multi-page mode); None for the company's own URL
+    cluster_id: Optional[UUID] = None  # Group of similar changes across competitors
 
 class ChangeDetail(ChangeSummary):
     analysis: str
@@ -27,8 +34,22 @@ class ChangeDetail(ChangeSummary):
     old_snapshot_id: UUID
     new_snapshot_id: UUID
 
+class RelatedChange(ChangeSummary):
+    similarity: float
+
+class ChangeCluster(BaseModel):
+    cluster_id: UUID
+    size: int
+    company_count: int
+    first_detected: datetime
+    last_detected: datetime
+    max_significance: int
+    category: str  # The leader's
+    summary: str  # The leader's
+
 @router.get("", response_model=List[ChangeSummary])
 async def list_changes(
+    request: Request,
     company_id: Optional[UUID] = None,
     min_significance: int = Query(0, ge=0, le=100),
     from_date: Optional[datetime] = None,
@@ -40,71 +61,176 @@ async def list_changes(
     current_user: User = Depends(get_current_user)
 ):
     """List changes with filters"""
-    query = db.query(Change).join(Change.company).filter(
-        Change.company.has(user_id=current_user.id)
-    )
-    
-    # Apply filters
-    if company_id:
-        query = query.filter(Change.company_id == company_id)
-    
-    if min_significance > 0:
-        query = query.filter(Change.significance_score >= min_significance)
-    
-    if from_date:
-        query = query.filter(Change.detected_at >= from_date)
+    def build():
+        query = db.query(Change).join(Change.company).filter(
+            Change.company.has(user_id=current_user.id)
+        )
+        
+        # Apply filters
+        query = apply_change_filters(query, company_id, min_significance, from_date, to_date, category)
+        
+        # Order and paginate
+        changes = query.order_by(Change.detected_at.desc())\
+                       .offset(offset)\
+                       .limit(limit)\
+                       .all()
+        
+        return [
+            ChangeSummary(
+                id=c.id,
+                company_id=c.company_id,
+                company_name=c.company.name,
+                detected_at=c.detected_at,
+                significance_score=c.significance_score or 0,
+                category=c.category or "unknown",
+                summary=c.summary or "Changes detected",
+                region=c.region,
+                page_url=c.page_url,
+                cluster_id=c.cluster_id
+            )
+            for c in changes
+        ]
     
-    if to_date:
-        query = query.filter(Change.detected_at <= to_date)
+    return cached_response(request, current_user.id, "changes", build, params={
+        "company_id": company_id, "min_significance": min_significance, "from_date": from_date,
+        "to_date": to_date, "category": category, "limit": limit, "offset": offset
+    })
+
+@router.get("/clusters", response_model=List[ChangeCluster])
+async def list_clusters(
+    request: Request,
+    days: int = Query(30, ge=1, le=365),
+    min_size: int = Query(2, ge=1),
+    limit: int = Query(20, le=100),
+    offset: int = 0,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Groups of similar changes across competitors, most recently active first"""
+    def build():
+        since = datetime.utcnow() - timedelta(days=days)
+        clusters = db.query(
+            Change.cluster_id,
+            func.count(Change.id).label("size"),
+            func.count(func.distinct(Change.company_id)).label("company_count"),
+            func.min(Change.detected_at).label("first_detected"),
+            func.max(Change.detected_at).label("last_detected"),
+            func.max(Change.significance_score).label("max_significance")
+        )\
+            .join(Company, Company.id == Change.company_id)\
+            .filter(Company.user_id == current_user.id,
+                    Change.cluster_id.isnot(None),
+                    Change.detected_at >= since)\
+            .group_by(Change.cluster_id)\
+            .having(func.count(Change.id) >= min_size)\
+            .order_by(func.max(Change.detected_at).desc())\
+            .offset(offset)\
+            .limit(limit)\
+            .all()
+        
+        leaders = {
+            leader_id: (category, summary)
+            for leader_id, category, summary in db.query(Change.id, Change.category, Change.summary)
+            .filter(Change.id.in_([c.cluster_id for c in clusters]))
+        }
+        return [
+            ChangeCluster(
+                cluster_id=c.cluster_id,
+                size=c.size,
+                company_count=c.company_count,
+                first_detected=c.first_detected,
+                last_detected=c.last_detected,
+                max_significance=c.max_significance or 0,
+                category=leaders.get(c.cluster_id, (None, None))[0] or "unknown",
+                summary=leaders.get(c.cluster_id, (None, None))[1] or "Changes detected"
+            )
+            for c in clusters
+        ]
     
-    if category:
-        query = query.filter(Change.category == category)
+    return cached_response(request, current_user.id, "change-clusters", build, params={
+        "days": days, "min_size": min_size, "limit": limit, "offset": offset
+    })
+
+@router.get("/{change_id}/related", response_model=List[RelatedChange])
+async def related_changes(
+    request: Request,
+    change_id: UUID,
+    limit: int = Query(10, ge=1, le=50),
+    min_similarity: float = Query(0.5, ge=0, le=1),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Recent changes (any competitor) most similar to this one"""
+    from ..services.change_grouping import related_changes as find_related  # numpy; loaded on first use
     
-    # Order and paginate
-    changes = query.order_by(Change.detected_at.desc())\
-                   .offset(offset)\
-                   .limit(limit)\
-                   .all()
+    def build():
+        change = db.query(Change).filter(Change.id == change_id).first()
+        
+        if not change:
+            raise HTTPException(status_code=404, detail="Change not found")
+        
+        # Verify access
+        if str(change.company.user_id) != str(current_user.id):
+            raise HTTPException(status_code=403, detail="Access denied")
+        
+        similar = find_related(db, change, current_user.id, limit, min_similarity)
+        scores = {change_id: score for change_id, score in similar}
+        related = db.query(Change).filter(Change.id.in_(list(scores))).all()
+        related.sort(key=lambda c: scores[str(c.id)], reverse=True)
+        return [
+            RelatedChange(
+                id=c.id,
+                company_id=c.company_id,
+                company_name=c.company.name,
+                detected_at=c.detected_at,
+                significance_score=c.significance_score or 0,
+                category=c.category or "unknown",
+                summary=c.summary or "Changes detected",
+                region=c.region,
+                page_url=c.page_url,
+                cluster_id=c.cluster_id,
+                similarity=round(scores[str(c.id)], 4)
+            )
+            for c in related
+        ]
     
-    return [
-        ChangeSummary(
-            id=c.id,
-            company_id=c.company_id,
-            company_name=c.company.name,
-            detected_at=c.detected_at,
-            significance_score=c.significance_score or 0,
-            category=c.category or "unknown",
-            summary=c.summary or "Changes detected"
-        )
-        for c in changes
-    ]
+    return cached_response(request, current_user.id, "related-changes", build, params={
+        "change_id": change_id, "limit": limit, "min_similarity": min_similarity
+    })
 
 @router.get("/{change_id}", response_model=ChangeDetail)
 async def get_change(
+    request: Request,
     change_id: UUID,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """Get detailed change information"""
-    change = db.query(Change).filter(Change.id == change_id).first()
-    
-    if not change:
-        raise HTTPException(status_code=404, detail="Change not found")
-    
-    # Verify access
-    if change.company.user_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Access denied")
+    def build():
+        change = db.query(Change).filter(Change.id == change_id).first()
+        
+        if not change:
+            raise HTTPException(status_code=404, detail="Change not found")
+        
+        # Verify access
+        if str(change.company.user_id) != str(current_user.id):
+            raise HTTPException(status_code=403, detail="Access denied")
+        
+        return ChangeDetail(
+            id=change.id,
+            company_id=change.company_id,
+            company_name=change.company.name,
+            detected_at=change.detected_at,
+            significance_score=change.significance_score or 0,
+            category=change.category or "unknown",
+            summary=change.summary or "Changes detected",
+            region=change.region,
+            page_url=change.page_url,
+            cluster_id=change.cluster_id,
+            analysis=change.analysis or "{}",
+            change_data=change.change_data or {},
+            old_snapshot_id=change.old_snapshot_id,
+            new_snapshot_id=change.new_snapshot_id
+        )
     
-    return ChangeDetail(
-        id=change.id,
-        company_id=change.company_id,
-        company_name=change.company.name,
-        detected_at=change.detected_at,
-        significance_score=change.significance_score or 0,
-        category=change.category or "unknown",
-        summary=change.summary or "Changes detected",
-        analysis=change.analysis or "{}",
-        change_data=change.change_data or {},
-        old_snapshot_id=change.old_snapshot_id,
-        new_snapshot_id=change.new_snapshot_id
-    )
\ No newline at end of file
+    return cached_response(request, current_user.id, f"change:{change_id}", build)
\ No newline at end of file
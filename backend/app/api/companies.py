@@ -1,15 +1,23 @@
-from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks
+from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks, Query, Request
 from sqlalchemy.orm import Session
-from typing import List, Optional
+from typing import Dict, List, Optional
 from uuid import UUID
 from datetime import datetime, timedelta
-from pydantic import BaseModel, HttpUrl
+import uuid
+from pydantic import BaseModel, HttpUrl, ValidationError, field_validator
 
 from ..models.base import get_db
 from ..models.company import Company
+from ..models.snapshot import Snapshot
+from ..models.crawl_page import CrawlPage
 from ..models.user import User
+from ..core.config import settings
+from ..services.company_import import parse_import_rows, default_name
+from ..services.differ import get_snapshot_diff
+from ..services.watch_regions import normalize_watch_regions
 from .auth import oauth2_scheme, get_current_user
-from ..tasks.scrape_tasks import scrape_company
+from ..core.cache import cached_response, invalidate_user_cache
+from ..tasks.client import enqueue_discovery, enqueue_scan
 
 router = APIRouter()
 
@@ -20,6 +28,14 @@ class CompanyCreate(BaseModel):
     notes: Optional[str] = None
     scan_frequency: str = "daily"
     alert_threshold: int = 50
+    scrape_config: Optional[Dict] = None
+    
+    @field_validator("scrape_config")
+    @classmethod
+    def check_watch_regions(cls, scrape_config: Optional[Dict]) -> Optional[Dict]:
+        if scrape_config and "watch_regions" in scrape_config:
+            scrape_config = {**scrape_config, "watch_regions": normalize_watch_regions(scrape_config["watch_regions"])}
+        return scrape_config
 
 class CompanyResponse(BaseModel):
     id: UUID
@@ -36,6 +52,63 @@ class CompanyDetailResponse(CompanyResponse):
     total_changes: int = 0
     last_change: Optional[datetime]
 
+class SnapshotSummary(BaseModel):
+    id: UUID
+    timestamp: datetime
+    title: Optional[str]
+    page_url: Optional[str] = None  # Crawled subpage; None for the company's own URL
+
+class CrawlPageSummary(BaseModel):
+    id: UUID
+    url: str
+    source: Optional[str]
+    depth: Optional[int]
+    priority: Optional[float]
+    status: str
+    sitemap_lastmod: Optional[datetime]
+    last_scanned: Optional[datetime]
+    last_changed: Optional[datetime]
+    next_scan: Optional[datetime]
+
+class DiffHunk(BaseModel):
+    old_start: int
+    old_lines: int
+    new_start: int
+    new_lines: int
+    lines: List[Dict[str, str]]
+
+class DiffStats(BaseModel):
+    old_lines: int
+    new_lines: int
+    added: int
+    removed: int
+    hunks: int
+    similarity: float
+
+class SnapshotDiffResponse(BaseModel):
+    old_snapshot: SnapshotSummary
+    new_snapshot: SnapshotSummary
+    stats: DiffStats
+    page: int
+    page_size: int
+    total_hunks: int
+    hunks: List[DiffHunk]
+
+class ImportRowResult(BaseModel):
+    row: int
+    url: Optional[str]
+    status: str  # created, duplicate, invalid
+    company_id: Optional[UUID] = None
+    next_scan: Optional[datetime] = None
+    error: Optional[str] = None
+
+class ImportReport(BaseModel):
+    total: int
+    created: int
+    duplicates: int
+    invalid: int
+    results: List[ImportRowResult]
+
 @router.post("", response_model=CompanyResponse)
 async def create_company(
     company_data: CompanyCreate,
@@ -63,43 +136,203 @@ async def create_company(
         notes=company_data.notes,
         scan_frequency=company_data.scan_frequency,
         alert_threshold=company_data.alert_threshold,
+        scrape_config=company_data.scrape_config or {},
         next_scan=datetime.utcnow()  # Scan immediately
     )
     
     db.add(company)
     db.commit()
     db.refresh(company)
+    invalidate_user_cache(current_user.id)
     
     # Trigger initial scrape in background
     background_tasks.add_task(
-        scrape_company.delay,
+        enqueue_scan,
         str(company.id),
-        str(company_data.url)
+        str(company_data.url),
+        user_id=str(current_user.id),
+        plan=current_user.plan
     )
     
     return company
 
+@router.post("/import", response_model=ImportReport)
+async def import_companies(
+    request: Request,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Bulk-add companies from a CSV or JSON upload
+    
+    Accepts a multipart `file` field or a raw `text/csv` / `application/json`
+    body. Duplicates (within the upload or already tracked) are detected with
+    one set-based query and new rows are written with a single bulk insert.
+    Initial scans are not queued here: each company gets a staggered
+    `next_scan` and the scheduler picks them up IMPORT_SCANS_PER_MINUTE at a
+    time.
+    """
+    content_type = request.headers.get("content-type", "")
+    if content_type.startswith("multipart/form-data"):
+        form = await request.form()
+        upload = form.get("file")
+        if upload is None or isinstance(upload, str):
+            raise HTTPException(status_code=400, detail="Missing 'file' upload")
+        raw = await upload.read()
+        is_json = (upload.filename or "").lower().endswith(".json") or "json" in (upload.content_type or "")
+    else:
+        raw = await request.body()
+        is_json = "json" in content_type
+    
+    try:
+        rows = parse_import_rows(raw, "json" if is_json else "csv")
+    except (ValueError, UnicodeDecodeError) as e:
+        raise HTTPException(status_code=400, detail=f"Could not parse upload: {e}")
+    if len(rows) > settings.IMPORT_MAX_ROWS:
+        raise HTTPException(status_code=400, detail=f"At most {settings.IMPORT_MAX_ROWS} rows per import")
+    
+    # Validate every row before touching the database
+    results = []
+    valid = []  # (result index, CompanyCreate)
+    for index, row in enumerate(rows, start=1):
+        url = row.get("url")
+        if url and "://" not in url:
+            url = f"https://{url}"
+        try:
+            data = CompanyCreate(**{**row, "url": url, "name": row.get("name") or default_name(url or "")})
+        except (ValidationError, TypeError) as e:
+            error = e.errors()[0]["msg"] if isinstance(e, ValidationError) else str(e)
+            results.append(ImportRowResult(row=index, url=row.get("url"), status="invalid", error=error))
+            continue
+        results.append(ImportRowResult(row=index, url=str(data.url), status="created"))
+        valid.append((len(results) - 1, data))
+    
+    # One set-based duplicate check against what the user already tracks
+    urls = {str(data.url) for _, data in valid}
+    existing = set()
+    url_list = list(urls)
+    for i in range(0, len(url_list), 1000):
+        existing.update(url for (url,) in db.query(Company.url).filter(
+            Company.user_id == current_user.id,
+            Company.url.in_(url_list[i:i + 1000])
+        ))
+    
+    now = datetime.utcnow()
+    seen = set()
+    mappings = []
+    for result_index, data in valid:
+        url = str(data.url)
+        result = results[result_index]
+        if url in existing or url in seen:
+            result.status = "duplicate"
+            result.error = "Already tracking this company" if url in existing else "Repeated in upload"
+            continue
+        seen.add(url)
+        
+        # Spread initial scans instead of queueing them all now
+        next_scan = now + timedelta(minutes=len(mappings) / max(settings.IMPORT_SCANS_PER_MINUTE, 1))
+        company_id = uuid.uuid4()
+        mappings.append({
+            "id": company_id,
+            "user_id": current_user.id,
+            "name": data.name,
+            "url": url,
+            "industry": data.industry,
+            "notes": data.notes,
+            "scan_frequency": data.scan_frequency,
+            "alert_threshold": data.alert_threshold,
+            "scrape_config": data.scrape_config or {},
+            "content_history": [],
+            "status": "active",
+            "next_scan": next_scan,
+            "created_at": now,
+            "updated_at": now,
+        })
+        result.company_id = company_id
+        result.next_scan = next_scan
+    
+    if mappings:
+        db.bulk_insert_mappings(Company, mappings)
+        db.commit()
+        invalidate_user_cache(current_user.id)
+    
+    statuses = [r.status for r in results]
+    return ImportReport(
+        total=len(results),
+        created=statuses.count("created"),
+        duplicates=statuses.count("duplicate"),
+        invalid=statuses.count("invalid"),
+        results=results
+    )
+
 @router.get("", response_model=List[CompanyResponse])
 async def list_companies(
+    request: Request,
     skip: int = 0,
     limit: int = 50,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """List all tracked companies"""
-    companies = db.query(Company).filter(
-        Company.user_id == current_user.id
-    ).offset(skip).limit(limit).all()
+    def build():
+        companies = db.query(Company).filter(
+            Company.user_id == current_user.id
+        ).offset(skip).limit(limit).all()
+        return [CompanyResponse.model_validate(c, from_attributes=True) for c in companies]
     
-    return companies
+    return cached_response(request, current_user.id, "companies", build, params={"skip": skip, "limit": limit})
 
 @router.get("/{company_id}", response_model=CompanyDetailResponse)
 async def get_company(
+    request: Request,
     company_id: UUID,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """Get detailed company information"""
+    def build():
+        company = db.query(Company).filter(
+            Company.id == company_id,
+            Company.user_id == current_user.id
+        ).first()
+        
+        if not company:
+            raise HTTPException(status_code=404, detail="Company not found")
+        
+        # Get change count
+        change_count = len(company.changes) if company.changes else 0
+        
+        # Get last change
+        last_change = None
+        if company.changes:
+            last_change = max(c.detected_at for c in company.changes)
+        
+        # Convert to response
+        response = CompanyDetailResponse(
+            id=company.id,
+            name=company.name,
+            url=company.url,
+            industry=company.industry,
+            notes=company.notes,
+            status=company.status,
+            last_scanned=company.last_scanned,
+            next_scan=company.next_scan,
+            created_at=company.created_at,
+            total_changes=change_count,
+            last_change=last_change
+        )
+        
+        return response
+    
+    return cached_response(request, current_user.id, f"company:{company_id}", build)
+
+@router.delete("/{company_id}")
+async def delete_company(
+    company_id: UUID,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Stop tracking a company"""
     company = db.query(Company).filter(
         Company.id == company_id,
         Company.user_id == current_user.id
@@ -108,38 +341,24 @@ async def get_company(
     if not company:
         raise HTTPException(status_code=404, detail="Company not found")
     
-    # Get change count
-    change_count = len(company.changes) if company.changes else 0
-    
-    # Get last change
-    last_change = None
-    if company.changes:
-        last_change = max(c.detected_at for c in company.changes)
-    
-    # Convert to response
-    response = CompanyDetailResponse(
-        id=company.id,
-        name=company.name,
-        url=company.url,
-        industry=company.industry,
-        notes=company.notes,
-        status=company.status,
-        last_scanned=company.last_scanned,
-        next_scan=company.next_scan,
-        created_at=company.created_at,
-        total_changes=change_count,
-        last_change=last_change
-    )
+    db.delete(company)
+    db.commit()
+    invalidate_user_cache(current_user.id)
     
-    return response
+    return {"message": "Company deleted successfully"}
 
-@router.delete("/{company_id}")
-async def delete_company(
+@router.post("/{company_id}/scan")
+def trigger_scan(
     company_id: UUID,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    """Stop tracking a company"""
+    """
+    Manually trigger a scan
+    
+    A plain `def` so FastAPI runs it in the threadpool: the lease check
+    and the Celery publish block on Redis.
+    """
     company = db.query(Company).filter(
         Company.id == company_id,
         Company.user_id == current_user.id
@@ -148,19 +367,47 @@ async def delete_company(
     if not company:
         raise HTTPException(status_code=404, detail="Company not found")
     
-    db.delete(company)
-    db.commit()
+    # Collapse into the running scan rather than queueing a duplicate
+    if not enqueue_scan(str(company.id), company.url, user_id=str(current_user.id),
+                        plan=current_user.plan, manual=True):
+        return {"message": "Scan already in progress or queued"}
     
-    return {"message": "Company deleted successfully"}
+    return {"message": "Scan triggered successfully"}
 
-@router.post("/{company_id}/scan")
-async def trigger_scan(
+@router.get("/{company_id}/pages", response_model=List[CrawlPageSummary])
+async def list_pages(
+    company_id: UUID,
+    status: Optional[str] = Query(None, pattern="^(active|excluded|gone)$"),
+    limit: int = Query(100, le=1000),
+    offset: int = 0,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """List a company's crawl frontier (multi-page mode), best-ranked first"""
+    company = db.query(Company.id).filter(
+        Company.id == company_id,
+        Company.user_id == current_user.id
+    ).first()
+    
+    if not company:
+        raise HTTPException(status_code=404, detail="Company not found")
+    
+    query = db.query(CrawlPage).filter(CrawlPage.company_id == company_id)
+    if status:
+        query = query.filter(CrawlPage.status == status)
+    pages = query.order_by(CrawlPage.priority.desc(), CrawlPage.url)\
+        .offset(offset)\
+        .limit(limit)\
+        .all()
+    return [CrawlPageSummary.model_validate(p, from_attributes=True) for p in pages]
+
+@router.post("/{company_id}/pages/discover")
+async def discover_pages(
     company_id: UUID,
-    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    """Manually trigger a scan"""
+    """Refresh the crawl frontier now rather than at the next scheduled discovery"""
     company = db.query(Company).filter(
         Company.id == company_id,
         Company.user_id == current_user.id
@@ -168,11 +415,96 @@ async def trigger_scan(
     
     if not company:
         raise HTTPException(status_code=404, detail="Company not found")
+    if not (company.scrape_config or {}).get("multi_page"):
+        raise HTTPException(status_code=400, detail="Multi-page mode is off; set scrape_config.multi_page")
     
-    background_tasks.add_task(
-        scrape_company.delay,
-        str(company.id),
-        company.url
-    )
+    enqueue_discovery(str(company.id))
+    return {"message": "Page discovery queued"}
+
+@router.get("/{company_id}/snapshots", response_model=List[SnapshotSummary])
+async def list_snapshots(
+    company_id: UUID,
+    page_url: Optional[str] = None,
+    limit: int = Query(50, le=500),
+    offset: int = 0,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    List a company's snapshots, newest first (pick any two to diff)
+    
+    Defaults to the company's own URL; pass `page_url` for a crawled subpage.
+    """
+    company = db.query(Company.id).filter(
+        Company.id == company_id,
+        Company.user_id == current_user.id
+    ).first()
+    
+    if not company:
+        raise HTTPException(status_code=404, detail="Company not found")
+    
+    return db.query(Snapshot.id, Snapshot.timestamp, Snapshot.title, Snapshot.page_url)\
+        .filter(Snapshot.company_id == company_id,
+                Snapshot.page_url == page_url if page_url else Snapshot.page_url.is_(None))\
+        .order_by(Snapshot.timestamp.desc())\
+        .offset(offset)\
+        .limit(limit)\
+        .all()
+
+@router.get("/{company_id}/diff", response_model=SnapshotDiffResponse)
+def diff_snapshots(
+    company_id: UUID,
+    from_snapshot: UUID,
+    to_snapshot: Optional[UUID] = None,
+    context: int = Query(3, ge=0, le=20),
+    page: int = Query(1, ge=1),
+    page_size: int = Query(20, ge=1),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Diff any two snapshots of a company, paginated by hunk
+    
+    `to_snapshot` defaults to the latest snapshot of the same page. Results are cached per
+    snapshot pair, so paging through a diff computes it once. A plain `def` so FastAPI
+    runs it in the threadpool: on a cache miss the text load and line diff block.
+    """
+    company = db.query(Company.id).filter(
+        Company.id == company_id,
+        Company.user_id == current_user.id
+    ).first()
+    
+    if not company:
+        raise HTTPException(status_code=404, detail="Company not found")
+    
+    page_size = min(page_size, settings.DIFF_MAX_PAGE_SIZE)
+    snapshots = db.query(Snapshot.id, Snapshot.timestamp, Snapshot.title, Snapshot.page_url)\
+        .filter(Snapshot.company_id == company_id)
+    old = snapshots.filter(Snapshot.id == from_snapshot).first()
+    if to_snapshot:
+        new = snapshots.filter(Snapshot.id == to_snapshot).first()
+    elif old:
+        same_page = Snapshot.page_url == old.page_url if old.page_url else Snapshot.page_url.is_(None)
+        new = snapshots.filter(same_page).order_by(Snapshot.timestamp.desc()).first()
+    else:
+        new = None
+    
+    if not old or not new:
+        raise HTTPException(status_code=404, detail="Snapshot not found")
+    
+    def load_texts():
+        texts = dict(db.query(Snapshot.id, Snapshot.text_content).filter(Snapshot.id.in_([old.id, new.id])))
+        return texts.get(old.id) or "", texts.get(new.id) or ""
+    
+    diff = get_snapshot_diff(str(old.id), str(new.id), load_texts, context)
+    start = (page - 1) * page_size
     
-    return {"message": "Scan triggered successfully"}
\ No newline at end of file
+    return {
+        "old_snapshot": old,
+        "new_snapshot": new,
+        "stats": diff["stats"],
+        "page": page,
+        "page_size": page_size,
+        "total_hunks": len(diff["hunks"]),
+        "hunks": diff["hunks"][start:start + page_size]
+    }
\ No newline at end of file
@@ -0,0 +1,95 @@
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+from fastapi import APIRouter, Depends, Request
+from pydantic import BaseModel
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from ..models.base import get_db
+from ..core.cache import cached_response
+from ..models.company import Company
+from ..models.dashboard_stat import DashboardStat
+from .auth import get_current_user
+
+router = APIRouter()
+
+# Counters are per day, so windows are whole calendar days, today included
+WINDOWS = {"last_2d": 2, "last_7d": 7, "last_30d": 30}
+
+class ScanHealth(BaseModel):
+    active: int
+    error: int
+    overdue: int
+    by_status: Dict[str, int]
+    last_scanned: Optional[datetime]
+
+class DashboardSummary(BaseModel):
+    tracked_companies: int
+    changes_by_window: Dict[str, int]
+    total_changes: int
+    by_category: Dict[str, int]
+    by_band: Dict[str, int]
+    scan_health: ScanHealth
+
+@router.get("/summary", response_model=DashboardSummary)
+async def get_dashboard_summary(
+    request: Request,
+    db: Session = Depends(get_db),
+    current_user = Depends(get_current_user)
+):
+    """
+    Aggregated dashboard numbers for the current user
+    
+    Change counts come from the pre-aggregated `dashboard_stats` counters;
+    the `changes` table is never scanned.
+    """
+    def build():
+        rows = db.query(DashboardStat.day, DashboardStat.category, DashboardStat.band,
+                        func.sum(DashboardStat.count))\
+            .filter(DashboardStat.user_id == current_user.id)\
+            .group_by(DashboardStat.day, DashboardStat.category, DashboardStat.band)\
+            .all()
+        
+        today = datetime.utcnow().date()
+        changes_by_window = {name: 0 for name in WINDOWS}
+        by_category: Dict[str, int] = {}
+        by_band: Dict[str, int] = {}
+        total = 0
+        for day, category, band, count in rows:
+            count = int(count or 0)
+            if count <= 0:
+                continue
+            total += count
+            by_category[category] = by_category.get(category, 0) + count
+            by_band[band] = by_band.get(band, 0) + count
+            for name, days in WINDOWS.items():
+                if day > today - timedelta(days=days):
+                    changes_by_window[name] += count
+        
+        now = datetime.utcnow()
+        status_counts = dict(
+            db.query(Company.status, func.count())
+            .filter(Company.user_id == current_user.id)
+            .group_by(Company.status)
+            .all()
+        )
+        overdue, last_scanned = db.query(
+            func.count(Company.id).filter(Company.status == "active", Company.next_scan < now),
+            func.max(Company.last_scanned)
+        ).filter(Company.user_id == current_user.id).one()
+        
+        return {
+            "tracked_companies": sum(status_counts.values()),
+            "changes_by_window": changes_by_window,
+            "total_changes": total,
+            "by_category": by_category,
+            "by_band": by_band,
+            "scan_health": {
+                "active": status_counts.get("active", 0),
+                "error": status_counts.get("error", 0),
+                "overdue": overdue or 0,
+                "by_status": status_counts,
+                "last_scanned": last_scanned,
+            }
+        }
+    
+    return cached_response(request, current_user.id, "dashboard-summary", build)
@@ -0,0 +1,93 @@
+import asyncio
+import json
+from typing import Optional
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from ..models.base import SessionLocal
+from ..core.config import settings
+from ..core.redis import get_async_redis
+from ..services.events import STREAM_KEY, CHANNEL_KEY
+from .auth import load_user_from_token
+
+router = APIRouter()
+
+def get_stream_user(
+    authorization: Optional[str] = Header(None),
+    access_token: Optional[str] = Query(None)
+):
+    """
+    EventSource cannot set headers, so the token may also come as a query
+    parameter. The session is closed right away rather than held for the
+    lifetime of the stream.
+    """
+    token = access_token
+    if authorization and authorization.lower().startswith("bearer "):
+        token = authorization[7:]
+    if not token:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    db = SessionLocal()
+    try:
+        return load_user_from_token(token, db)
+    finally:
+        db.close()
+
+def _format_event(event_id: str, payload: str) -> str:
+    event_type = json.loads(payload).get("type", "message")
+    return f"id: {event_id}\nevent: {event_type}\ndata: {payload}\n\n"
+
+def _stream_id(event_id: str):
+    ms, _, seq = event_id.partition("-")
+    return int(ms), int(seq or 0)
+
+async def _event_stream(user_id: str, last_event_id: Optional[str]):
+    r = get_async_redis()
+    pubsub = r.pubsub()
+    # Subscribe before replaying so nothing published in between is lost
+    await pubsub.subscribe(CHANNEL_KEY.format(user_id=user_id))
+    try:
+        yield "retry: 3000\n\n"
+        
+        last_seen = None
+        if last_event_id:
+            try:
+                last_seen = _stream_id(last_event_id)
+            except ValueError:
+                last_seen = None
+        if last_seen:
+            backlog = await r.xrange(STREAM_KEY.format(user_id=user_id), min=f"({last_event_id}", max="+")
+            for event_id, fields in backlog:
+                last_seen = _stream_id(event_id)
+                yield _format_event(event_id, fields["payload"])
+        
+        while True:
+            message = await pubsub.get_message(
+                ignore_subscribe_messages=True, timeout=settings.EVENT_HEARTBEAT_SECONDS
+            )
+            if message is None:
+                yield ": keep-alive\n\n"
+                continue
+            event = json.loads(message["data"])
+            if last_seen and _stream_id(event["id"]) <= last_seen:
+                continue  # Already sent during replay
+            yield _format_event(event["id"], event["payload"])
+    except asyncio.CancelledError:
+        pass
+    finally:
+        await pubsub.unsubscribe()
+        await pubsub.close()
+
+@router.get("/stream")
+async def stream_events(
+    last_event_id: Optional[str] = Header(None),
+    current_user=Depends(get_stream_user)
+):
+    """
+    Server-sent events for the current user: scan status, new changes and
+    analysis completions. Reconnecting clients send Last-Event-ID and receive
+    everything published since.
+    """
+    return StreamingResponse(
+        _event_stream(current_user.id, last_event_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
@@ -0,0 +1,138 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from typing import Optional
+from uuid import UUID
+from datetime import datetime
+from pydantic import BaseModel, Field
+
+from ..models.base import SessionLocal
+from ..models.user import User
+from ..services.exporter import (
+    CHANGES, SNAPSHOTS, NDJSON, EXTENSIONS, MEDIA_TYPES,
+    iter_export, create_export_job, get_export_job
+)
+from ..services.storage import BlobStore
+from ..tasks.client import enqueue_export
+from .auth import get_current_user
+
+router = APIRouter()
+
+FORMAT_PATTERN = "^(ndjson|csv|columnar)$"
+
+class ExportJobCreate(BaseModel):
+    kind: str = Field(CHANGES, pattern="^(changes|snapshots)$")
+    format: str = Field(NDJSON, pattern=FORMAT_PATTERN)
+    company_id: Optional[UUID] = None
+    min_significance: int = Field(0, ge=0, le=100)
+    from_date: Optional[datetime] = None
+    to_date: Optional[datetime] = None
+    category: Optional[str] = None
+
+class ExportJobResponse(BaseModel):
+    job_id: str
+    kind: str
+    format: str
+    status: str
+    created_at: Optional[datetime] = None
+    completed_at: Optional[datetime] = None
+    size: Optional[int] = None
+    error: Optional[str] = None
+
+def _stream(user_id: str, kind: str, fmt: str, filters: dict, include_text: bool = False):
+    # The session lives exactly as long as the stream
+    db = SessionLocal()
+    try:
+        yield from iter_export(db, user_id, kind, fmt, filters, include_text)
+    finally:
+        db.close()
+
+def _download(kind: str, fmt: str, body) -> StreamingResponse:
+    filename = f"pivotwatch-{kind}-{datetime.utcnow():%Y%m%d-%H%M%S}{EXTENSIONS[fmt]}"
+    return StreamingResponse(
+        body,
+        media_type=MEDIA_TYPES[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+@router.get("/changes")
+async def export_changes(
+    format: str = Query(NDJSON, pattern=FORMAT_PATTERN),
+    company_id: Optional[UUID] = None,
+    min_significance: int = Query(0, ge=0, le=100),
+    from_date: Optional[datetime] = None,
+    to_date: Optional[datetime] = None,
+    category: Optional[str] = None,
+    current_user: User = Depends(get_current_user)
+):
+    """Stream every matching change (same filters as GET /changes, no paging)"""
+    filters = {
+        "company_id": company_id, "min_significance": min_significance,
+        "from_date": from_date, "to_date": to_date, "category": category
+    }
+    return _download(CHANGES, format, _stream(current_user.id, CHANGES, format, filters))
+
+@router.get("/snapshots")
+async def export_snapshots(
+    format: str = Query(NDJSON, pattern=FORMAT_PATTERN),
+    company_id: Optional[UUID] = None,
+    from_date: Optional[datetime] = None,
+    to_date: Optional[datetime] = None,
+    include_text: bool = False,
+    current_user: User = Depends(get_current_user)
+):
+    """Stream snapshot metadata (and optionally extracted text)"""
+    filters = {"company_id": company_id, "from_date": from_date, "to_date": to_date}
+    return _download(SNAPSHOTS, format, _stream(current_user.id, SNAPSHOTS, format, filters, include_text))
+
+@router.post("/jobs", response_model=ExportJobResponse, status_code=202)
+async def create_export(
+    export: ExportJobCreate,
+    current_user: User = Depends(get_current_user)
+):
+    """Run a large export in the background; poll the job and download when completed"""
+    filters = {"company_id": str(export.company_id) if export.company_id else None}
+    if export.kind == CHANGES:
+        filters.update(min_significance=export.min_significance, category=export.category)
+    filters.update(
+        from_date=export.from_date.isoformat() if export.from_date else None,
+        to_date=export.to_date.isoformat() if export.to_date else None
+    )
+    job_id = create_export_job(current_user.id, export.kind, export.format, filters)
+    enqueue_export(job_id, str(current_user.id), export.kind, export.format, filters)
+    return {"job_id": job_id, "kind": export.kind, "format": export.format, "status": "queued"}
+
+def _get_own_job(job_id: str, user_id: str) -> dict:
+    job = get_export_job(job_id)
+    if not job or job.get("user_id") != str(user_id):
+        raise HTTPException(status_code=404, detail="Export not found")
+    return job
+
+@router.get("/jobs/{job_id}", response_model=ExportJobResponse)
+async def get_export(
+    job_id: str,
+    current_user: User = Depends(get_current_user)
+):
+    """Get the status of a background export"""
+    job = _get_own_job(job_id, current_user.id)
+    return {
+        "job_id": job_id,
+        "kind": job["kind"],
+        "format": job["format"],
+        "status": job["status"],
+        "created_at": job.get("created_at"),
+        "completed_at": job.get("completed_at"),
+        "size": int(job["size"]) if job.get("size") else None,
+        "error": job.get("error")
+    }
+
+@router.get("/jobs/{job_id}/download")
+async def download_export(
+    job_id: str,
+    current_user: User = Depends(get_current_user)
+):
+    """Download a completed background export"""
+    job = _get_own_job(job_id, current_user.id)
+    store = BlobStore()
+    if job["status"] != "completed" or not store.exists(job.get("ref", "")):
+        raise HTTPException(status_code=409, detail=f"Export is {job['status']}")
+    return _download(job["kind"], job["format"], store.iter_bytes(job["ref"]))
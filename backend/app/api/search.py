@@ -0,0 +1,62 @@
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.orm import Session
+from typing import List, Optional
+from uuid import UUID
+from datetime import datetime
+from pydantic import BaseModel
+
+from ..models.base import get_db
+from ..models.user import User
+from ..services.search import SNAPSHOTS, CHANGES, search
+from .auth import get_current_user
+
+router = APIRouter()
+
+class SearchResult(BaseModel):
+    type: str  # snapshot or change
+    id: UUID
+    company_id: UUID
+    company_name: str
+    at: datetime
+    title: Optional[str]
+    category: Optional[str]
+    rank: float
+    snippet: Optional[str]  # HTML: the text is escaped, matches are wrapped in <mark>
+
+class SearchResponse(BaseModel):
+    query: str
+    results: List[SearchResult]
+    limit: int
+    offset: int
+    has_more: bool
+
+@router.get("", response_model=SearchResponse)
+async def search_content(
+    q: str = Query(..., min_length=1, max_length=500),
+    type: Optional[str] = Query(None, pattern="^(snapshots|changes)$"),
+    company_id: Optional[UUID] = None,
+    from_date: Optional[datetime] = None,
+    to_date: Optional[datetime] = None,
+    category: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Search snapshot text and change summaries/analysis
+    
+    Supports quoted phrases, `or` and `-exclusions`, e.g. `"SOC 2" or pricing`.
+    A `category` filter restricts results to changes.
+    """
+    result = search(
+        db, current_user.id, q,
+        kinds=(type,) if type else (SNAPSHOTS, CHANGES),
+        company_id=company_id,
+        from_date=from_date,
+        to_date=to_date,
+        category=category,
+        limit=limit,
+        offset=offset
+    )
+    return {"query": q, "limit": limit, "offset": offset, **result}
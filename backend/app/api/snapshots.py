@@ -0,0 +1,164 @@
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request
+from sqlalchemy.orm import Session
+from typing import List, Optional
+from uuid import UUID
+from pydantic import BaseModel
+import os
+import time
+
+from ..models.base import get_db
+from ..models.company import Company
+from ..models.snapshot import Snapshot
+from ..models.user import User
+from ..core.cache import file_response
+from ..core.config import settings
+from ..core.security import sign_path, verify_path_signature
+from ..services.renditions import MEDIA_TYPE, rendition_ref
+from ..services.storage import BlobStore
+from .auth import get_current_user, load_user_from_token
+
+router = APIRouter()
+
+ORIGINAL = "original"
+ORIGINAL_MEDIA_TYPES = {".png": "image/png", ".webp": "image/webp", ".jpg": "image/jpeg", ".jpeg": "image/jpeg"}
+
+class RenditionTile(BaseModel):
+    url: str
+    top: int  # At tile width
+    height: int
+
+class RenditionCrop(BaseModel):
+    url: str
+    box: List[int]  # (left, top, right, bottom) in the original screenshot
+    before_url: Optional[str] = None  # Same region in the compared snapshot; None for new content
+    before_box: Optional[List[int]] = None
+
+class SnapshotImages(BaseModel):
+    snapshot_id: UUID
+    status: str  # ready / pending / unavailable (no screenshot)
+    width: Optional[int] = None
+    height: Optional[int] = None
+    tile_width: Optional[int] = None
+    thumb_url: Optional[str] = None
+    tiles: List[RenditionTile] = []
+    crops: List[RenditionCrop] = []
+    compared_with: Optional[UUID] = None
+    original_url: Optional[str] = None
+
+def _image_path(snapshot_id, name: str) -> str:
+    return f"/api/snapshots/{snapshot_id}/images/{name}"
+
+def _image_url(snapshot_id, name: str) -> str:
+    """
+    Signed URL an <img> can load without a bearer token
+    
+    Expiry is rounded up to a whole RENDITION_URL_TTL (leaving one to two
+    TTLs), so the URL, and with it the browser's cached copy, stays the
+    same across listings in that window.
+    """
+    path = _image_path(snapshot_id, name)
+    expires = (int(time.time()) // settings.RENDITION_URL_TTL + 2) * settings.RENDITION_URL_TTL
+    return f"{path}?expires={expires}&signature={sign_path(path, expires)}"
+
+def get_image_user_id(
+    snapshot_id: UUID,
+    name: str,
+    expires: Optional[int] = Query(None),
+    signature: Optional[str] = Query(None),
+    authorization: Optional[str] = Header(None),
+    db: Session = Depends(get_db)
+) -> Optional[str]:
+    """
+    None for a valid signed URL (the listing that signed it checked
+    ownership); otherwise the bearer token's user, whose ownership the
+    handler checks.
+    """
+    if verify_path_signature(_image_path(snapshot_id, name), expires, signature):
+        return None
+    if not authorization or not authorization.lower().startswith("bearer "):
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    return load_user_from_token(authorization[7:], db).id
+
+def _get_own_snapshot(db: Session, snapshot_id: UUID, user_id):
+    """A snapshot's screenshot path and metadata; `user_id` None skips the ownership check"""
+    # Only the two columns needed; html and text stay in the database
+    query = db.query(Snapshot.screenshot_path, Snapshot.snapshot_metadata)\
+        .filter(Snapshot.id == snapshot_id)
+    if user_id is not None:
+        query = query.join(Company, Company.id == Snapshot.company_id).filter(Company.user_id == user_id)
+    row = query.first()
+    if not row:
+        raise HTTPException(status_code=404, detail="Snapshot not found")
+    return row
+
+@router.get("/{snapshot_id}/images", response_model=SnapshotImages)
+async def get_snapshot_images(
+    snapshot_id: UUID,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    List a snapshot's screenshot renditions: thumbnail, page tiles and change crops
+    
+    Renditions are made shortly after the scan; until then `status` is
+    pending. The full screenshot stays available at `original_url`. URLs
+    are signed for RENDITION_URL_TTL or longer, so list again for fresh ones.
+    """
+    screenshot_path, metadata = _get_own_snapshot(db, snapshot_id, current_user.id)
+    if not screenshot_path:
+        return {"snapshot_id": snapshot_id, "status": "unavailable"}
+    original_url = _image_url(snapshot_id, ORIGINAL)
+    manifest = (metadata or {}).get("renditions")
+    if not manifest:
+        return {"snapshot_id": snapshot_id, "status": "pending", "original_url": original_url}
+    return {
+        "snapshot_id": snapshot_id,
+        "status": "ready",
+        "width": manifest["width"],
+        "height": manifest["height"],
+        "tile_width": manifest["tile_width"],
+        "thumb_url": _image_url(snapshot_id, manifest["thumb"]["name"]),
+        "tiles": [
+            {"url": _image_url(snapshot_id, tile["name"]), "top": tile["top"], "height": tile["height"]}
+            for tile in manifest["tiles"]
+        ],
+        "crops": [
+            {
+                "url": _image_url(snapshot_id, crop["name"]),
+                "box": crop["box"],
+                "before_url": _image_url(snapshot_id, crop["before_name"]) if crop.get("before_name") else None,
+                "before_box": crop.get("before_box")
+            }
+            for crop in manifest["crops"]
+        ],
+        "compared_with": manifest.get("compared_with"),
+        "original_url": original_url
+    }
+
+@router.get("/{snapshot_id}/images/{name}")
+async def get_snapshot_image(
+    snapshot_id: UUID,
+    name: str,
+    request: Request,
+    db: Session = Depends(get_db),
+    user_id: Optional[str] = Depends(get_image_user_id)
+):
+    """
+    Serve one rendition (thumb, tile-N, crop-N, crop-N-before) or the original screenshot
+    
+    Takes the signed URLs from the listing (usable as <img src>) or a
+    bearer token. Responses carry an ETag and a private max-age, and honour
+    single byte ranges, so large files can be fetched in parts and resumed.
+    """
+    screenshot_path, metadata = _get_own_snapshot(db, snapshot_id, user_id)
+    if name == ORIGINAL:
+        if not screenshot_path or not os.path.exists(screenshot_path):
+            raise HTTPException(status_code=404, detail="Screenshot not found")
+        media_type = ORIGINAL_MEDIA_TYPES.get(os.path.splitext(screenshot_path)[1].lower(), "application/octet-stream")
+        return file_response(request, screenshot_path, media_type, settings.RENDITION_CACHE_MAX_AGE)
+    
+    ref = rendition_ref((metadata or {}).get("renditions"), name)
+    store = BlobStore()
+    if not ref or not store.exists(ref):
+        raise HTTPException(status_code=404, detail="Rendition not found")
+    return file_response(request, store.path(ref), MEDIA_TYPE, settings.RENDITION_CACHE_MAX_AGE)
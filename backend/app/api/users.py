@@ -3,9 +3,14 @@ from sqlalchemy.orm import Session
 from pydantic import BaseModel
 from datetime import datetime
 from uuid import UUID
+from typing import Dict, Optional
 
 from ..models.base import get_db
 from ..models.user import User
+from ..services.fingerprints import get_state_match_stats
+from ..core.cache import get_cache_stats
+from ..services.fair_scheduler import get_scheduler_stats
+from ..services.webhooks import check_webhook_url
 from .auth import get_current_user
 from sqlalchemy import func, text
 
@@ -66,6 +71,40 @@ async def update_user_profile(
         "updated_at": current_user.updated_at
     }
 
+class NotificationSettings(BaseModel):
+    email: bool = True
+    slack_webhook_url: Optional[str] = None
+    webhook_url: Optional[str] = None
+
+@router.get("/me/notifications", response_model=NotificationSettings)
+async def get_notification_settings(
+    current_user: User = Depends(get_current_user)
+):
+    """Get the channels change digests are sent on"""
+    return NotificationSettings.model_validate(current_user.notification_settings or {})
+
+@router.put("/me/notifications", response_model=NotificationSettings)
+async def update_notification_settings(
+    notification_settings: NotificationSettings,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Replace the channels change digests are sent on
+    
+    Webhook URLs must be public http(s) endpoints, and Slack ones
+    https://hooks.slack.com URLs; see services/webhooks.py.
+    """
+    for field, slack in (("slack_webhook_url", True), ("webhook_url", False)):
+        url = getattr(notification_settings, field)
+        error = check_webhook_url(url, slack=slack) if url else None
+        if error:
+            raise HTTPException(status_code=400, detail=f"{field}: {error}")
+    
+    current_user.notification_settings = notification_settings.model_dump()
+    db.commit()
+    return notification_settings
+
 
 class UserStatsResponse(BaseModel):
     total: int
@@ -88,3 +127,66 @@ async def get_user_stats(
     rows = rows_res.fetchall()
     by_plan = {row[0]: int(row[1]) for row in rows}
     return {"total": totals, "by_plan": by_plan}
+
+
+class StateMatchStatsResponse(BaseModel):
+    checks: int
+    hits: int
+    reverts: int
+    oscillations: int
+    hit_rate: float
+    analyses_skipped: int
+
+
+@router.get("/stats/state-matches", response_model=StateMatchStatsResponse)
+async def get_state_match_stats_endpoint(
+    current_user: User = Depends(get_current_user)
+):
+    """Return how often scans matched a recent state (revert/oscillation). Admins only."""
+    if current_user.plan != "admin":
+        raise HTTPException(status_code=403, detail="Admin access required")
+
+    return get_state_match_stats()
+
+
+class CacheStatsResponse(BaseModel):
+    lookups: int
+    local_hits: int
+    redis_hits: int
+    misses: int
+    not_modified: int
+    hit_rate: float
+    build_ms_saved: float
+
+
+@router.get("/stats/cache", response_model=CacheStatsResponse)
+async def get_cache_stats_endpoint(
+    current_user: User = Depends(get_current_user)
+):
+    """Return response cache hit rate and serialization time saved. Admins only."""
+    if current_user.plan != "admin":
+        raise HTTPException(status_code=403, detail="Admin access required")
+
+    return get_cache_stats()
+
+
+class PlanQueueStats(BaseModel):
+    tenants_waiting: int
+    pending_scans: int
+    largest_tenant_backlog: int
+    in_flight: int
+    dispatched_this_minute: int
+    concurrency_limit: int
+    rate_limit_per_minute: int
+    weight: int
+
+
+@router.get("/stats/scheduler", response_model=Dict[str, PlanQueueStats])
+async def get_scheduler_stats_endpoint(
+    current_user: User = Depends(get_current_user)
+):
+    """Return fair scan queue backlog and quota usage per plan. Admins only."""
+    if current_user.plan != "admin":
+        raise HTTPException(status_code=403, detail="Admin access required")
+
+    return get_scheduler_stats()
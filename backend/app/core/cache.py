@@ -0,0 +1,249 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Iterator, Optional, Tuple
+from fastapi import Request, Response
+from fastapi.responses import StreamingResponse
+from fastapi.encoders import jsonable_encoder
+from .config import settings
+from . import metrics
+from .redis import get_redis
+
+# Cached entries live under the user's current generation; bumping the
+# generation orphans every entry for that user (Redis expires them).
+GENERATION_KEY = "pivotwatch:cache-gen:{user_id}"
+ENTRY_KEY = "pivotwatch:cache:{user_id}:{generation}:{scope}:{params}"
+STATS_KEY = "pivotwatch:cache-stats"
+
+class LRUCache:
+    """
+    Small thread-safe in-process LRU with an optional per-entry TTL
+    
+    `max_bytes` also bounds the total of the sizes passed to `set`
+    (`len(value)` by default, for str/bytes values); a value larger than
+    that is not cached at all.
+    """
+    
+    def __init__(self, maxsize: int, ttl: Optional[float] = None, max_bytes: Optional[int] = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            value, expires, size = item
+            if expires is not None and expires < time.monotonic():
+                del self._data[key]
+                self.bytes -= size
+                return None
+            self._data.move_to_end(key)
+            return value
+    
+    def set(self, key: Hashable, value: Any, size: Optional[int] = None):
+        expires = time.monotonic() + self.ttl if self.ttl else None
+        if self.max_bytes is None:
+            size = 0
+        elif size is None:
+            size = len(value)
+        with self._lock:
+            replaced = self._data.pop(key, None)
+            if replaced is not None:
+                self.bytes -= replaced[2]
+            if self.max_bytes is not None and size > self.max_bytes:
+                return
+            self._data[key] = (value, expires, size)
+            self.bytes += size
+            while len(self._data) > self.maxsize or (self.max_bytes is not None and self.bytes > self.max_bytes):
+                _, (_, _, evicted) = self._data.popitem(last=False)
+                self.bytes -= evicted
+    
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.bytes = 0
+    
+    def __len__(self):
+        return len(self._data)
+
+_local = LRUCache(settings.RESPONSE_CACHE_LOCAL_SIZE, ttl=settings.RESPONSE_CACHE_TTL)
+
+def invalidate_user_cache(user_id):
+    """Drop every cached response for a user; call after committing a write"""
+    if not user_id:
+        return
+    try:
+        get_redis().incr(GENERATION_KEY.format(user_id=user_id))
+    except Exception as e:
+        print(f"⚠️  Failed to invalidate response cache for {user_id}: {e}")
+
+def _record(pipe, field: str, saved_ms: float = 0.0):
+    pipe.hincrby(STATS_KEY, field, 1)
+    if saved_ms:
+        pipe.hincrbyfloat(STATS_KEY, 'build_ms_saved', saved_ms)
+
+def _etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    return header.strip() == "*" or etag in [tag.strip() for tag in header.split(",")]
+
+def _respond(request: Request, body: bytes, etag: str) -> Response:
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if _etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+def cached_response(request: Request, user_id, scope: str, build: Callable[[], Any],
+                    params: Optional[Dict] = None) -> Response:
+    """
+    Serve a JSON response from the cache, building it on a miss
+    
+    Entries are keyed by user, the user's cache generation, `scope` and the
+    query parameters. Lookups go to the in-process LRU first, then Redis.
+    Every response carries a strong ETag; a matching If-None-Match gets 304.
+    Exceptions raised by `build` (404, 403) propagate and are not cached.
+    """
+    if not settings.RESPONSE_CACHE_ENABLED:
+        body = json.dumps(jsonable_encoder(build())).encode()
+        return _respond(request, body, f'"{hashlib.sha256(body).hexdigest()[:32]}"')
+    
+    params_hash = hashlib.sha1(json.dumps(params or {}, sort_keys=True, default=str).encode()).hexdigest()
+    try:
+        r = get_redis()
+        generation = r.get(GENERATION_KEY.format(user_id=user_id)) or "0"
+    except Exception:
+        r = None
+        generation = None
+    
+    if generation is not None:
+        key = ENTRY_KEY.format(user_id=user_id, generation=generation, scope=scope, params=params_hash)
+        entry = _local.get(key)
+        tier = 'hits_local'
+        try:
+            if entry is None:
+                raw = r.hgetall(key)
+                if raw:
+                    entry = (raw['body'].encode(), raw['etag'], float(raw['build_ms']))
+                    _local.set(key, entry)
+                    tier = 'hits_redis'
+            if entry is not None:
+                pipe = r.pipeline()
+                _record(pipe, tier, entry[2])
+                if _etag_matches(request, entry[1]):
+                    _record(pipe, 'not_modified')
+                pipe.execute()
+        except Exception:
+            pass  # Serve what we have; the cache is an optimization only
+        if entry is not None:
+            metrics.CACHE_LOOKUPS.labels('response', 'hit_local' if tier == 'hits_local' else 'hit_redis').inc()
+            return _respond(request, entry[0], entry[1])
+        metrics.CACHE_LOOKUPS.labels('response', 'miss').inc()
+    
+    started = time.perf_counter()
+    body = json.dumps(jsonable_encoder(build())).encode()
+    build_ms = (time.perf_counter() - started) * 1000
+    etag = f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+    
+    if generation is not None:
+        _local.set(key, (body, etag, build_ms))
+        try:
+            pipe = r.pipeline()
+            pipe.hset(key, mapping={'body': body.decode(), 'etag': etag, 'build_ms': build_ms})
+            pipe.expire(key, settings.RESPONSE_CACHE_TTL)
+            _record(pipe, 'misses')
+            pipe.execute()
+        except Exception:
+            pass
+    return _respond(request, body, etag)
+
+def get_cache_stats() -> Dict:
+    """Hit rate of the response cache and the build time it saved"""
+    raw = get_redis().hgetall(STATS_KEY)
+    local_hits = int(raw.get('hits_local', 0))
+    redis_hits = int(raw.get('hits_redis', 0))
+    misses = int(raw.get('misses', 0))
+    lookups = local_hits + redis_hits + misses
+    return {
+        'lookups': lookups,
+        'local_hits': local_hits,
+        'redis_hits': redis_hits,
+        'misses': misses,
+        'not_modified': int(raw.get('not_modified', 0)),
+        'hit_rate': (local_hits + redis_hits) / lookups if lookups else 0.0,
+        'build_ms_saved': round(float(raw.get('build_ms_saved', 0.0)), 1),
+    }
+
+def _byte_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    Parse a single-range `Range: bytes=` header into inclusive (first, last)
+    
+    Returns None for anything else (absent, malformed, several ranges), which
+    means the whole file: RFC 9110 lets a server ignore Range. A returned
+    range with first >= size is unsatisfiable.
+    """
+    if not header or not header.startswith("bytes=") or "," in header:
+        return None
+    first, sep, last = header[6:].strip().partition("-")
+    if not sep:
+        return None
+    try:
+        if not first:  # Suffix: the last N bytes
+            length = int(last)
+            return (max(0, size - length), size - 1) if length > 0 else (size, size - 1)
+        first = int(first)
+        last = int(last) if last else size - 1
+    except ValueError:
+        return None
+    if first < 0 or last < first:
+        return None  # Invalid rather than unsatisfiable
+    return first, min(last, size - 1)
+
+def _file_chunks(path: str, offset: int, length: int, chunk_size: int = 64 * 1024) -> Iterator[bytes]:
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        while length > 0:
+            chunk = f.read(min(chunk_size, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+def file_response(request: Request, path: str, media_type: str, max_age: int) -> Response:
+    """
+    Serve a file with client caching and byte ranges
+    
+    The ETag comes from the file's size and mtime, so nothing is read to
+    answer a conditional request (If-None-Match gets 304). A single byte
+    range gets 206, honouring If-Range; the body is streamed from disk.
+    """
+    stat = os.stat(path)
+    size = stat.st_size
+    etag = f'"{stat.st_mtime_ns:x}-{size:x}"'
+    headers = {"ETag": etag, "Cache-Control": f"private, max-age={max_age}", "Accept-Ranges": "bytes"}
+    if _etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    
+    byte_range = _byte_range(request.headers.get("range"), size)
+    if_range = request.headers.get("if-range")
+    if byte_range and if_range and if_range.strip() != etag:
+        byte_range = None  # The client's partial copy is stale: send it all
+    if byte_range is None:
+        headers["Content-Length"] = str(size)
+        return StreamingResponse(_file_chunks(path, 0, size), media_type=media_type, headers=headers)
+    first, last = byte_range
+    if first >= size or last < first:
+        headers["Content-Range"] = f"bytes */{size}"
+        return Response(status_code=416, headers=headers)
+    headers["Content-Range"] = f"bytes {first}-{last}/{size}"
+    headers["Content-Length"] = str(last - first + 1)
+    return StreamingResponse(_file_chunks(path, first, last - first + 1), status_code=206,
+                             media_type=media_type, headers=headers)
@@ -20,6 +20,171 @@ class Settings(BaseSettings):
     # Storage
     SCREENSHOT_PATH: str = os.getenv("SCREENSHOT_PATH", "./screenshots")
     UPLOAD_PATH: str = os.getenv("UPLOAD_PATH", "./uploads")
+    BLOB_PATH: str = os.getenv("BLOB_PATH", "./blobs")
+    
+    # Scraping
+    SCRAPE_LEAN_MODE: bool = os.getenv("SCRAPE_LEAN_MODE", "False").lower() == "true"
+    SCRAPE_IN_PAGE_EXTRACTION: bool = os.getenv("SCRAPE_IN_PAGE_EXTRACTION", "False").lower() == "true"
+    SCRAPE_BLOCKED_RESOURCE_TYPES: list = ["image", "media", "font"]
+    SCRAPE_BLOCKED_DOMAINS: list = [
+        "google-analytics.com",
+        "googletagmanager.com",
+        "doubleclick.net",
+        "connect.facebook.net",
+        "hotjar.com",
+        "segment.io",
+        "cdn.segment.com",
+        "mixpanel.com",
+        "fullstory.com",
+        "clarity.ms",
+    ]
+    SCRAPE_DOM_QUIET_MS: int = int(os.getenv("SCRAPE_DOM_QUIET_MS", "500"))
+    SCRAPE_DOM_MAX_WAIT_MS: int = int(os.getenv("SCRAPE_DOM_MAX_WAIT_MS", "5000"))
+    WATCH_REGION_MAX_CHARS: int = int(os.getenv("WATCH_REGION_MAX_CHARS", "50000"))
+    
+    # Scrape memory safeguards
+    SCRAPE_MAX_HTML_BYTES: int = int(os.getenv("SCRAPE_MAX_HTML_BYTES", str(8 * 1024 * 1024)))  # Larger pages are truncated
+    SCRAPE_MAX_TEXT_CHARS: int = int(os.getenv("SCRAPE_MAX_TEXT_CHARS", "1000000"))  # Extracted text kept per snapshot
+    SCRAPE_SPILL_BYTES: int = int(os.getenv("SCRAPE_SPILL_BYTES", str(1024 * 1024)))  # Raw HTML above this goes to disk
+    SCRAPE_LARGE_PAGE_BYTES: int = int(os.getenv("SCRAPE_LARGE_PAGE_BYTES", str(2 * 1024 * 1024)))  # Parsed with lxml, not bs4
+    SCRAPE_MEMORY_LIMIT_MB: int = int(os.getenv("SCRAPE_MEMORY_LIMIT_MB", "0"))  # 0 = container (cgroup) limit
+    SCRAPE_MEMORY_SOFT_LIMIT: float = float(os.getenv("SCRAPE_MEMORY_SOFT_LIMIT", "0.75"))  # Above: lighter captures
+    SCRAPE_MEMORY_HARD_LIMIT: float = float(os.getenv("SCRAPE_MEMORY_HARD_LIMIT", "0.9"))  # Above: defer scans
+    SCRAPE_MEMORY_DEFER_SECONDS: int = int(os.getenv("SCRAPE_MEMORY_DEFER_SECONDS", "60"))
+    SCRAPE_MEMORY_MAX_DEFERRALS: int = int(os.getenv("SCRAPE_MEMORY_MAX_DEFERRALS", "5"))  # Then run degraded
+    SCRAPE_RSS_SAMPLE_MS: float = float(os.getenv("SCRAPE_RSS_SAMPLE_MS", "50"))
+    
+    # Render mode selection (browser vs plain HTTP)
+    RENDER_MODE_DEFAULT: str = os.getenv("RENDER_MODE_DEFAULT", "auto")  # auto, browser, http
+    RENDER_MODE_REQUIRED_AGREEMENTS: int = int(os.getenv("RENDER_MODE_REQUIRED_AGREEMENTS", "3"))
+    RENDER_MODE_AGREEMENT_THRESHOLD: float = float(os.getenv("RENDER_MODE_AGREEMENT_THRESHOLD", "0.97"))
+    RENDER_MODE_PROBE_INTERVAL: int = int(os.getenv("RENDER_MODE_PROBE_INTERVAL", "10"))
+    RENDER_MODE_HISTORY_SIZE: int = 10
+    HTTP_POOL_MAX_CONNECTIONS: int = int(os.getenv("HTTP_POOL_MAX_CONNECTIONS", "100"))
+    HTTP_POOL_MAX_KEEPALIVE: int = int(os.getenv("HTTP_POOL_MAX_KEEPALIVE", "20"))
+    SCAN_LEASE_TTL: int = int(os.getenv("SCAN_LEASE_TTL", "3600"))  # Seconds
+    SCAN_SCHEDULER_INTERVAL: float = float(os.getenv("SCAN_SCHEDULER_INTERVAL", "300"))  # Seconds between due-scan sweeps
+    SCAN_SCHEDULER_BATCH: int = int(os.getenv("SCAN_SCHEDULER_BATCH", "500"))  # Most scans queued per sweep
+    SCAN_RETRY_BACKOFF: int = int(os.getenv("SCAN_RETRY_BACKOFF", "1800"))  # Seconds before a queued scan that didn't finish is due again; doubles per failure
+    SCAN_MAX_FAILURES: int = int(os.getenv("SCAN_MAX_FAILURES", "5"))  # Scheduled scans in a row that fail before a company is marked error
+    
+    # Fair scan scheduling across tenants (see services/fair_scheduler.py).
+    # Weights are dispatch shares between plans; limits apply cluster-wide.
+    SCAN_PLAN_WEIGHTS: dict = {"admin": 8, "enterprise": 8, "pro": 3, "free": 1}
+    SCAN_PLAN_CONCURRENCY: dict = {"admin": 8, "enterprise": 8, "pro": 4, "free": 2}  # Scans in flight
+    SCAN_PLAN_RATE_PER_MINUTE: dict = {"admin": 240, "enterprise": 240, "pro": 60, "free": 20}  # Scans started
+    SCAN_GLOBAL_CONCURRENCY: int = int(os.getenv("SCAN_GLOBAL_CONCURRENCY", "8"))  # ~2x scrape worker slots (a scan holds its slot until the diff)
+    SCAN_DISPATCH_INTERVAL: float = float(os.getenv("SCAN_DISPATCH_INTERVAL", "2"))  # Seconds
+    MANUAL_SCANS_PER_MINUTE: int = int(os.getenv("MANUAL_SCANS_PER_MINUTE", "5"))  # Fast-lane budget per tenant
+    
+    # Multi-page monitoring (scrape_config "multi_page"): pages scanned per company, per plan
+    CRAWL_MAX_PAGES: dict = {"free": 3, "pro": 20, "enterprise": 100, "admin": 100}
+    CRAWL_FRONTIER_FACTOR: int = int(os.getenv("CRAWL_FRONTIER_FACTOR", "5"))  # Frontier kept beyond the cap, x max pages
+    CRAWL_MAX_DEPTH: int = int(os.getenv("CRAWL_MAX_DEPTH", "2"))  # Link hops from the company URL
+    CRAWL_DISCOVERY_INTERVAL_HOURS: int = int(os.getenv("CRAWL_DISCOVERY_INTERVAL_HOURS", "24"))
+    CRAWL_SITEMAP_MAX_FILES: int = int(os.getenv("CRAWL_SITEMAP_MAX_FILES", "10"))  # Sitemap index fan-out
+    CRAWL_SITEMAP_MAX_URLS: int = int(os.getenv("CRAWL_SITEMAP_MAX_URLS", "20000"))  # Parsed per company
+    CRAWL_MIN_INTERVAL_HOURS: float = float(os.getenv("CRAWL_MIN_INTERVAL_HOURS", "24"))  # Rescan pages this often...
+    CRAWL_MAX_INTERVAL_HOURS: float = float(os.getenv("CRAWL_MAX_INTERVAL_HOURS", "336"))  # ...backing off to this
+    CRAWL_MAX_FAILURES: int = int(os.getenv("CRAWL_MAX_FAILURES", "5"))  # Failed scans in a row before a page is dropped
+    CRAWL_SCHEDULER_BATCH: int = int(os.getenv("CRAWL_SCHEDULER_BATCH", "1000"))  # Most page scans queued per sweep
+    CRAWL_PRIORITY_PATHS: list = ["pricing", "plans", "careers", "jobs", "product", "features", "blog", "news",
+                                  "about", "team", "customers", "solutions", "changelog", "release"]
+
+    # Bulk company import
+    IMPORT_MAX_ROWS: int = int(os.getenv("IMPORT_MAX_ROWS", "5000"))
+    IMPORT_SCANS_PER_MINUTE: int = int(os.getenv("IMPORT_SCANS_PER_MINUTE", "30"))  # Initial scan stagger rate
+    
+    # Revert/oscillation detection against recent content states
+    CONTENT_HISTORY_SIZE: int = int(os.getenv("CONTENT_HISTORY_SIZE", "10"))
+    
+    # Change grouping: change embeddings, clustered per tenant (see services/change_grouping.py)
+    CHANGE_EMBEDDER: str = os.getenv("CHANGE_EMBEDDER", "hashing")  # hashing (local, deterministic), openai
+    CHANGE_EMBEDDING_DIM: int = int(os.getenv("CHANGE_EMBEDDING_DIM", "256"))  # hashing embedder only
+    CHANGE_EMBEDDING_MODEL: str = os.getenv("CHANGE_EMBEDDING_MODEL", "text-embedding-3-small")  # openai embedder
+    CHANGE_CLUSTER_THRESHOLD: float = float(os.getenv("CHANGE_CLUSTER_THRESHOLD", "0.6"))  # Cosine to a cluster's leader
+    CHANGE_REUSE_THRESHOLD: float = float(os.getenv("CHANGE_REUSE_THRESHOLD", "0.95"))  # Near-identical: reuse analysis
+    CHANGE_REUSE_MIN_TOKENS: int = int(os.getenv("CHANGE_REUSE_MIN_TOKENS", "5"))  # Edited words needed for reuse
+    CHANGE_CLUSTER_WINDOW_DAYS: int = int(os.getenv("CHANGE_CLUSTER_WINDOW_DAYS", "14"))  # Changes grouped with recent ones only
+    CHANGE_LSH_TABLES: int = int(os.getenv("CHANGE_LSH_TABLES", "16"))
+    CHANGE_LSH_BITS: int = int(os.getenv("CHANGE_LSH_BITS", "7"))  # Hyperplanes per table
+    CHANGE_LSH_MIN_ROWS: int = int(os.getenv("CHANGE_LSH_MIN_ROWS", "2000"))  # Smaller indexes are searched exactly
+    CHANGE_INDEX_CACHE_SIZE: int = int(os.getenv("CHANGE_INDEX_CACHE_SIZE", "64"))  # Tenant indexes kept per process
+    
+    # Screenshot renditions: WebP tiles, a thumbnail and change crops per snapshot (see services/renditions.py)
+    RENDITIONS_ENABLED: bool = os.getenv("RENDITIONS_ENABLED", "true").lower() == "true"
+    RENDITION_TILE_WIDTH: int = int(os.getenv("RENDITION_TILE_WIDTH", "1280"))  # Wider screenshots are scaled down
+    RENDITION_TILE_HEIGHT: int = int(os.getenv("RENDITION_TILE_HEIGHT", "1024"))  # Rows per tile, at tile width
+    RENDITION_THUMB_WIDTH: int = int(os.getenv("RENDITION_THUMB_WIDTH", "400"))  # Thumbnail of the first screen
+    RENDITION_QUALITY: int = int(os.getenv("RENDITION_QUALITY", "75"))  # WebP quality, 0-100
+    RENDITION_MAX_PIXELS: int = int(os.getenv("RENDITION_MAX_PIXELS", "60000000"))  # Larger screenshots are not decoded
+    RENDITION_MAX_CROPS: int = int(os.getenv("RENDITION_MAX_CROPS", "8"))  # Changed regions cropped per snapshot
+    RENDITION_CROP_PADDING: int = int(os.getenv("RENDITION_CROP_PADDING", "48"))  # Context around a region, pixels
+    RENDITION_CACHE_MAX_AGE: int = int(os.getenv("RENDITION_CACHE_MAX_AGE", "604800"))  # Client cache, seconds
+    RENDITION_URL_TTL: int = int(os.getenv("RENDITION_URL_TTL", "3600"))  # Signed image URLs stay valid 1-2x this long
+    
+    # Snapshot retention, per plan: every snapshot for `full_days`, then one per
+    # day until `daily_days`, then one per week until `weekly_days` (None = forever)
+    RETENTION_POLICIES: dict = {
+        "free": {"full_days": 7, "daily_days": 30, "weekly_days": 180},
+        "pro": {"full_days": 14, "daily_days": 90, "weekly_days": 365},
+        "enterprise": {"full_days": 30, "daily_days": 180, "weekly_days": None},
+        "admin": {"full_days": 30, "daily_days": 180, "weekly_days": None},
+    }
+    RETENTION_BATCH_SIZE: int = int(os.getenv("RETENTION_BATCH_SIZE", "200"))
+    RETENTION_REENCODE_AFTER_DAYS: int = int(os.getenv("RETENTION_REENCODE_AFTER_DAYS", "7"))
+    ORPHAN_SCREENSHOT_GRACE_HOURS: int = int(os.getenv("ORPHAN_SCREENSHOT_GRACE_HOURS", "24"))
+    
+    # Notifications
+    SMTP_HOST: str = os.getenv("SMTP_HOST", "localhost")
+    SMTP_PORT: int = int(os.getenv("SMTP_PORT", "1025"))
+    SMTP_USERNAME: str = os.getenv("SMTP_USERNAME", "")
+    SMTP_PASSWORD: str = os.getenv("SMTP_PASSWORD", "")
+    SMTP_START_TLS: bool = os.getenv("SMTP_START_TLS", "False").lower() == "true"
+    SMTP_POOL_SIZE: int = int(os.getenv("SMTP_POOL_SIZE", "4"))
+    NOTIFY_FROM_EMAIL: str = os.getenv("NOTIFY_FROM_EMAIL", "alerts@pivotwatch.local")
+    NOTIFY_BATCH_SIZE: int = int(os.getenv("NOTIFY_BATCH_SIZE", "500"))
+    NOTIFY_CONCURRENCY: int = int(os.getenv("NOTIFY_CONCURRENCY", "20"))
+    NOTIFY_MAX_ATTEMPTS: int = int(os.getenv("NOTIFY_MAX_ATTEMPTS", "4"))
+    NOTIFY_BACKOFF_SECONDS: float = float(os.getenv("NOTIFY_BACKOFF_SECONDS", "1.0"))
+    NOTIFY_MAX_DISPATCHES: int = int(os.getenv("NOTIFY_MAX_DISPATCHES", "5"))  # Dispatch runs a change gets before its failed channels are given up
+    NOTIFY_RETRY_INTERVAL: int = int(os.getenv("NOTIFY_RETRY_INTERVAL", "600"))  # Seconds before the first of those retries; doubles each time
+    
+    # Live events (SSE)
+    EVENT_STREAM_MAXLEN: int = int(os.getenv("EVENT_STREAM_MAXLEN", "1000"))
+    EVENT_HEARTBEAT_SECONDS: int = int(os.getenv("EVENT_HEARTBEAT_SECONDS", "15"))
+    
+    # Snapshot diffs
+    DIFF_CACHE_SIZE: int = int(os.getenv("DIFF_CACHE_SIZE", "256"))  # In-process entries
+    DIFF_CACHE_MAX_BYTES: int = int(os.getenv("DIFF_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))  # In-process total, as JSON; larger diffs stay in Redis only
+    DIFF_CACHE_TTL: int = int(os.getenv("DIFF_CACHE_TTL", "86400"))  # Redis tier, seconds
+    DIFF_MAX_PAGE_SIZE: int = int(os.getenv("DIFF_MAX_PAGE_SIZE", "200"))  # Hunks per page
+    
+    # Exports
+    EXPORT_RETENTION_HOURS: int = int(os.getenv("EXPORT_RETENTION_HOURS", "72"))
+    
+    # Response cache
+    RESPONSE_CACHE_ENABLED: bool = os.getenv("RESPONSE_CACHE_ENABLED", "true").lower() == "true"
+    RESPONSE_CACHE_TTL: int = int(os.getenv("RESPONSE_CACHE_TTL", "600"))  # seconds
+    RESPONSE_CACHE_LOCAL_SIZE: int = int(os.getenv("RESPONSE_CACHE_LOCAL_SIZE", "1024"))  # entries
+    
+    # Diagnostics
+    METRICS_ENABLED: bool = os.getenv("METRICS_ENABLED", "true").lower() == "true"  # API /metrics endpoint
+    WORKER_METRICS_PORT: int = int(os.getenv("WORKER_METRICS_PORT", "9200"))  # Celery exporter base port, 0 = off
+    METRICS_BIND_ADDRESS: str = os.getenv("METRICS_BIND_ADDRESS", "0.0.0.0")
+    
+    # Tracing and profiling (opt-in). Traces are Chrome trace-event JSON files in TRACE_DIR.
+    TRACE_SAMPLE_RATE: float = float(os.getenv("TRACE_SAMPLE_RATE", "0"))  # Share of requests/tasks traced
+    TRACE_ALLOW_HEADER: bool = os.getenv("TRACE_ALLOW_HEADER", "False").lower() == "true"  # X-Trace / X-Profile
+    TRACE_TASKS: list = [t for t in os.getenv("TRACE_TASKS", "").split(",") if t]  # Always traced, e.g. scrape_company
+    TRACE_DIR: str = os.getenv("TRACE_DIR", "./traces")
+    TRACE_EXPORT_URL: str = os.getenv("TRACE_EXPORT_URL", "")  # Optional collector receiving each trace as JSON
+    TRACE_MAX_SPANS: int = int(os.getenv("TRACE_MAX_SPANS", "20000"))
+    PROFILE_MODE: str = os.getenv("PROFILE_MODE", "off")  # off, cprofile, sampler
+    PROFILE_SAMPLE_RATE: float = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+    PROFILE_SAMPLE_INTERVAL_MS: float = float(os.getenv("PROFILE_SAMPLE_INTERVAL_MS", "5"))
+    PROFILE_TASKS: list = [t for t in os.getenv("PROFILE_TASKS", "").split(",") if t]  # Profiled with PROFILE_MODE
+    QUERY_STATS_HEADER: bool = os.getenv("QUERY_STATS_HEADER", "False").lower() == "true"  # X-DB-Queries / X-DB-Time-Ms
     
     # App
     APP_NAME: str = "PivotWatch"
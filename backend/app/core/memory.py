@@ -0,0 +1,104 @@
+import os
+import resource
+import threading
+from typing import Optional
+from .config import settings
+
+# Memory readings for the scrape pipeline: process RSS (sampled for per-scrape
+# peaks) and container-level pressure, read from the cgroup so that every
+# worker process in the container sees the same number the OOM killer does.
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+def rss_bytes() -> int:
+    """Current resident set size of this process"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        # No procfs (macOS): fall back to the lifetime peak, in KiB on Linux and bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if os.uname().sysname == "Darwin" else peak * 1024
+
+def _read_int(path: str) -> Optional[int]:
+    try:
+        with open(path) as f:
+            value = f.read().strip()
+    except OSError:
+        return None
+    return int(value) if value.isdigit() else None  # cgroup v2 reports "max" when unlimited
+
+def _read_stat(path: str, key: str) -> int:
+    try:
+        with open(path) as f:
+            for line in f:
+                name, _, value = line.partition(" ")
+                if name == key:
+                    return int(value)
+    except (OSError, ValueError):
+        pass
+    return 0
+
+def memory_limit_bytes() -> Optional[int]:
+    """SCRAPE_MEMORY_LIMIT_MB if set, else the container's cgroup limit (None when unlimited)"""
+    if settings.SCRAPE_MEMORY_LIMIT_MB:
+        return settings.SCRAPE_MEMORY_LIMIT_MB * 1024 * 1024
+    limit = _read_int("/sys/fs/cgroup/memory.max")  # cgroup v2
+    if limit is None:
+        limit = _read_int("/sys/fs/cgroup/memory/memory.limit_in_bytes")  # cgroup v1
+        if limit is not None and limit >= 1 << 60:
+            limit = None  # v1 "unlimited" is a huge page-aligned number
+    return limit
+
+def memory_used_bytes() -> int:
+    """Container working set (usage minus reclaimable file cache), or this process's RSS outside a cgroup"""
+    usage = _read_int("/sys/fs/cgroup/memory.current")
+    if usage is not None:
+        return usage - _read_stat("/sys/fs/cgroup/memory.stat", "inactive_file")
+    usage = _read_int("/sys/fs/cgroup/memory/memory.usage_in_bytes")
+    if usage is not None:
+        return usage - _read_stat("/sys/fs/cgroup/memory/memory.stat", "total_inactive_file")
+    return rss_bytes()
+
+def memory_pressure() -> float:
+    """Share of the memory limit in use; 0 when there is no limit to measure against"""
+    limit = memory_limit_bytes()
+    if not limit:
+        return 0.0
+    return memory_used_bytes() / limit
+
+class PeakRss:
+    """
+    Highest RSS seen while a block runs, sampled every SCRAPE_RSS_SAMPLE_MS
+    
+    RSS is per process, so on a thread pool the peak includes whatever the
+    other threads held at the time; on prefork it is the scrape's own.
+    """
+    
+    def __init__(self, interval: Optional[float] = None):
+        self.interval = interval or settings.SCRAPE_RSS_SAMPLE_MS / 1000
+        self.baseline = 0
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+    
+    def __enter__(self) -> "PeakRss":
+        self.baseline = self.peak = rss_bytes()
+        self._thread.start()
+        return self
+    
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, rss_bytes())
+    
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, rss_bytes())
+    
+    def summary(self) -> dict:
+        """Snapshot metadata entry, in MiB"""
+        return {
+            "peak_rss_mb": round(self.peak / 1048576, 1),
+            "rss_growth_mb": round(max(self.peak - self.baseline, 0) / 1048576, 1),
+        }
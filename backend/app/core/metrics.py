@@ -0,0 +1,161 @@
+import time
+from contextlib import contextmanager
+from typing import Iterable, Optional
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, Counter, Gauge, Histogram, generate_latest, start_http_server
+from prometheus_client.core import GaugeMetricFamily
+from .config import settings
+from . import tracing
+
+# Celery queues whose backlog is reported as pivotwatch_queue_depth
+PIPELINE_QUEUES = ["celery", "scrape_priority", "scrape", "process", "llm", "media"]
+
+# Browser renders and LLM calls take seconds, not milliseconds
+SLOW_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120)
+SIZE_BUCKETS = (1e3, 5e3, 2e4, 1e5, 2.5e5, 5e5, 1e6, 2.5e6, 5e6)
+RSS_BUCKETS = tuple(mb * 1048576 for mb in (64, 128, 256, 512, 768, 1024, 1536, 2048, 3072, 4096))
+TOKEN_BUCKETS = (50, 100, 250, 500, 1000, 2000, 4000, 8000)
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "pivotwatch_http_request_duration_seconds", "API request latency", ["method", "route", "status"]
+)
+SCRAPE_STAGE_SECONDS = Histogram(
+    "pivotwatch_scrape_stage_seconds", "Duration of each scrape pipeline stage", ["stage"], buckets=SLOW_BUCKETS
+)
+DIFF_SECONDS = Histogram("pivotwatch_diff_seconds", "Text diff duration", ["kind"], buckets=SLOW_BUCKETS)
+DIFF_INPUT_CHARS = Histogram(
+    "pivotwatch_diff_input_chars", "Characters compared per diff (old + new)", ["kind"], buckets=SIZE_BUCKETS
+)
+LLM_SECONDS = Histogram(
+    "pivotwatch_llm_request_seconds", "LLM call latency", ["model", "outcome"], buckets=SLOW_BUCKETS
+)
+LLM_TOKENS = Histogram("pivotwatch_llm_tokens", "Tokens per LLM call", ["model", "kind"], buckets=TOKEN_BUCKETS)
+SCAN_QUEUE_WAIT_SECONDS = Histogram(
+    "pivotwatch_scan_queue_wait_seconds", "Time from enqueue to a scrape worker picking the scan up",
+    ["plan", "lane"], buckets=SLOW_BUCKETS + (300, 900, 1800, 3600)
+)
+SCRAPE_PEAK_RSS_BYTES = Histogram(
+    "pivotwatch_scrape_peak_rss_bytes", "Peak process RSS while a page was captured or parsed", ["stage"],
+    buckets=RSS_BUCKETS
+)
+TASK_SECONDS = Histogram("pivotwatch_task_duration_seconds", "Celery task run time", ["task"], buckets=SLOW_BUCKETS)
+
+CACHE_LOOKUPS = Counter("pivotwatch_cache_lookups_total", "Cache lookups by outcome", ["cache", "result"])
+SCANS_SKIPPED = Counter("pivotwatch_scans_skipped_total", "Scans or diffs that did no work", ["reason"])
+SCRAPE_SAFEGUARDS = Counter(
+    "pivotwatch_scrape_safeguards_total", "Memory safeguards applied to scrapes", ["action"]
+)  # truncated / spilled / lxml / degraded / deferred
+SCRAPE_FAILURES = Counter("pivotwatch_scrape_failures_total", "Failed page captures", ["mode"])
+CHANGE_GROUPING = Counter(
+    "pivotwatch_change_grouping_total", "Changes placed by semantic grouping", ["outcome"]
+)  # new_cluster / joined / analysis_reused / skipped
+RENDITIONS = Counter(
+    "pivotwatch_renditions_total", "Screenshot rendition runs by outcome", ["outcome"]
+)  # rendered / no_screenshot / failed
+TASK_FAILURES = Counter("pivotwatch_task_failures_total", "Celery task errors", ["task", "outcome"])  # failed / retried
+
+BROWSERS_OPEN = Gauge("pivotwatch_browsers_open", "Chromium instances currently running in this process")
+
+@contextmanager
+def timed(histogram: Histogram, *labels: str, span: Optional[str] = None):
+    """Observe the block's wall time on `histogram`, and record it as a trace span if named"""
+    started = time.perf_counter()
+    try:
+        if span:
+            with tracing.span(span):
+                yield
+        else:
+            yield
+    finally:
+        histogram.labels(*labels).observe(time.perf_counter() - started)
+
+class RuntimeCollector:
+    """
+    Gauges read at scrape time rather than kept up to date: Celery queue
+    depth (Redis list lengths), fair scheduler backlog and SQLAlchemy
+    connection pool usage
+    """
+    
+    def __init__(self, queues: Optional[Iterable[str]] = None):
+        self.queues = list(queues or [])
+    
+    @staticmethod
+    def _db_pool_family():
+        return GaugeMetricFamily("pivotwatch_db_pool_connections", "DB pool connections", labels=["state"])
+    
+    @staticmethod
+    def _queue_depth_family():
+        return GaugeMetricFamily("pivotwatch_queue_depth", "Messages waiting per Celery queue", labels=["queue"])
+    
+    @staticmethod
+    def _fair_queue_families():
+        return (
+            GaugeMetricFamily("pivotwatch_fair_tenants_waiting", "Tenants with scans in the fair queue", labels=["plan"]),
+            GaugeMetricFamily("pivotwatch_fair_scans_in_flight", "Dispatched scans not yet finished", labels=["plan"]),
+        )
+    
+    def describe(self):
+        # Lets the registry learn the names without touching Redis or the DB
+        yield self._db_pool_family()
+        if self.queues:
+            yield self._queue_depth_family()
+            yield from self._fair_queue_families()
+    
+    def collect(self):
+        from ..models.base import engine
+        pool = engine.pool
+        db_pool = self._db_pool_family()
+        db_pool.add_metric(["checked_out"], pool.checkedout())
+        db_pool.add_metric(["idle"], pool.checkedin())
+        db_pool.add_metric(["overflow"], max(pool.overflow(), 0))
+        db_pool.add_metric(["size"], pool.size())
+        yield db_pool
+        
+        if not self.queues:
+            return
+        depth = self._queue_depth_family()
+        tenants, in_flight = self._fair_queue_families()
+        try:
+            from .redis import get_redis
+            from ..services import fair_scheduler
+            plans = list(settings.SCAN_PLAN_WEIGHTS)
+            pipe = get_redis().pipeline()
+            for queue in self.queues:
+                pipe.llen(queue)
+            for plan in plans:
+                pipe.llen(fair_scheduler.TENANTS_KEY.format(plan=plan))
+                pipe.zcard(fair_scheduler.INFLIGHT_KEY.format(plan=plan))
+            results = pipe.execute()
+            for queue, length in zip(self.queues, results):
+                depth.add_metric([queue], length)
+            fair = results[len(self.queues):]
+            for i, plan in enumerate(plans):
+                tenants.add_metric([plan], fair[2 * i])
+                in_flight.add_metric([plan], fair[2 * i + 1])
+        except Exception:
+            return  # Redis down: omit the gauges rather than report zeros
+        yield depth
+        yield tenants
+        yield in_flight
+
+_collector_registered = False
+
+def register_runtime_collector(queues: Optional[Iterable[str]] = None):
+    """Add the pool/queue gauges to this process's registry (once)"""
+    global _collector_registered
+    if _collector_registered:
+        return
+    REGISTRY.register(RuntimeCollector(queues))
+    _collector_registered = True
+
+def render_latest():
+    """Body and content type for a /metrics response"""
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
+
+def start_exporter(port: int) -> bool:
+    """Serve this process's metrics on `port`; False when the port is taken"""
+    try:
+        start_http_server(port, addr=settings.METRICS_BIND_ADDRESS)
+        return True
+    except OSError as e:
+        print(f"⚠️  Metrics exporter could not bind port {port}: {e}")
+        return False
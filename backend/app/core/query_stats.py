@@ -0,0 +1,42 @@
+import time
+from contextvars import ContextVar
+from typing import Optional
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+class QueryStats:
+    """Statement count and time for one request"""
+    
+    __slots__ = ("count", "seconds")
+    
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+# Holds a mutable object so work done in threadpool copies of the context
+# (sync dependencies, run_in_threadpool) still lands on the request's stats
+_current: ContextVar[Optional[QueryStats]] = ContextVar("query_stats", default=None)
+
+def start_request() -> QueryStats:
+    stats = QueryStats()
+    _current.set(stats)
+    return stats
+
+def _before_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current.get() is not None:
+        conn.info["query_started"] = time.perf_counter()
+
+def _after_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _current.get()
+    if stats is None:
+        return
+    started = conn.info.pop("query_started", None)
+    stats.count += 1
+    if started is not None:
+        stats.seconds += time.perf_counter() - started
+
+def install(engine: Engine):
+    """Count statements executed on `engine` against the current request"""
+    if not event.contains(engine, "before_cursor_execute", _before_execute):
+        event.listen(engine, "before_cursor_execute", _before_execute)
+        event.listen(engine, "after_cursor_execute", _after_execute)
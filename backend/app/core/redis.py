@@ -0,0 +1,21 @@
+import redis
+from .config import settings
+
+_client = None
+
+def get_redis() -> redis.Redis:
+    """Return the process-wide Redis client (connections are pooled)"""
+    global _client
+    if _client is None:
+        _client = redis.Redis.from_url(settings.REDIS_URL, decode_responses=True)
+    return _client
+
+_async_client = None
+
+def get_async_redis():
+    """Return the asyncio Redis client used by the API process"""
+    global _async_client
+    if _async_client is None:
+        import redis.asyncio as aioredis
+        _async_client = aioredis.Redis.from_url(settings.REDIS_URL, decode_responses=True)
+    return _async_client
@@ -1,3 +1,6 @@
+import hashlib
+import hmac
+import time
 from datetime import datetime, timedelta
 from typing import Optional
 from jose import JWTError, jwt
@@ -32,4 +35,14 @@ def decode_access_token(token: str) -> Optional[dict]:
         payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
         return payload
     except JWTError:
-        return None
\ No newline at end of file
+        return None
+
+def sign_path(path: str, expires: int) -> str:
+    """HMAC that lets `path` be fetched without a bearer token until `expires` (unix time)"""
+    return hmac.new(settings.SECRET_KEY.encode(), f"{path}:{expires}".encode(), hashlib.sha256).hexdigest()
+
+def verify_path_signature(path: str, expires: Optional[int], signature: Optional[str]) -> bool:
+    """Check a `sign_path` signature and that it hasn't expired"""
+    if not expires or not signature or expires < time.time():
+        return False
+    return hmac.compare_digest(sign_path(path, expires), signature)
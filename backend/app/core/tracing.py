@@ -0,0 +1,248 @@
+import asyncio
+import cProfile
+import json
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+from .config import settings
+
+# Traces are written as Chrome trace-event JSON (chrome://tracing, Perfetto,
+# speedscope). Profiles are written next to them: cProfile as `.prof`
+# (snakeviz, flameprof) and the sampler as collapsed stacks `.folded`
+# (flamegraph.pl, speedscope, inferno).
+
+PROFILE_CPROFILE = "cprofile"
+PROFILE_SAMPLER = "sampler"
+
+class Trace:
+    """Spans recorded for one request or task"""
+    
+    def __init__(self, name: str, kind: str):
+        self.id = uuid.uuid4().hex[:16]
+        self.name = name
+        self.kind = kind
+        self.origin = time.perf_counter_ns()
+        self.events: List[Dict] = []
+        self.dropped = 0
+        self._lanes: Dict[int, int] = {}
+        self._lock = threading.Lock()
+    
+    def lane(self) -> int:
+        """Small track number per thread / asyncio task, so overlapping spans get their own row"""
+        try:
+            key = id(asyncio.current_task())
+        except RuntimeError:
+            key = threading.get_ident()
+        with self._lock:
+            return self._lanes.setdefault(key, len(self._lanes) + 1)
+    
+    def add(self, name: str, category: str, started_ns: int, ended_ns: int, args: Optional[Dict], lane: int):
+        with self._lock:
+            if len(self.events) >= settings.TRACE_MAX_SPANS:
+                self.dropped += 1
+                return
+            self.events.append({
+                "name": name,
+                "cat": category,
+                "ph": "X",
+                "ts": (started_ns - self.origin) / 1000,
+                "dur": (ended_ns - started_ns) / 1000,
+                "pid": os.getpid(),
+                "tid": lane,
+                "args": args or {},
+            })
+    
+    def to_chrome(self) -> Dict:
+        return {
+            "traceEvents": self.events,
+            "displayTimeUnit": "ms",
+            "otherData": {"trace_id": self.id, "name": self.name, "kind": self.kind, "dropped_spans": self.dropped},
+        }
+
+_current: ContextVar[Optional[Trace]] = ContextVar("trace", default=None)
+
+def current_trace() -> Optional[Trace]:
+    return _current.get()
+
+@contextmanager
+def span(name: str, category: str = "app", **args):
+    """Record a span on the active trace; a no-op (one contextvar read) otherwise"""
+    trace = _current.get()
+    if trace is None:
+        yield
+        return
+    lane = trace.lane()
+    started = time.perf_counter_ns()
+    try:
+        yield
+    finally:
+        trace.add(name, category, started, time.perf_counter_ns(), args, lane)
+
+def should_trace(forced: bool = False) -> bool:
+    return forced or (settings.TRACE_SAMPLE_RATE > 0 and random.random() < settings.TRACE_SAMPLE_RATE)
+
+def start_trace(name: str, kind: str) -> Trace:
+    trace = Trace(name, kind)
+    _current.set(trace)
+    return trace
+
+def finish_trace(trace: Trace, total_ns: Optional[int] = None) -> Optional[str]:
+    """Close the root span, detach the trace and export it"""
+    _current.set(None)
+    trace.add(trace.name, trace.kind, trace.origin, total_ns or time.perf_counter_ns(), {"trace_id": trace.id}, 0)
+    return export(trace)
+
+def _output_path(trace_or_name, suffix: str) -> str:
+    os.makedirs(settings.TRACE_DIR, exist_ok=True)
+    if isinstance(trace_or_name, Trace):
+        label, trace_id = f"{trace_or_name.kind}-{trace_or_name.name}", trace_or_name.id
+    else:
+        label, trace_id = trace_or_name, uuid.uuid4().hex[:16]
+    safe = "".join(c if c.isalnum() or c in "-_." else "_" for c in label)[:80]
+    return os.path.join(settings.TRACE_DIR, f"{time.strftime('%Y%m%dT%H%M%S')}-{safe}-{trace_id}{suffix}")
+
+def export(trace: Trace) -> Optional[str]:
+    """Write the trace file, and post it to TRACE_EXPORT_URL in the background if set"""
+    payload = trace.to_chrome()
+    path = None
+    try:
+        path = _output_path(trace, ".trace.json")
+        with open(path, "w") as f:
+            json.dump(payload, f, separators=(",", ":"))
+    except OSError as e:
+        print(f"⚠️  Failed to write trace {trace.id}: {e}")
+    if settings.TRACE_EXPORT_URL:
+        threading.Thread(target=_post, args=(payload,), daemon=True).start()
+    return path
+
+def _post(payload: Dict):
+    try:
+        import requests
+        requests.post(settings.TRACE_EXPORT_URL, json=payload, timeout=5)
+    except Exception as e:
+        print(f"⚠️  Failed to export trace: {e}")
+
+class StackSampler:
+    """
+    Statistical profiler: samples one thread's stack every `interval` seconds
+    
+    Cheap enough for production requests since the target thread is never
+    interrupted. On the API event loop the samples include whatever other
+    requests were running on that loop at the time.
+    """
+    
+    def __init__(self, thread_id: Optional[int] = None, interval: Optional[float] = None):
+        self.thread_id = thread_id or threading.get_ident()
+        self.interval = interval or settings.PROFILE_SAMPLE_INTERVAL_MS / 1000
+        self.stacks: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+    
+    def start(self):
+        self._thread.start()
+    
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+    
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                frame = frame.f_back
+            self.stacks[";".join(reversed(stack))] += 1
+    
+    def folded(self) -> str:
+        """Collapsed-stack lines: `frame;frame;frame count`"""
+        return "\n".join(f"{stack} {count}" for stack, count in self.stacks.most_common()) + "\n"
+
+# One profile per process at a time: cProfile can't nest, and overlapping
+# samplers on the same event loop would report the same stacks twice
+_profile_lock = threading.Lock()
+
+class Profile:
+    """A cProfile or sampler run around one request or task"""
+    
+    def __init__(self, mode: str, name: str):
+        self.mode = mode
+        self.name = name
+        self._profiler = cProfile.Profile() if mode == PROFILE_CPROFILE else StackSampler()
+    
+    def start(self) -> bool:
+        """Begin profiling; False (and nothing recorded) if another profile is running"""
+        if not _profile_lock.acquire(blocking=False):
+            return False
+        if self.mode == PROFILE_CPROFILE:
+            self._profiler.enable()
+        else:
+            self._profiler.start()
+        return True
+    
+    def stop(self) -> Optional[str]:
+        """Stop profiling and write the output file; returns its path"""
+        if self.mode == PROFILE_CPROFILE:
+            self._profiler.disable()
+        else:
+            self._profiler.stop()
+        _profile_lock.release()
+        try:
+            if self.mode == PROFILE_CPROFILE:
+                path = _output_path(self.name, ".prof")
+                self._profiler.dump_stats(path)
+            else:
+                path = _output_path(self.name, ".folded")
+                with open(path, "w") as f:
+                    f.write(self._profiler.folded())
+            return path
+        except OSError as e:
+            print(f"⚠️  Failed to write profile for {self.name}: {e}")
+            return None
+
+def profile_mode(requested: Optional[str] = None) -> Optional[str]:
+    """
+    The profiler to run, if any: an explicit request (header or task list)
+    wins, otherwise PROFILE_MODE applies at PROFILE_SAMPLE_RATE
+    """
+    if requested in (PROFILE_CPROFILE, PROFILE_SAMPLER):
+        return requested
+    if settings.PROFILE_MODE in (PROFILE_CPROFILE, PROFILE_SAMPLER) and \
+            random.random() < settings.PROFILE_SAMPLE_RATE:
+        return settings.PROFILE_MODE
+    return None
+
+_db_spans_installed = False
+
+def install_db_spans(engine):
+    """Record a span per SQL statement on traced requests and tasks (once per process)"""
+    global _db_spans_installed
+    if _db_spans_installed:
+        return
+    _db_spans_installed = True
+    from sqlalchemy import event
+    
+    def before(conn, cursor, statement, parameters, context, executemany):
+        if _current.get() is not None:
+            conn.info["trace_query_started"] = time.perf_counter_ns()
+    
+    def after(conn, cursor, statement, parameters, context, executemany):
+        trace = _current.get()
+        started = conn.info.pop("trace_query_started", None)
+        if trace is None or started is None:
+            return
+        trace.add("db.query", "db", started, time.perf_counter_ns(),
+                  {"statement": statement[:500], "rows": cursor.rowcount}, trace.lane())
+    
+    event.listen(engine, "before_cursor_execute", before)
+    event.listen(engine, "after_cursor_execute", after)
@@ -1,7 +1,9 @@
-from fastapi import FastAPI
+import time
+from fastapi import FastAPI, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
 from .core.config import settings
-from .api import companies, changes, auth, users
+from .core import metrics, query_stats, tracing
+from .api import companies, changes, auth, users, events, dashboard, exports, search, snapshots
 import os
 
 # Create upload directories
@@ -23,11 +25,81 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Per-request DB statement counts, for load tests and profiling
+if settings.QUERY_STATS_HEADER:
+    from .models.base import engine
+    query_stats.install(engine)
+    
+    @app.middleware("http")
+    async def add_query_stats(request: Request, call_next):
+        stats = query_stats.start_request()
+        response = await call_next(request)
+        response.headers["X-DB-Queries"] = str(stats.count)
+        response.headers["X-DB-Time-Ms"] = f"{stats.seconds * 1000:.2f}"
+        return response
+
+# Request latency by route template (not raw path) to keep label cardinality bounded
+if settings.METRICS_ENABLED:
+    metrics.register_runtime_collector(metrics.PIPELINE_QUEUES)
+    
+    @app.middleware("http")
+    async def record_request_latency(request: Request, call_next):
+        started = time.perf_counter()
+        status = 500
+        try:
+            response = await call_next(request)
+            status = response.status_code
+            return response
+        finally:
+            route = request.scope.get("route")
+            metrics.HTTP_REQUEST_SECONDS.labels(
+                request.method, route.path if route else "unmatched", str(status)
+            ).observe(time.perf_counter() - started)
+    
+    @app.get("/metrics", include_in_schema=False)
+    async def prometheus_metrics():
+        body, content_type = metrics.render_latest()
+        return Response(content=body, media_type=content_type)
+
+# Opt-in tracing and profiling: sampled by TRACE_SAMPLE_RATE / PROFILE_SAMPLE_RATE,
+# or forced per request with `X-Trace: 1` / `X-Profile: cprofile|sampler`
+# when TRACE_ALLOW_HEADER is set
+if settings.TRACE_SAMPLE_RATE > 0 or settings.PROFILE_SAMPLE_RATE > 0 or settings.TRACE_ALLOW_HEADER:
+    from .models.base import engine as _engine
+    tracing.install_db_spans(_engine)
+    
+    @app.middleware("http")
+    async def trace_request(request: Request, call_next):
+        headers = request.headers if settings.TRACE_ALLOW_HEADER else {}
+        trace = tracing.start_trace(f"{request.method} {request.url.path}", "request") \
+            if tracing.should_trace(headers.get("x-trace") == "1") else None
+        mode = tracing.profile_mode(headers.get("x-profile"))
+        profile = tracing.Profile(mode, f"request-{request.method}-{request.url.path}") if mode else None
+        if profile and not profile.start():
+            profile = None
+        try:
+            response = await call_next(request)
+        finally:
+            if profile:
+                profile_path = profile.stop()
+            if trace:
+                tracing.finish_trace(trace)
+        if trace:
+            response.headers["X-Trace-Id"] = trace.id
+        if profile and profile_path:
+            response.headers["X-Profile-File"] = os.path.basename(profile_path)
+        return response
+
 # Include routers
 app.include_router(auth.router, prefix="/api/auth", tags=["authentication"])
 app.include_router(users.router, prefix="/api/users", tags=["users"])
 app.include_router(companies.router, prefix="/api/companies", tags=["companies"])
 app.include_router(changes.router, prefix="/api/changes", tags=["changes"])
+app.include_router(events.router, prefix="/api/events", tags=["events"])
+app.include_router(dashboard.router, prefix="/api/dashboard", tags=["dashboard"])
+app.include_router(exports.router, prefix="/api/exports", tags=["exports"])
+app.include_router(search.router, prefix="/api/search", tags=["search"])
+app.include_router(snapshots.router, prefix="/api/snapshots", tags=["snapshots"])
 
 @app.get("/")
 async def root():
@@ -14,6 +14,8 @@ from . import company as _company  # noqa: F401
 from . import snapshot as _snapshot  # noqa: F401
 from . import change as _change  # noqa: F401
 from . import notification as _notification  # noqa: F401
+from . import dashboard_stat as _dashboard_stat  # noqa: F401
+from . import crawl_page as _crawl_page  # noqa: F401
 
 def get_db():
     db = SessionLocal()
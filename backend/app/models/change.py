@@ -1,6 +1,6 @@
-from sqlalchemy import Column, String, DateTime, Integer, Text, ForeignKey, JSON, Boolean
-from sqlalchemy.dialects.postgresql import UUID
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, String, DateTime, Integer, Float, Text, ForeignKey, JSON, Boolean, Computed, Index, LargeBinary
+from sqlalchemy.dialects.postgresql import UUID, TSVECTOR
+from sqlalchemy.orm import relationship, deferred
 from datetime import datetime
 import uuid
 from .base import Base
@@ -15,11 +15,32 @@ class Change(Base):
     detected_at = Column(DateTime, default=datetime.utcnow)
     significance_score = Column(Integer)
     category = Column(String(50))
+    region = Column(String(100))  # Watch region that changed; None for whole-page changes
+    page_url = Column(String(2000))  # Crawled subpage that changed; None for the company's own URL
     summary = Column(String(500))
     analysis = Column(Text)
     change_data = Column(JSON, default={})
-    notified = Column(Boolean, default=False)
+    notified = Column(Boolean, default=False)  # Delivered on every channel (or nothing to deliver)
+    notify_attempts = Column(Integer, default=0)  # Dispatch runs where a channel failed
+    notify_retry_at = Column(DateTime)  # Failed channels are retried from then
+    # Semantic grouping (services/change_grouping.py): float16 embedding of the diff text
+    embedding = deferred(Column(LargeBinary))
+    embedding_model = Column(String(100))
+    embedded_at = Column(DateTime)
+    cluster_id = Column(UUID(as_uuid=True))  # Id of the cluster's leader change (its own id for a leader)
+    cluster_similarity = Column(Float)  # Cosine to the leader
     created_at = Column(DateTime, default=datetime.utcnow)
+    # Summary weighted above the full analysis; refreshed by Postgres when analysis lands
+    search_vector = deferred(Column(TSVECTOR, Computed(
+        "setweight(to_tsvector('english', coalesce(summary, '') || ' ' || coalesce(category, '')), 'A') || "
+        "setweight(to_tsvector('english', coalesce(analysis, '')), 'B')",
+        persisted=True
+    )))
+    
+    __table_args__ = (
+        Index("ix_changes_search_vector", "search_vector", postgresql_using="gin"),
+        Index("ix_changes_cluster_id", "cluster_id"),
+    )
     
     # Relationships
     company = relationship("Company", back_populates="changes")
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, DateTime, Integer, Text, ForeignKey, Boolean
+from sqlalchemy import Column, String, DateTime, Integer, Text, ForeignKey, Boolean, JSON
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 from datetime import datetime
@@ -17,11 +17,16 @@ class Company(Base):
     scan_frequency = Column(String(50), default="daily")
     alert_threshold = Column(Integer, default=50)
     status = Column(String(50), default="active")
+    scrape_config = Column(JSON, default={})  # Per-company scraper options
+    content_history = Column(JSON, default=[])  # Fingerprints of the last few snapshots
     last_scanned = Column(DateTime)
     next_scan = Column(DateTime)
+    scan_failures = Column(Integer, default=0)  # Scheduled scans in a row that haven't completed
+    pages_discovered_at = Column(DateTime)  # Last crawl frontier refresh (multi-page mode)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     # Relationships
     snapshots = relationship("Snapshot", back_populates="company", cascade="all, delete-orphan")
-    changes = relationship("Change", back_populates="company", cascade="all, delete-orphan")
\ No newline at end of file
+    changes = relationship("Change", back_populates="company", cascade="all, delete-orphan")
+    pages = relationship("CrawlPage", back_populates="company", cascade="all, delete-orphan")
\ No newline at end of file
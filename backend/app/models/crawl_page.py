@@ -0,0 +1,43 @@
+from sqlalchemy import Column, String, DateTime, Integer, Float, ForeignKey, JSON, Index, UniqueConstraint
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.orm import relationship
+from datetime import datetime
+import uuid
+from .base import Base
+
+class CrawlPage(Base):
+    """
+    One page in a company's multi-page crawl frontier
+    
+    Pages are discovered from sitemaps and internal links; only `active`
+    ones (the best-ranked, up to the plan's page cap) are scanned.
+    """
+    __tablename__ = "crawl_pages"
+    
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    company_id = Column(UUID(as_uuid=True), ForeignKey("companies.id", ondelete="CASCADE"), nullable=False)
+    url = Column(String(2000), nullable=False)  # Normalized, see crawl_frontier.normalize_url
+    source = Column(String(20), default="link")  # sitemap, link
+    depth = Column(Integer, default=1)  # Link hops from the company URL
+    priority = Column(Float, default=0.5)
+    status = Column(String(20), default="active")  # active, excluded (over the page cap), gone
+    sitemap_lastmod = Column(DateTime)
+    etag = Column(String(500))
+    last_modified = Column(String(100))  # Last-Modified header, echoed as If-Modified-Since
+    content_hash = Column(String(64))
+    content_history = Column(JSON, default=[])  # Fingerprints of the last few snapshots
+    unchanged_scans = Column(Integer, default=0)  # Drives the rescan back-off
+    failures = Column(Integer, default=0)
+    discovered_at = Column(DateTime, default=datetime.utcnow)
+    last_seen_at = Column(DateTime, default=datetime.utcnow)  # Last listed in a sitemap or linked
+    last_scanned = Column(DateTime)
+    last_changed = Column(DateTime)
+    next_scan = Column(DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (
+        UniqueConstraint("company_id", "url", name="uq_crawl_pages_company_url"),
+        Index("ix_crawl_pages_due", "status", "next_scan"),
+    )
+    
+    # Relationships
+    company = relationship("Company", back_populates="pages")
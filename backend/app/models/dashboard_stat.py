@@ -0,0 +1,14 @@
+from sqlalchemy import Column, String, Date, Integer, ForeignKey
+from sqlalchemy.dialects.postgresql import UUID
+from .base import Base
+
+class DashboardStat(Base):
+    """Daily change counters per company, maintained by the pipeline tasks"""
+    __tablename__ = "dashboard_stats"
+    
+    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    company_id = Column(UUID(as_uuid=True), ForeignKey("companies.id", ondelete="CASCADE"), primary_key=True)
+    day = Column(Date, primary_key=True)
+    category = Column(String(50), primary_key=True)  # "pending" until analyzed
+    band = Column(String(20), primary_key=True)  # high / medium / low / pending
+    count = Column(Integer, nullable=False, default=0)
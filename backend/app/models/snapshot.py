@@ -1,6 +1,6 @@
-from sqlalchemy import Column, String, DateTime, Text, ForeignKey, JSON
-from sqlalchemy.dialects.postgresql import UUID
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, String, DateTime, Text, ForeignKey, JSON, Computed, Index
+from sqlalchemy.dialects.postgresql import UUID, TSVECTOR
+from sqlalchemy.orm import relationship, deferred
 from datetime import datetime
 import uuid
 from .base import Base
@@ -10,6 +10,7 @@ class Snapshot(Base):
     
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     company_id = Column(UUID(as_uuid=True), ForeignKey("companies.id", ondelete="CASCADE"))
+    page_url = Column(String(2000))  # Crawled subpage; None for the company's own URL
     timestamp = Column(DateTime, default=datetime.utcnow)
     title = Column(String(500))
     html_hash = Column(String(64))
@@ -17,7 +18,18 @@ class Snapshot(Base):
     html_content = Column(Text)  # Compressed in production
     screenshot_path = Column(String(500))
     snapshot_metadata = Column(JSON, default={})
+    scan_id = Column(String(64), unique=True)  # Idempotency key of the scan that produced it
     created_at = Column(DateTime, default=datetime.utcnow)
+    # Maintained by Postgres on insert/update; capped below the tsvector size limit
+    search_vector = deferred(Column(TSVECTOR, Computed(
+        "to_tsvector('english', coalesce(title, '') || ' ' || left(coalesce(text_content, ''), 500000))",
+        persisted=True
+    )))
+    
+    __table_args__ = (
+        Index("ix_snapshots_search_vector", "search_vector", postgresql_using="gin"),
+        Index("ix_snapshots_company_page_timestamp", "company_id", "page_url", "timestamp"),
+    )
     
     # Relationships
     company = relationship("Company", back_populates="snapshots")
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, DateTime, Boolean, Integer
+from sqlalchemy import Column, String, DateTime, Boolean, Integer, JSON
 from sqlalchemy.dialects.postgresql import UUID
 from datetime import datetime
 import uuid
@@ -13,5 +13,6 @@ class User(Base):
     name = Column(String(100))
     plan = Column(String(50), default="free")
     is_active = Column(Boolean, default=True)
+    notification_settings = Column(JSON, default={})  # email (bool), slack_webhook_url, webhook_url
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
\ No newline at end of file
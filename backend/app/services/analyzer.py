@@ -1,13 +1,14 @@
 import json
+import time
 from typing import Dict, List, Optional
-from langchain.chat_models import ChatOpenAI
-from langchain.schema import HumanMessage, SystemMessage
 from ..core.config import settings
+from ..core import metrics, tracing
 
 class ChangeAnalyzer:
     """AI-powered change significance analyzer"""
     
     def __init__(self):
+        from langchain.chat_models import ChatOpenAI  # Heavy; only LLM workers construct an analyzer
         self.llm = ChatOpenAI(
             model="gpt-4",
             temperature=0,
@@ -61,11 +62,21 @@ class ChangeAnalyzer:
         Analyze the strategic significance of these changes.
         """
         
+        from langchain.schema import HumanMessage, SystemMessage
+        model = getattr(self.llm, 'model_name', 'unknown')
+        started = time.perf_counter()
+        response = None
         try:
-            response = await self.llm.agenerate([
-                SystemMessage(content=system_prompt),
-                HumanMessage(content=human_prompt)
-            ])
+            with tracing.span('llm.generate', 'llm', model=model):
+                response = await self.llm.agenerate([
+                    SystemMessage(content=system_prompt),
+                    HumanMessage(content=human_prompt)
+                ])
+            metrics.LLM_SECONDS.labels(model, 'ok').observe(time.perf_counter() - started)
+            usage = (getattr(response, 'llm_output', None) or {}).get('token_usage') or {}
+            for kind in ('prompt_tokens', 'completion_tokens'):
+                if kind in usage:
+                    metrics.LLM_TOKENS.labels(model, kind.split('_')[0]).observe(usage[kind])
             
             # Parse JSON from response
             result_text = response.generations[0][0].text
@@ -79,6 +90,8 @@ class ChangeAnalyzer:
             return analysis
             
         except Exception as e:
+            if response is None:  # The call itself failed, not the parsing
+                metrics.LLM_SECONDS.labels(model, 'error').observe(time.perf_counter() - started)
             print(f"❌ LLM analysis failed: {e}")
             # Fallback to rule-based analysis
             return self._rule_based_fallback(change_summary)
@@ -0,0 +1,210 @@
+import re
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Set, Tuple
+from sqlalchemy.orm import Session
+from ..core.config import settings
+from ..core import metrics
+from ..core.redis import get_redis
+from ..models.change import Change
+from ..models.company import Company
+from .embeddings import from_bytes, get_embedder, to_bytes
+from .vector_index import VectorIndex
+
+# Groups a tenant's changes that describe the same event across competitors
+# (a new SOC 2 badge everywhere, an industry-wide price rise). Each change's
+# diff text is embedded when it reaches analysis and clustered incrementally
+# by leader clustering: it joins the recent cluster whose leader is most
+# similar (at least CHANGE_CLUSTER_THRESHOLD), or leads a new one. A change
+# nearly identical to an analyzed member of its cluster (at least
+# CHANGE_REUSE_THRESHOLD, and editing mostly the same words; see can_reuse)
+# takes over that analysis instead of a new LLM call. Clusters never cross
+# tenants.
+CLUSTER_LOCK_KEY = "pivotwatch:change-cluster-lock:{user_id}"
+
+# Version of change_text, stored with the model name: vectors of earlier
+# texts (section-only, then character-level sections in context) never share
+# an index with the current ones
+TEXT_VERSION = "lines"
+# Tenant indexes are rebuilt this often so changes that left the window are dropped
+INDEX_REBUILD_AFTER = timedelta(hours=6)
+# Share of edited words two changes must have in common for analysis reuse
+REUSE_MIN_OVERLAP = 0.8
+# Embedded rows written by other workers are picked up from this far behind the last load (clock skew)
+INDEX_LOAD_SLACK = timedelta(minutes=5)
+
+_indexes: "OrderedDict[Tuple[str, str], Dict]" = OrderedDict()
+_indexes_lock = threading.Lock()
+
+_TOKEN_RE = re.compile(r'\w+')
+
+def change_text(change_data: Optional[Dict]) -> str:
+    """
+    What a change says, for embedding: the text around each edit, new then old
+    
+    The diff's sections are whole changed lines (cut at 200 characters),
+    often short ones like a lone price; the context around them, up to 100
+    characters either side, says which plan or section the line belongs to.
+    """
+    parts = []
+    for c in (change_data or {}).get('changes', []):
+        new = (c.get('new_context') or c.get('new_section') or '').strip()
+        old = (c.get('old_context') or c.get('old_section') or '').strip()
+        if new:
+            parts.append(new)
+        if old and old != new:
+            parts.append(f"was: {old}")
+    return "\n".join(parts)
+
+def changed_tokens(change_data: Optional[Dict]) -> Set[str]:
+    """
+    Words the edit itself adds or removes
+    
+    Sections are whole lines, so for a replaced line only the words that
+    differ between its old and new version count; the rest of the line is
+    context that two unrelated edits to it would share.
+    """
+    tokens = set()
+    for c in (change_data or {}).get('changes', []):
+        old = set(_TOKEN_RE.findall((c.get('old_section') or '').lower()))
+        new = set(_TOKEN_RE.findall((c.get('new_section') or '').lower()))
+        tokens.update(old ^ new if old and new else old | new)
+    return tokens
+
+def can_reuse(change_data: Optional[Dict], source_data: Optional[Dict]) -> bool:
+    """
+    Whether an analysis may pass from the source change to this one
+    
+    Similar context is not enough: the edits themselves must be substantial
+    (CHANGE_REUSE_MIN_TOKENS words) and mostly the same words, so "$45 to
+    $46" never takes over "2025 to 2026", nor "not" another "not".
+    """
+    tokens, source_tokens = changed_tokens(change_data), changed_tokens(source_data)
+    if min(len(tokens), len(source_tokens)) < settings.CHANGE_REUSE_MIN_TOKENS:
+        return False
+    return len(tokens & source_tokens) / len(tokens | source_tokens) >= REUSE_MIN_OVERLAP
+
+def describe_change(change_data: Optional[Dict]) -> str:
+    """One-line summary of a change from its own text, for analyses taken over from another change"""
+    for c in (change_data or {}).get('changes', []):
+        old, new = (c.get('old_section') or '').strip(), (c.get('new_section') or '').strip()
+        if old and new:
+            return f"Replaced '{old[:100]}' with '{new[:100]}'"
+        if new:
+            return f"Added: '{new[:100]}'"
+        if old:
+            return f"Removed: '{old[:100]}'"
+    return "Website changes detected"
+
+def _window_start() -> datetime:
+    return datetime.utcnow() - timedelta(days=settings.CHANGE_CLUSTER_WINDOW_DAYS)
+
+def _tenant_index(db: Session, user_id, model: str, dim: int) -> VectorIndex:
+    """
+    The tenant's index of recent embedded changes, cached per process
+    
+    Each call tops the cached index up with changes embedded since the last
+    load, so a worker sees clusters formed by the others.
+    """
+    key = (str(user_id), model)
+    now = datetime.utcnow()
+    with _indexes_lock:
+        entry = _indexes.get(key)
+        if entry is None or entry['index'].dim != dim or now - entry['built_at'] > INDEX_REBUILD_AFTER:
+            entry = {'index': VectorIndex(dim), 'loaded_until': None, 'built_at': now}
+            _indexes[key] = entry
+        _indexes.move_to_end(key)
+        while len(_indexes) > settings.CHANGE_INDEX_CACHE_SIZE:
+            _indexes.popitem(last=False)
+    
+    query = db.query(Change.id, Change.embedding, Change.detected_at)\
+        .join(Company, Company.id == Change.company_id)\
+        .filter(Company.user_id == user_id,
+                Change.embedding_model == model,
+                Change.detected_at >= _window_start())
+    if entry['loaded_until'] is not None:
+        query = query.filter(Change.embedded_at >= entry['loaded_until'] - INDEX_LOAD_SLACK)
+    index = entry['index']
+    for change_id, embedding, detected_at in query:
+        vector = from_bytes(embedding)
+        if len(vector) == dim:
+            index.add(str(change_id), vector, detected_at.timestamp())
+    entry['loaded_until'] = now
+    return index
+
+def assign_cluster(db: Session, change: Change, user_id) -> Optional[Dict]:
+    """
+    Embed a change and place it in a cluster (commits)
+    
+    Returns the cluster id, the similarity to its leader, and `reuse_from`:
+    an analyzed, near-identical change of the same cluster whose analysis
+    this one can take over (or None). Returns None when the change has no
+    text to embed.
+    """
+    text = change_text(change.change_data)
+    if not text:
+        metrics.CHANGE_GROUPING.labels('skipped').inc()
+        return None
+    embedder = get_embedder()
+    model = f"{embedder.name}:{TEXT_VERSION}"
+    vector = embedder.embed([text])[0]
+    change_key = str(change.id)
+    since = _window_start().timestamp()
+    
+    # One placement at a time per tenant, so two near-identical changes
+    # arriving together don't each start a cluster
+    with get_redis().lock(CLUSTER_LOCK_KEY.format(user_id=user_id), timeout=60, blocking_timeout=30):
+        index = _tenant_index(db, user_id, model, len(vector))
+        neighbors = index.search(vector, k=20, min_score=settings.CHANGE_CLUSTER_THRESHOLD,
+                                 since=since, exclude=change_key)
+        members = {}
+        if neighbors:
+            members = {
+                str(cid): (cluster_id, analysis is not None)
+                for cid, cluster_id, analysis in db.query(Change.id, Change.cluster_id, Change.analysis)
+                .filter(Change.id.in_([cid for cid, _ in neighbors]))
+            }
+        
+        # Leader clustering: the best leader among the neighbors' clusters
+        cluster_id, similarity = change.id, 1.0
+        for neighbor_id, score in neighbors:
+            neighbor_cluster = members.get(neighbor_id, (None, False))[0]
+            if neighbor_cluster is None:
+                continue
+            leader = index.vector(str(neighbor_cluster))
+            leader_score = float(leader @ vector) if leader is not None else score  # Leader aged out of the window
+            if leader_score >= settings.CHANGE_CLUSTER_THRESHOLD and (cluster_id == change.id or leader_score > similarity):
+                cluster_id, similarity = neighbor_cluster, leader_score
+        
+        reuse_from = None
+        if cluster_id != change.id:
+            for neighbor_id, score in neighbors:  # Best first
+                neighbor_cluster, analyzed = members.get(neighbor_id, (None, False))
+                if score < settings.CHANGE_REUSE_THRESHOLD:
+                    break
+                if neighbor_cluster == cluster_id and analyzed:
+                    source = db.query(Change).filter(Change.id == neighbor_id).first()
+                    if source is not None and can_reuse(change.change_data, source.change_data):
+                        reuse_from = source
+                        break
+        
+        change.embedding = to_bytes(vector)
+        change.embedding_model = model
+        change.embedded_at = datetime.utcnow()
+        change.cluster_id = cluster_id
+        change.cluster_similarity = round(similarity, 4)
+        db.commit()
+        index.add(change_key, vector, change.detected_at.timestamp() if change.detected_at else 0.0)
+    
+    metrics.CHANGE_GROUPING.labels('new_cluster' if cluster_id == change.id else 'joined').inc()
+    return {"cluster_id": cluster_id, "similarity": similarity, "reuse_from": reuse_from}
+
+def related_changes(db: Session, change: Change, user_id, limit: int = 10,
+                    min_score: float = 0.5) -> List[Tuple[str, float]]:
+    """The tenant's recent changes most similar to `change`, as (id, cosine) pairs"""
+    if change.embedding is None or not change.embedding_model:
+        return []
+    vector = from_bytes(change.embedding)
+    index = _tenant_index(db, user_id, change.embedding_model, len(vector))
+    return index.search(vector, k=limit, min_score=min_score, exclude=str(change.id))
@@ -0,0 +1,38 @@
+import csv
+import io
+import json
+from typing import Dict, List
+from urllib.parse import urlparse
+
+def parse_import_rows(raw: bytes, fmt: str) -> List[Dict]:
+    """
+    Parse an uploaded company list into row dicts
+    
+    JSON may be a list of objects or {"companies": [...]}; CSV needs a header
+    row with at least a `url` column. Raises ValueError on malformed input.
+    """
+    text = raw.decode('utf-8-sig')
+    if fmt == 'json':
+        data = json.loads(text)
+        if isinstance(data, dict):
+            data = data.get('companies')
+        if not isinstance(data, list):
+            raise ValueError("Expected a JSON list of companies")
+        return [row if isinstance(row, dict) else {} for row in data]
+    
+    reader = csv.DictReader(io.StringIO(text))
+    if not reader.fieldnames or 'url' not in [f.strip().lower() for f in reader.fieldnames if f]:
+        raise ValueError("CSV must have a header row with a 'url' column")
+    rows = []
+    for row in reader:
+        rows.append({
+            key.strip().lower(): value.strip()
+            for key, value in row.items()
+            if key and isinstance(value, str) and value.strip()
+        })
+    return rows
+
+def default_name(url: str) -> str:
+    """Company name for rows that only give a URL"""
+    host = urlparse(url if '//' in url else f"//{url}").hostname or url
+    return host[4:] if host.startswith('www.') else host
@@ -0,0 +1,383 @@
+import asyncio
+import zlib
+from datetime import datetime, timedelta, timezone
+from fnmatch import fnmatch
+from typing import Dict, Iterable, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urljoin, urlparse, urlunparse
+from urllib.robotparser import RobotFileParser
+from ..core.config import settings
+from .http_client import USER_AGENT, get_http_client
+
+# Multi-page mode: besides its own URL, a company's important subpages
+# (pricing, careers, blog, ...) are discovered from its sitemaps and internal
+# links and kept in a per-company frontier (CrawlPage rows). Discovery ranks
+# what it finds; the best-ranked pages up to the plan's cap are `active` and
+# rescanned on a back-off schedule, which a newer sitemap `lastmod` cuts short.
+# lxml is imported where it is used: the API only ever reads the frontier.
+
+ASSET_EXTENSIONS = {
+    'pdf', 'zip', 'gz', 'tar', 'dmg', 'exe', 'msi', 'jpg', 'jpeg', 'png', 'gif', 'svg', 'webp', 'ico',
+    'mp4', 'webm', 'mov', 'mp3', 'wav', 'css', 'js', 'json', 'xml', 'rss', 'atom', 'txt', 'csv',
+    'woff', 'woff2', 'ttf', 'eot', 'doc', 'docx', 'xls', 'xlsx', 'ppt', 'pptx',
+}
+
+# Link-following fetches stop reading a page here; links past it are not worth the bytes
+LINK_FETCH_MAX_BYTES = 1024 * 1024
+LINK_FETCH_CONCURRENCY = 5
+
+# The sitemap protocol's own limit on an uncompressed file; also caps gzip bombs
+SITEMAP_MAX_BYTES = 50 * 1024 * 1024
+
+def normalize_url(url: str, base: Optional[str] = None) -> Optional[str]:
+    """
+    Canonical form used as the frontier key
+    
+    Lowercases scheme and host, drops fragments, tracking parameters, default
+    ports and trailing slashes, and sorts the query. Returns None for
+    anything that isn't an http(s) URL.
+    """
+    if base:
+        url = urljoin(base, url.strip())
+    parsed = urlparse(url.strip())
+    scheme = parsed.scheme.lower()
+    if scheme not in ('http', 'https') or not parsed.hostname:
+        return None
+    host = parsed.hostname.lower()
+    if parsed.port and parsed.port != (443 if scheme == 'https' else 80):
+        host = f"{host}:{parsed.port}"
+    query = sorted(
+        (key, value) for key, value in parse_qsl(parsed.query, keep_blank_values=True)
+        if not key.lower().startswith('utm_') and key.lower() not in ('gclid', 'fbclid', 'ref')
+    )
+    path = parsed.path or '/'
+    if len(path) > 1:
+        path = path.rstrip('/')
+    return urlunparse((scheme, host, path, '', urlencode(query), ''))
+
+def _site(url: str) -> str:
+    host = urlparse(url).hostname or ''
+    return host[4:] if host.startswith('www.') else host
+
+def same_site(url: str, root_url: str) -> bool:
+    """Same host as the company URL, ignoring a leading www."""
+    return _site(url) == _site(root_url)
+
+def max_pages_for(plan: Optional[str], scrape_config: Optional[Dict]) -> int:
+    """Subpages a company may monitor: the plan's cap, lowered by scrape_config["max_pages"]"""
+    cap = settings.CRAWL_MAX_PAGES.get(plan or "free", settings.CRAWL_MAX_PAGES["free"])
+    requested = (scrape_config or {}).get('max_pages')
+    if isinstance(requested, int) and requested >= 0:
+        cap = min(cap, requested)
+    return cap
+
+def multi_page_enabled(scrape_config: Optional[Dict]) -> bool:
+    return bool((scrape_config or {}).get('multi_page'))
+
+def is_candidate(url: str, root_url: str, scrape_config: Optional[Dict] = None) -> bool:
+    """
+    Whether a normalized URL may join the frontier
+    
+    `page_include` / `page_exclude` in scrape_config are shell-style path
+    patterns ("/blog/*"); with includes set, only matching paths qualify.
+    """
+    if not same_site(url, root_url) or url == normalize_url(root_url):
+        return False
+    path = urlparse(url).path
+    extension = path.rsplit('/', 1)[-1].rpartition('.')[2].lower() if '.' in path.rsplit('/', 1)[-1] else ''
+    if extension in ASSET_EXTENSIONS:
+        return False
+    config = scrape_config or {}
+    path = path.lower()
+    if any(fnmatch(path, pattern.lower()) for pattern in config.get('page_exclude', [])):
+        return False
+    include = config.get('page_include', [])
+    return not include or any(fnmatch(path, pattern.lower()) for pattern in include)
+
+def score(url: str, depth: int, sitemap_priority: Optional[float] = None) -> float:
+    """
+    Rank a page for the frontier; higher is scanned first
+    
+    Section pages whose path names something competitors change
+    (CRAWL_PRIORITY_PATHS) rank highest, pages under them next; deep paths
+    and pages found only by following links rank lower.
+    """
+    segments = [segment for segment in urlparse(url).path.lower().split('/') if segment]
+    value = sitemap_priority if sitemap_priority is not None else 0.5
+    for index, segment in enumerate(segments):
+        if any(segment.startswith(keyword) for keyword in settings.CRAWL_PRIORITY_PATHS):
+            value += 1.0 if index == len(segments) - 1 else 0.3
+            break
+    value -= 0.1 * max(len(segments) - 1, 0)
+    value -= 0.2 * max(depth - 1, 0)
+    return round(value, 3)
+
+def next_interval(unchanged_scans: int) -> timedelta:
+    """Rescan interval: CRAWL_MIN_INTERVAL_HOURS, doubling per unchanged scan up to CRAWL_MAX_INTERVAL_HOURS"""
+    hours = settings.CRAWL_MIN_INTERVAL_HOURS * 2 ** min(max(unchanged_scans, 0), 16)
+    return timedelta(hours=min(hours, settings.CRAWL_MAX_INTERVAL_HOURS))
+
+def parse_lastmod(value: Optional[str]) -> Optional[datetime]:
+    """W3C datetime from a sitemap (date, or date and time with offset) as naive UTC"""
+    if not value:
+        return None
+    value = value.strip()
+    if value.endswith('Z'):
+        value = value[:-1] + '+00:00'
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        return None
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+def _local_name(tag) -> str:
+    return tag.rpartition('}')[2] if isinstance(tag, str) else ''
+
+def _child_text(element, name: str) -> Optional[str]:
+    for child in element:
+        if _local_name(child.tag) == name:
+            return (child.text or '').strip() or None
+    return None
+
+async def _fetch_sitemap(client, url: str, max_urls: int) -> Tuple[List[Dict], List[str]]:
+    """
+    Stream-parse one sitemap (or sitemap index), gzipped or not
+    
+    Returns (pages, child sitemap URLs). Elements are cleared as they are
+    read, so memory stays flat however large the file is.
+    """
+    from lxml import etree
+    parser = etree.XMLPullParser(events=('end',), resolve_entities=False, no_network=True)
+    pages, children = [], []
+    inflate = None
+    size = 0
+    async with client.stream('GET', url) as response:
+        if response.is_error:
+            raise Exception(f"HTTP {response.status_code}: {response.reason_phrase}")
+        async for chunk in response.aiter_bytes():
+            if inflate is None:
+                # .xml.gz is served as a gzip file, not with a gzip Content-Encoding
+                inflate = zlib.decompressobj(16 + zlib.MAX_WBITS) if chunk[:2] == b'\x1f\x8b' else False
+            if inflate:
+                chunk = inflate.decompress(chunk, SITEMAP_MAX_BYTES - size + 1)
+            size += len(chunk)
+            if size > SITEMAP_MAX_BYTES:
+                print(f"⚠️  Sitemap {url} is over {SITEMAP_MAX_BYTES} bytes, keeping what was read")
+                break
+            parser.feed(chunk)
+            for _, element in parser.read_events():
+                name = _local_name(element.tag)
+                if name == 'url':
+                    loc = _child_text(element, 'loc')
+                    if loc:
+                        priority = _child_text(element, 'priority')
+                        try:
+                            priority = float(priority) if priority else None
+                        except ValueError:
+                            priority = None
+                        pages.append({'url': loc, 'lastmod': parse_lastmod(_child_text(element, 'lastmod')),
+                                      'priority': priority})
+                elif name == 'sitemap':
+                    loc = _child_text(element, 'loc')
+                    if loc:
+                        children.append(loc)
+                else:
+                    continue
+                element.clear()
+            if len(pages) >= max_urls:
+                break
+    return pages[:max_urls], children
+
+async def fetch_sitemap_entries(client, sitemap_urls: Iterable[str]) -> List[Dict]:
+    """Walk sitemaps and sitemap indexes breadth first, within CRAWL_SITEMAP_MAX_FILES / _MAX_URLS"""
+    queue, seen, entries = list(sitemap_urls), set(), []
+    while queue and len(seen) < settings.CRAWL_SITEMAP_MAX_FILES and len(entries) < settings.CRAWL_SITEMAP_MAX_URLS:
+        url = queue.pop(0)
+        if url in seen:
+            continue
+        seen.add(url)
+        try:
+            pages, children = await _fetch_sitemap(client, url, settings.CRAWL_SITEMAP_MAX_URLS - len(entries))
+        except Exception as e:
+            print(f"⚠️  Sitemap {url} unreadable: {str(e)}")
+            continue
+        entries.extend(pages)
+        queue.extend(children)
+    return entries
+
+async def _fetch_robots(client, root_url: str) -> RobotFileParser:
+    robots = RobotFileParser()
+    try:
+        response = await client.get(urljoin(root_url, '/robots.txt'))
+        robots.parse(response.text.splitlines() if response.status_code == 200 else [])
+    except Exception:
+        robots.parse([])
+    return robots
+
+def extract_links(html: str, base_url: str) -> List[str]:
+    """Normalized http(s) links of an HTML page, in document order"""
+    import lxml.html
+    try:
+        document = lxml.html.document_fromstring(html)
+    except Exception:
+        return []
+    base = document.find('.//base[@href]')
+    base_url = urljoin(base_url, base.get('href')) if base is not None else base_url
+    links = []
+    for anchor in document.iter('a'):
+        href = anchor.get('href')
+        if href and (anchor.get('rel') or '').lower() != 'nofollow':
+            url = normalize_url(href, base_url)
+            if url:
+                links.append(url)
+    return links
+
+async def _fetch_links(client, url: str) -> List[str]:
+    """Links of a page fetched without a browser, reading at most LINK_FETCH_MAX_BYTES"""
+    body, size = [], 0
+    try:
+        async with client.stream('GET', url) as response:
+            if response.is_error or 'html' not in response.headers.get('content-type', 'text/html'):
+                return []
+            async for chunk in response.aiter_text():
+                body.append(chunk)
+                size += len(chunk)
+                if size >= LINK_FETCH_MAX_BYTES:
+                    break
+            final_url = str(response.url)
+    except Exception as e:
+        print(f"⚠️  Could not follow links on {url}: {str(e)}")
+        return []
+    return extract_links(''.join(body), final_url)
+
+async def discover_pages(root_url: str, scrape_config: Optional[Dict], max_pages: int) -> List[Dict]:
+    """
+    Find a company's candidate subpages, best first
+    
+    Reads robots.txt (for `Sitemap:` lines and Disallow rules), the
+    sitemaps, and internal links up to CRAWL_MAX_DEPTH hops, fetching at
+    most `max_pages` pages per hop beyond the first. Returns at most
+    `max_pages * CRAWL_FRONTIER_FACTOR` entries with url, source, depth,
+    lastmod and priority.
+    """
+    root = normalize_url(root_url)
+    if not root or max_pages <= 0:
+        return []
+    client = get_http_client()
+    robots = await _fetch_robots(client, root)
+    found: Dict[str, Dict] = {}
+    
+    def add(url: Optional[str], source: str, depth: int, lastmod: Optional[datetime] = None,
+            sitemap_priority: Optional[float] = None):
+        url = normalize_url(url) if url else None
+        if not url or not is_candidate(url, root, scrape_config) or not robots.can_fetch(USER_AGENT, url):
+            return
+        entry = found.get(url)
+        if entry is None:
+            found[url] = {'url': url, 'source': source, 'depth': depth, 'lastmod': lastmod,
+                          'sitemap_priority': sitemap_priority}
+            return
+        entry['depth'] = min(entry['depth'], depth)
+        if source == 'sitemap':
+            entry.update(source='sitemap', lastmod=lastmod, sitemap_priority=sitemap_priority)
+    
+    sitemap_urls = robots.site_maps() or [urljoin(root, '/sitemap.xml')]
+    for entry in await fetch_sitemap_entries(client, sitemap_urls):
+        add(entry['url'], 'sitemap', 1, entry['lastmod'], entry['priority'])
+    
+    # Follow internal links, a bounded number of pages per hop
+    semaphore = asyncio.Semaphore(LINK_FETCH_CONCURRENCY)
+    
+    async def links_of(url: str) -> List[str]:
+        async with semaphore:
+            return await _fetch_links(client, url)
+    
+    level, visited = [root], {root}
+    for depth in range(1, settings.CRAWL_MAX_DEPTH + 1):
+        results = await asyncio.gather(*(links_of(url) for url in level))
+        for links in results:
+            for link in links:
+                add(link, 'link', depth)
+        reached = [url for url, entry in found.items() if entry['depth'] == depth and url not in visited]
+        reached.sort(key=lambda url: score(url, depth, found[url]['sitemap_priority']), reverse=True)
+        level = reached[:max_pages]
+        visited.update(level)
+        if not level:
+            break
+    
+    entries = list(found.values())
+    for entry in entries:
+        entry['priority'] = score(entry['url'], entry['depth'], entry.pop('sitemap_priority'))
+    entries.sort(key=lambda entry: entry['priority'], reverse=True)
+    return entries[:max_pages * settings.CRAWL_FRONTIER_FACTOR]
+
+def merge_frontier(db, company, discovered: List[Dict], max_pages: int) -> Dict[str, int]:
+    """
+    Fold a discovery run into the company's CrawlPage rows
+    
+    New pages are added and due at once; a sitemap `lastmod` newer than the
+    page's last scan makes it due again. The best-ranked pages up to
+    `max_pages` become `active`, the rest `excluded`; pages no longer listed
+    or linked are marked `gone`, and the frontier is trimmed to
+    `max_pages * CRAWL_FRONTIER_FACTOR` rows. Commits nothing.
+    """
+    from ..models.crawl_page import CrawlPage
+    now = datetime.utcnow()
+    pages = {page.url: page for page in db.query(CrawlPage).filter(CrawlPage.company_id == company.id)}
+    added = 0
+    for entry in discovered:
+        page = pages.get(entry['url'])
+        if page is None:
+            page = CrawlPage(company_id=company.id, url=entry['url'], discovered_at=now, next_scan=now,
+                             content_history=[], unchanged_scans=0, failures=0)
+            db.add(page)
+            pages[entry['url']] = page
+            added += 1
+        elif page.status == 'gone':
+            page.failures = 0
+        page.source = entry['source']
+        page.depth = entry['depth']
+        page.priority = entry['priority']
+        page.last_seen_at = now
+        lastmod = entry.get('lastmod')
+        if lastmod and (page.sitemap_lastmod is None or lastmod > page.sitemap_lastmod):
+            page.sitemap_lastmod = lastmod
+            if page.last_scanned and lastmod > page.last_scanned:
+                page.next_scan = now  # The sitemap says it changed since we looked
+    
+    listed = {entry['url'] for entry in discovered}
+    ranked = sorted(
+        (page for page in pages.values() if page.url in listed or not discovered),
+        key=lambda page: (page.priority or 0, -(page.discovered_at or now).timestamp()),
+        reverse=True
+    )
+    ranked = [page for page in ranked if page.status != 'gone' or page.url in listed]
+    for index, page in enumerate(ranked):
+        status = 'active' if index < max_pages else 'excluded'
+        if status == 'active' and page.status != 'active':
+            page.next_scan = min(page.next_scan or now, now)
+        page.status = status
+    
+    # An empty discovery is more likely a fetch failure than a site without pages
+    gone = 0
+    if discovered:
+        for page in pages.values():
+            if page.url not in listed and page.status != 'gone':
+                page.status = 'gone'
+                gone += 1
+    
+    removed = 0
+    limit = max_pages * settings.CRAWL_FRONTIER_FACTOR
+    if len(pages) > limit:
+        order = {'active': 0, 'excluded': 1, 'gone': 2}
+        for page in sorted(pages.values(), key=lambda page: (order.get(page.status, 2), -(page.priority or 0)))[limit:]:
+            if page in db.new:
+                db.expunge(page)
+            else:
+                db.delete(page)
+            removed += 1
+    
+    company.pages_discovered_at = now
+    return {"discovered": len(discovered), "added": added, "active": min(len(ranked), max_pages),
+            "gone": gone, "removed": removed}
@@ -0,0 +1,82 @@
+from datetime import datetime
+from typing import Optional
+from sqlalchemy import func
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+from ..models.change import Change
+from ..models.company import Company
+from ..models.dashboard_stat import DashboardStat
+
+PENDING = "pending"
+HIGH = "high"
+MEDIUM = "medium"
+LOW = "low"
+
+def significance_band(score: Optional[int]) -> str:
+    """Bucket a score the same way the dashboard colours it"""
+    if score is None:
+        return PENDING
+    if score >= 70:
+        return HIGH
+    if score >= 40:
+        return MEDIUM
+    return LOW
+
+def bump_change_stat(db: Session, user_id, company_id, detected_at: Optional[datetime],
+                     category: str, band: str, delta: int = 1):
+    """
+    Add `delta` to one counter row (upsert)
+    
+    Runs in the caller's transaction so the counter moves together with the
+    change row it describes.
+    """
+    day = (detected_at or datetime.utcnow()).date()
+    stmt = insert(DashboardStat).values(
+        user_id=user_id, company_id=company_id, day=day, category=category, band=band, count=delta
+    )
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=[DashboardStat.user_id, DashboardStat.company_id, DashboardStat.day,
+                        DashboardStat.category, DashboardStat.band],
+        set_={'count': DashboardStat.count + delta}
+    ))
+
+def record_detected_change(db: Session, user_id, company_id, detected_at: Optional[datetime]):
+    """A new change starts out counted as pending analysis"""
+    bump_change_stat(db, user_id, company_id, detected_at, PENDING, PENDING)
+
+def record_analyzed_change(db: Session, user_id, company_id, detected_at: Optional[datetime],
+                           category: Optional[str], score: Optional[int]):
+    """Move a change from pending to its analyzed category and band"""
+    bump_change_stat(db, user_id, company_id, detected_at, PENDING, PENDING, delta=-1)
+    bump_change_stat(db, user_id, company_id, detected_at, category or 'other', significance_band(score))
+
+def rebuild_dashboard_stats(db: Session) -> int:
+    """
+    Recompute every counter from the changes table
+    
+    Only needed to backfill or repair drift; the tasks keep the counters
+    current. Returns the number of counter rows written.
+    """
+    day = func.date(Change.detected_at)
+    rows = db.query(
+        Company.user_id, Change.company_id, day, Change.category, Change.significance_score, func.count()
+    )\
+        .join(Company, Company.id == Change.company_id)\
+        .group_by(Company.user_id, Change.company_id, day, Change.category, Change.significance_score)\
+        .all()
+    
+    counters = {}
+    for user_id, company_id, change_day, category, score, count in rows:
+        if score is None:
+            key = (user_id, company_id, change_day, PENDING, PENDING)
+        else:
+            key = (user_id, company_id, change_day, category or 'other', significance_band(score))
+        counters[key] = counters.get(key, 0) + count
+    
+    db.query(DashboardStat).delete(synchronize_session=False)
+    db.bulk_insert_mappings(DashboardStat, [
+        {'user_id': u, 'company_id': c, 'day': d, 'category': cat, 'band': band, 'count': n}
+        for (u, c, d, cat, band), n in counters.items()
+    ])
+    db.commit()
+    return len(counters)
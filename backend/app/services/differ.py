@@ -0,0 +1,165 @@
+import json
+from difflib import SequenceMatcher
+from typing import Callable, Dict, List, Tuple
+from ..core.cache import LRUCache
+from ..core.config import settings
+from ..core import metrics
+from ..core.redis import get_redis
+
+CACHE_KEY = "pivotwatch:snapshot-diff:{old_id}:{new_id}:{context}"
+
+# Bounded by entry count and by the entries' serialized (JSON) size
+_cache = LRUCache(settings.DIFF_CACHE_SIZE, max_bytes=settings.DIFF_CACHE_MAX_BYTES)
+
+def _intern_lines(old_lines: List[str], new_lines: List[str]):
+    """Map each distinct line to a small int so matching compares ints, not strings"""
+    ids: Dict[str, int] = {}
+    old = [ids.setdefault(line, len(ids)) for line in old_lines]
+    new = [ids.setdefault(line, len(ids)) for line in new_lines]
+    return old, new
+
+def _group_opcodes(opcodes: List[Tuple], context: int) -> List[List[Tuple]]:
+    """Split opcodes into hunks with `context` equal lines around each change (as difflib does)"""
+    if not any(tag != 'equal' for tag, *_ in opcodes):
+        return []
+    codes = list(opcodes)
+    if codes[0][0] == 'equal':
+        tag, i1, i2, j1, j2 = codes[0]
+        codes[0] = tag, max(i1, i2 - context), i2, max(j1, j2 - context), j2
+    if codes[-1][0] == 'equal':
+        tag, i1, i2, j1, j2 = codes[-1]
+        codes[-1] = tag, i1, min(i2, i1 + context), j1, min(j2, j1 + context)
+    
+    groups, group = [], []
+    for tag, i1, i2, j1, j2 in codes:
+        # A long unchanged run closes the current hunk and opens the next
+        if tag == 'equal' and i2 - i1 > 2 * context:
+            group.append((tag, i1, min(i2, i1 + context), j1, min(j2, j1 + context)))
+            groups.append(group)
+            group = []
+            i1, j1 = max(i1, i2 - context), max(j1, j2 - context)
+        group.append((tag, i1, i2, j1, j2))
+    if group and not (len(group) == 1 and group[0][0] == 'equal'):
+        groups.append(group)
+    return groups
+
+def line_opcodes(old_lines: List[str], new_lines: List[str]) -> List[Tuple]:
+    """
+    SequenceMatcher opcodes over two line lists
+    
+    The common prefix and suffix are trimmed before matching, so the cost
+    scales with the changed region rather than the page. Adjacent equal runs
+    are merged and empty opcodes dropped.
+    """
+    old, new = _intern_lines(old_lines, new_lines)
+    
+    prefix = 0
+    limit = min(len(old), len(new))
+    while prefix < limit and old[prefix] == new[prefix]:
+        prefix += 1
+    suffix = 0
+    while suffix < limit - prefix and old[-1 - suffix] == new[-1 - suffix]:
+        suffix += 1
+    
+    middle = SequenceMatcher(None, old[prefix:len(old) - suffix], new[prefix:len(new) - suffix], autojunk=False)
+    opcodes = []
+    if prefix:
+        opcodes.append(('equal', 0, prefix, 0, prefix))
+    for tag, i1, i2, j1, j2 in middle.get_opcodes():
+        opcodes.append((tag, i1 + prefix, i2 + prefix, j1 + prefix, j2 + prefix))
+    if suffix:
+        opcodes.append(('equal', len(old) - suffix, len(old), len(new) - suffix, len(new)))
+    
+    # Merge adjacent equal runs left by the trimming
+    merged = []
+    for op in opcodes:
+        if merged and merged[-1][0] == op[0] == 'equal':
+            merged[-1] = ('equal', merged[-1][1], op[2], merged[-1][3], op[4])
+        elif op[1] != op[2] or op[3] != op[4]:
+            merged.append(op)
+    return merged
+
+def diff_texts(old_text: str, new_text: str, context: int = 3) -> Dict:
+    """
+    Line-level unified diff of two snapshot texts
+    
+    Matching is done by `line_opcodes`, so the cost scales with the changed
+    region rather than the page. Returns stats and the full hunk list;
+    callers paginate.
+    """
+    old_lines = (old_text or '').splitlines()
+    new_lines = (new_text or '').splitlines()
+    merged = line_opcodes(old_lines, new_lines)
+    
+    hunks = []
+    added = removed = 0
+    for group in _group_opcodes(merged, context):
+        lines = []
+        for tag, i1, i2, j1, j2 in group:
+            if tag == 'equal':
+                lines.extend({'op': ' ', 'text': line} for line in old_lines[i1:i2])
+                continue
+            if tag in ('replace', 'delete'):
+                lines.extend({'op': '-', 'text': line} for line in old_lines[i1:i2])
+                removed += i2 - i1
+            if tag in ('replace', 'insert'):
+                lines.extend({'op': '+', 'text': line} for line in new_lines[j1:j2])
+                added += j2 - j1
+        hunks.append({
+            'old_start': group[0][1] + 1,
+            'old_lines': group[-1][2] - group[0][1],
+            'new_start': group[0][3] + 1,
+            'new_lines': group[-1][4] - group[0][3],
+            'lines': lines,
+        })
+    
+    unchanged = sum(i2 - i1 for tag, i1, i2, _, _ in merged if tag == 'equal')
+    total = len(old_lines) + len(new_lines)
+    return {
+        'stats': {
+            'old_lines': len(old_lines),
+            'new_lines': len(new_lines),
+            'added': added,
+            'removed': removed,
+            'hunks': len(hunks),
+            'similarity': round(2.0 * unchanged / total, 4) if total else 1.0,
+        },
+        'hunks': hunks,
+    }
+
+def get_snapshot_diff(old_id: str, new_id: str, load_texts: Callable[[], Tuple[str, str]],
+                      context: int = 3) -> Dict:
+    """
+    Diff two snapshots, cached by snapshot-id pair
+    
+    Snapshots are immutable, so entries never need invalidating: they sit in
+    an in-process LRU (capped at DIFF_CACHE_MAX_BYTES of JSON, so one huge
+    diff can't pin the worker's memory) backed by a copy in Redis shared
+    across API workers. `load_texts` is only called on a miss.
+    """
+    key = CACHE_KEY.format(old_id=old_id, new_id=new_id, context=context)
+    result = _cache.get(key)
+    if result is not None:
+        metrics.CACHE_LOOKUPS.labels('diff', 'hit_local').inc()
+        return result
+    
+    try:
+        cached = get_redis().get(key)
+    except Exception:
+        cached = None
+    if cached:
+        metrics.CACHE_LOOKUPS.labels('diff', 'hit_redis').inc()
+        result = json.loads(cached)
+    else:
+        metrics.CACHE_LOOKUPS.labels('diff', 'miss').inc()
+        old_text, new_text = load_texts()
+        with metrics.timed(metrics.DIFF_SECONDS, 'lines', span='diff.lines'):
+            result = diff_texts(old_text, new_text, context)
+        metrics.DIFF_INPUT_CHARS.labels('lines').observe(len(old_text) + len(new_text))
+        cached = json.dumps(result, separators=(',', ':'))
+        try:
+            get_redis().set(key, cached, ex=settings.DIFF_CACHE_TTL)
+        except Exception:
+            pass  # The in-process tier still applies
+    _cache.set(key, result, size=len(cached))
+    return result
@@ -0,0 +1,76 @@
+import hashlib
+import math
+import re
+from collections import Counter
+from typing import List, Optional
+import numpy as np
+from ..core.config import settings
+
+# Text embedders for change grouping. Every embedder returns L2-normalized
+# float32 vectors, so cosine similarity is a dot product, and has a `name`
+# stored next to each vector: vectors from different models never meet in
+# one index.
+
+_TOKEN_RE = re.compile(r'\w+')
+
+class HashingEmbedder:
+    """
+    Deterministic local embedder: signed feature hashing of words and word bigrams
+    
+    No model, no network and the same vector on every machine, so it is the
+    default and what tests and benchmarks use. It captures wording overlap,
+    not meaning: "price increase" and "raised prices" land far apart.
+    """
+    
+    def __init__(self, dim: Optional[int] = None):
+        self.dim = dim or settings.CHANGE_EMBEDDING_DIM
+        self.name = f"hashing-{self.dim}"
+    
+    def _features(self, text: str) -> Counter:
+        tokens = _TOKEN_RE.findall(text.lower())
+        features = Counter(tokens)
+        features.update(f"{a} {b}" for a, b in zip(tokens, tokens[1:]))
+        return features
+    
+    def embed(self, texts: List[str]) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for feature, count in self._features(text).items():
+                digest = hashlib.blake2b(feature.encode(), digest_size=8).digest()
+                value = int.from_bytes(digest, 'big')
+                sign = 1.0 if value >> 63 else -1.0
+                vectors[row, value % self.dim] += sign * (1.0 + math.log(count))  # Sublinear term frequency
+        return normalize(vectors)
+
+class OpenAIEmbedder:
+    """OpenAI embeddings (CHANGE_EMBEDDING_MODEL) through langchain, like the analyzer's LLM"""
+    
+    def __init__(self, model: Optional[str] = None):
+        from langchain.embeddings import OpenAIEmbeddings  # Heavy; only LLM workers embed
+        self.model = model or settings.CHANGE_EMBEDDING_MODEL
+        self.name = f"openai-{self.model}"
+        self.client = OpenAIEmbeddings(model=self.model, openai_api_key=settings.OPENAI_API_KEY)
+    
+    def embed(self, texts: List[str]) -> np.ndarray:
+        return normalize(np.asarray(self.client.embed_documents(texts), dtype=np.float32))
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    """Scale rows to unit length (all-zero rows stay zero)"""
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+_embedder = None
+
+def get_embedder():
+    """The configured embedder (CHANGE_EMBEDDER), built once per process"""
+    global _embedder
+    if _embedder is None:
+        _embedder = OpenAIEmbedder() if settings.CHANGE_EMBEDDER == "openai" else HashingEmbedder()
+    return _embedder
+
+def to_bytes(vector: np.ndarray) -> bytes:
+    """Storage form: float16, half the size of float32 with no visible effect on cosine ranking"""
+    return np.asarray(vector, dtype=np.float16).tobytes()
+
+def from_bytes(data: bytes) -> np.ndarray:
+    return np.frombuffer(data, dtype=np.float16).astype(np.float32)
@@ -0,0 +1,42 @@
+import json
+from datetime import datetime
+from typing import Dict, Optional
+from ..core.config import settings
+from ..core.redis import get_redis
+
+# Each user has a capped Redis stream (replay for Last-Event-ID) and a
+# pub/sub channel (wakes connected SSE clients)
+STREAM_KEY = "pivotwatch:events:{user_id}"
+CHANNEL_KEY = "pivotwatch:events-live:{user_id}"
+
+SCAN_STARTED = "scan.started"
+SCAN_COMPLETED = "scan.completed"
+SCAN_FAILED = "scan.failed"
+CHANGE_DETECTED = "change.detected"
+CHANGE_ANALYZED = "change.analyzed"
+
+def publish_event(user_id, event_type: str, data: Optional[Dict] = None) -> Optional[str]:
+    """
+    Publish an event to a user's live feed
+    
+    Best effort: a Redis hiccup must never fail the task that emits it.
+    Returns the event id (the stream entry id).
+    """
+    if not user_id:
+        return None
+    payload = json.dumps({
+        "type": event_type,
+        "data": data or {},
+        "at": datetime.utcnow().isoformat(),
+    }, default=str)
+    try:
+        r = get_redis()
+        event_id = r.xadd(
+            STREAM_KEY.format(user_id=user_id), {"payload": payload},
+            maxlen=settings.EVENT_STREAM_MAXLEN, approximate=True
+        )
+        r.publish(CHANNEL_KEY.format(user_id=user_id), json.dumps({"id": event_id, "payload": payload}))
+        return event_id
+    except Exception as e:
+        print(f"⚠️  Failed to publish {event_type} event: {e}")
+        return None
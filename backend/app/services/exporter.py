@@ -0,0 +1,220 @@
+import csv
+import io
+import json
+import os
+import uuid
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List, Optional, Sequence
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from ..core.config import settings
+from ..core.redis import get_redis
+from ..models.change import Change
+from ..models.company import Company
+from ..models.snapshot import Snapshot
+
+NDJSON = "ndjson"
+CSV = "csv"
+COLUMNAR = "columnar"
+FORMATS = (NDJSON, CSV, COLUMNAR)
+
+JOB_KEY = "pivotwatch:export-job:{job_id}"
+
+CHANGES = "changes"
+SNAPSHOTS = "snapshots"
+
+MEDIA_TYPES = {
+    NDJSON: "application/x-ndjson",
+    CSV: "text/csv",
+    COLUMNAR: "application/x-ndjson",
+}
+EXTENSIONS = {NDJSON: ".ndjson", CSV: ".csv", COLUMNAR: ".columnar.ndjson"}
+
+# Rows fetched per round trip on the server-side cursor, and rows per
+# columnar row group
+BATCH_SIZE = 1000
+
+# (name, column, columnar type); "dict" columns are dictionary-encoded per row group
+CHANGE_COLUMNS = [
+    ("id", Change.id, "string"),
+    ("company_id", Change.company_id, "string"),
+    ("company_name", Company.name, "dict"),
+    ("detected_at", Change.detected_at, "timestamp"),
+    ("significance_score", Change.significance_score, "int"),
+    ("category", Change.category, "dict"),
+    ("region", Change.region, "dict"),
+    ("page_url", Change.page_url, "dict"),
+    ("summary", Change.summary, "string"),
+    ("old_snapshot_id", Change.old_snapshot_id, "string"),
+    ("new_snapshot_id", Change.new_snapshot_id, "string"),
+]
+
+SNAPSHOT_COLUMNS = [
+    ("id", Snapshot.id, "string"),
+    ("company_id", Snapshot.company_id, "string"),
+    ("company_name", Company.name, "dict"),
+    ("timestamp", Snapshot.timestamp, "timestamp"),
+    ("page_url", Snapshot.page_url, "dict"),
+    ("title", Snapshot.title, "string"),
+    ("html_hash", Snapshot.html_hash, "string"),
+]
+
+def apply_change_filters(query, company_id=None, min_significance: int = 0,
+                         from_date: Optional[datetime] = None, to_date: Optional[datetime] = None,
+                         category: Optional[str] = None):
+    """The `list_changes` filters, shared by the list endpoint and exports"""
+    if company_id:
+        query = query.filter(Change.company_id == company_id)
+    
+    if min_significance > 0:
+        query = query.filter(Change.significance_score >= min_significance)
+    
+    if from_date:
+        query = query.filter(Change.detected_at >= from_date)
+    
+    if to_date:
+        query = query.filter(Change.detected_at <= to_date)
+    
+    if category:
+        query = query.filter(Change.category == category)
+    
+    return query
+
+def _export_statement(kind: str, user_id, filters: Dict, include_text: bool = False):
+    """Column-only SELECT for an export (no ORM objects are built)"""
+    if kind == CHANGES:
+        columns = list(CHANGE_COLUMNS)
+        stmt = select(*[c for _, c, _ in columns])\
+            .join(Company, Company.id == Change.company_id)\
+            .where(Company.user_id == user_id)
+        stmt = apply_change_filters(stmt, **filters).order_by(Change.detected_at, Change.id)
+    elif kind == SNAPSHOTS:
+        columns = list(SNAPSHOT_COLUMNS)
+        if include_text:
+            columns.append(("text_content", Snapshot.text_content, "string"))
+        stmt = select(*[c for _, c, _ in columns])\
+            .join(Company, Company.id == Snapshot.company_id)\
+            .where(Company.user_id == user_id)
+        if filters.get("company_id"):
+            stmt = stmt.where(Snapshot.company_id == filters["company_id"])
+        if filters.get("from_date"):
+            stmt = stmt.where(Snapshot.timestamp >= filters["from_date"])
+        if filters.get("to_date"):
+            stmt = stmt.where(Snapshot.timestamp <= filters["to_date"])
+        stmt = stmt.order_by(Snapshot.timestamp, Snapshot.id)
+    else:
+        raise ValueError(f"Unknown export kind: {kind}")
+    return stmt, columns
+
+def _iter_batches(db: Session, stmt) -> Iterator[Sequence]:
+    """Read through a server-side cursor, BATCH_SIZE rows at a time"""
+    result = db.execute(stmt.execution_options(stream_results=True, yield_per=BATCH_SIZE))
+    for partition in result.partitions():
+        yield partition
+
+def _value(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if value is None or isinstance(value, (int, float, str)):
+        return value
+    return str(value)
+
+def _ndjson(batches, names: List[str]) -> Iterator[bytes]:
+    for batch in batches:
+        yield "".join(
+            json.dumps(dict(zip(names, map(_value, row))), separators=(",", ":")) + "\n"
+            for row in batch
+        ).encode()
+
+def _csv(batches, names: List[str]) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(names)
+    for batch in batches:
+        writer.writerows([_value(v) for v in row] for row in batch)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+def _columnar(batches, columns) -> Iterator[bytes]:
+    """
+    Row groups of column vectors, one JSON document per line
+    
+    The first line is the schema; each following line holds up to BATCH_SIZE
+    rows as {"rows": n, "columns": {name: values}}. "dict" columns are sent as
+    {"dictionary": [...], "codes": [...]}, which keeps repeated company names
+    and categories small.
+    """
+    schema = {
+        "format": "pivotwatch-columnar",
+        "version": 1,
+        "columns": [{"name": name, "type": kind} for name, _, kind in columns],
+    }
+    yield (json.dumps(schema) + "\n").encode()
+    for batch in batches:
+        group = {}
+        for index, (name, _, kind) in enumerate(columns):
+            values = [_value(row[index]) for row in batch]
+            if kind == "dict":
+                dictionary = {}
+                codes = [dictionary.setdefault(v, len(dictionary)) for v in values]
+                group[name] = {"dictionary": list(dictionary), "codes": codes}
+            else:
+                group[name] = values
+        yield (json.dumps({"rows": len(batch), "columns": group}, separators=(",", ":")) + "\n").encode()
+
+def iter_export(db: Session, user_id, kind: str, fmt: str, filters: Optional[Dict] = None,
+                include_text: bool = False) -> Iterator[bytes]:
+    """
+    Stream a user's changes or snapshots in `fmt`
+    
+    Memory stays bounded by BATCH_SIZE whatever the size of the result.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown export format: {fmt}")
+    stmt, columns = _export_statement(kind, user_id, filters or {}, include_text)
+    batches = _iter_batches(db, stmt)
+    names = [name for name, _, _ in columns]
+    if fmt == NDJSON:
+        return _ndjson(batches, names)
+    if fmt == CSV:
+        return _csv(batches, names)
+    return _columnar(batches, columns)
+
+def create_export_job(user_id, kind: str, fmt: str, filters: Dict) -> str:
+    """Register a background export; its state lives in Redis until it expires"""
+    job_id = uuid.uuid4().hex
+    key = JOB_KEY.format(job_id=job_id)
+    r = get_redis()
+    r.hset(key, mapping={
+        "user_id": str(user_id),
+        "kind": kind,
+        "format": fmt,
+        "filters": json.dumps(filters, default=str),
+        "status": "queued",
+        "created_at": datetime.utcnow().isoformat(),
+    })
+    r.expire(key, settings.EXPORT_RETENTION_HOURS * 3600)
+    return job_id
+
+def update_export_job(job_id: str, **fields):
+    get_redis().hset(JOB_KEY.format(job_id=job_id), mapping={k: str(v) for k, v in fields.items()})
+
+def get_export_job(job_id: str) -> Optional[Dict]:
+    job = get_redis().hgetall(JOB_KEY.format(job_id=job_id))
+    return job or None
+
+def find_expired_exports(export_dir: str, max_age: timedelta) -> List[str]:
+    """Export blobs older than `max_age` (their job records have expired too)"""
+    if not os.path.isdir(export_dir):
+        return []
+    cutoff = (datetime.utcnow() - max_age).timestamp()
+    expired = []
+    for dirpath, _, filenames in os.walk(export_dir):
+        for name in filenames:
+            path = os.path.join(dirpath, name)
+            if os.path.getmtime(path) < cutoff:
+                expired.append(path)
+    return expired
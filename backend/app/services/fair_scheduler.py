@@ -0,0 +1,220 @@
+import json
+import time
+from typing import Callable, Dict, List, Optional
+from ..core.config import settings
+from ..core.redis import get_redis
+
+# Scheduled scans wait in per-tenant lists instead of going straight to
+# Celery. A single dispatcher (beat, every SCAN_DISPATCH_INTERVAL) moves
+# them onto the scrape queue:
+#   - across plans by weighted round robin, weighted by SCAN_PLAN_WEIGHTS
+#   - across tenants of one plan by plain round robin, one scan per turn
+#   - never past a plan's cluster-wide concurrency or per-minute quota, or
+#     SCAN_GLOBAL_CONCURRENCY in total
+# A tenant with 500 due URLs therefore gets one slot per turn like everyone
+# else on its plan, and can't starve other plans at all.
+# Scheduled scans take their lease only when dispatched, so a long backlog
+# never outlives SCAN_LEASE_TTL; QUEUED_KEY keeps one pending request per
+# company (or page) instead.
+PENDING_KEY = "pivotwatch:fair:pending:{user_id}"  # list of scan requests (JSON)
+QUEUED_KEY = "pivotwatch:fair:queued"  # zset subject (company or company:page) -> submit time
+TENANTS_KEY = "pivotwatch:fair:tenants:{plan}"  # rotation of tenants with pending scans
+TENANT_SET_KEY = "pivotwatch:fair:tenant-set:{plan}"  # same tenants, for O(1) membership
+INFLIGHT_KEY = "pivotwatch:fair:inflight:{plan}"  # zset scan_id -> dispatch time
+RATE_KEY = "pivotwatch:fair:rate:{plan}:{minute}"  # scans dispatched in a minute
+CREDITS_KEY = "pivotwatch:fair:credits"  # hash plan -> weighted round robin credit
+MANUAL_RATE_KEY = "pivotwatch:fair:manual:{user_id}:{minute}"
+DISPATCH_LOCK_KEY = "pivotwatch:fair:dispatch-lock"
+
+LANE_SCHEDULED = "scheduled"
+LANE_MANUAL = "manual"
+
+# Append a request and put the tenant in rotation if it wasn't already;
+# -1 when the subject already has a (recent) pending request
+_SUBMIT_SCRIPT = """
+local queued_at = redis.call('zscore', KEYS[4], ARGV[3])
+if queued_at and tonumber(queued_at) > tonumber(ARGV[5]) then
+    return -1
+end
+redis.call('zadd', KEYS[4], ARGV[4], ARGV[3])
+redis.call('rpush', KEYS[1], ARGV[1])
+if redis.call('sadd', KEYS[3], ARGV[2]) == 1 then
+    redis.call('rpush', KEYS[2], ARGV[2])
+end
+return redis.call('llen', KEYS[1])
+"""
+
+# Pop a tenant's next request; take the tenant out of rotation once drained
+_POP_SCRIPT = """
+local item = redis.call('lpop', KEYS[1])
+if redis.call('llen', KEYS[1]) == 0 then
+    redis.call('srem', KEYS[3], ARGV[1])
+    redis.call('lrem', KEYS[2], 0, ARGV[1])
+end
+return item
+"""
+
+# A pending marker older than this is treated as lost (e.g. its request was dropped) and replaced
+QUEUED_MAX_AGE = 24 * 3600
+
+def _subject(company_id: str, page_id: Optional[str]) -> str:
+    return f"{company_id}:{page_id}" if page_id else company_id
+
+def plan_of(plan: Optional[str]) -> str:
+    """Plans without a scheduling policy are treated as free"""
+    return plan if plan in settings.SCAN_PLAN_WEIGHTS else "free"
+
+def _minute() -> int:
+    return int(time.time() // 60)
+
+def submit(company_id: str, url: str, scan_id: str, user_id: str, plan: Optional[str],
+           page_id: Optional[str] = None) -> int:
+    """
+    Queue a scheduled scan for its tenant; returns the tenant's backlog
+    
+    Returns -1 without queueing when the company (or page) already has a
+    scan waiting.
+    """
+    plan = plan_of(plan)
+    now = time.time()
+    request = json.dumps({
+        "company_id": company_id,
+        "url": url,
+        "scan_id": scan_id,
+        "user_id": user_id,
+        "plan": plan,
+        "queued_at": now,
+        "page_id": page_id,
+    })
+    return get_redis().eval(
+        _SUBMIT_SCRIPT, 4,
+        PENDING_KEY.format(user_id=user_id), TENANTS_KEY.format(plan=plan), TENANT_SET_KEY.format(plan=plan),
+        QUEUED_KEY, request, user_id, _subject(company_id, page_id), now, now - QUEUED_MAX_AGE
+    )
+
+def allow_manual(user_id: str) -> bool:
+    """Per-tenant budget for the manual fast lane; over budget, scans join the fair queue"""
+    r = get_redis()
+    key = MANUAL_RATE_KEY.format(user_id=user_id, minute=_minute())
+    pipe = r.pipeline()
+    pipe.incr(key)
+    pipe.expire(key, 120)
+    count, _ = pipe.execute()
+    return count <= settings.MANUAL_SCANS_PER_MINUTE
+
+def mark_dispatched(scan_id: str, plan: str):
+    """Count a scan against its plan's concurrency and per-minute quotas"""
+    r = get_redis()
+    plan = plan_of(plan)
+    rate_key = RATE_KEY.format(plan=plan, minute=_minute())
+    pipe = r.pipeline()
+    pipe.zadd(INFLIGHT_KEY.format(plan=plan), {scan_id: time.time()})
+    pipe.incr(rate_key)
+    pipe.expire(rate_key, 120)
+    pipe.execute()
+
+def release_slot(scan_id: str):
+    """Free the scan's concurrency slot (called when its lease is released)"""
+    pipe = get_redis().pipeline()
+    for plan in settings.SCAN_PLAN_WEIGHTS:
+        pipe.zrem(INFLIGHT_KEY.format(plan=plan), scan_id)
+    pipe.execute()
+
+def _inflight(r, plan: str) -> int:
+    key = INFLIGHT_KEY.format(plan=plan)
+    # Slots of scans that died without releasing their lease expire with it
+    r.zremrangebyscore(key, 0, time.time() - settings.SCAN_LEASE_TTL)
+    return r.zcard(key)
+
+def _next_request(r, plan: str) -> Optional[Dict]:
+    """Round-robin: take the tenant at the head of the rotation, pop one scan, rotate"""
+    tenants_key = TENANTS_KEY.format(plan=plan)
+    while True:
+        user_id = r.lmove(tenants_key, tenants_key, "LEFT", "RIGHT")
+        if user_id is None:
+            return None
+        raw = r.eval(_POP_SCRIPT, 3, PENDING_KEY.format(user_id=user_id), tenants_key,
+                     TENANT_SET_KEY.format(plan=plan), user_id)
+        if raw:
+            request = json.loads(raw)
+            r.zrem(QUEUED_KEY, _subject(request["company_id"], request.get("page_id")))
+            return request
+
+def dispatch(send: Callable[[Dict], bool]) -> Dict[str, int]:
+    """
+    Move pending scans onto the scrape queue within every quota
+    
+    `send(request)` enqueues one scan and returns False when it dropped the
+    request instead (the company is already being scanned); dropped
+    requests use no quota. Only one dispatcher runs at a time (Redis lock);
+    returns scans dispatched per plan.
+    """
+    r = get_redis()
+    if not r.set(DISPATCH_LOCK_KEY, "1", nx=True, ex=60):
+        return {}
+    try:
+        plans = sorted(settings.SCAN_PLAN_WEIGHTS, key=lambda p: -settings.SCAN_PLAN_WEIGHTS[p])
+        minute = _minute()
+        inflight = {plan: _inflight(r, plan) for plan in plans}
+        rates = dict(zip(plans, [int(v or 0) for v in r.mget(
+            [RATE_KEY.format(plan=plan, minute=minute) for plan in plans]
+        )]))
+        credits = {plan: float(v) for plan, v in r.hgetall(CREDITS_KEY).items()}
+        free_slots = settings.SCAN_GLOBAL_CONCURRENCY - sum(inflight.values())
+        dispatched = {plan: 0 for plan in plans}
+        
+        def eligible(plan: str) -> bool:
+            return inflight[plan] < settings.SCAN_PLAN_CONCURRENCY.get(plan, 1) and \
+                rates[plan] < settings.SCAN_PLAN_RATE_PER_MINUTE.get(plan, 1) and \
+                r.llen(TENANTS_KEY.format(plan=plan)) > 0
+        
+        # Smooth weighted round robin: every pick credits each eligible plan
+        # its weight and debits the winner the total, so plans interleave in
+        # proportion to their weights instead of the heaviest taking every
+        # free slot. Credits persist, so shares hold across dispatch runs.
+        active = [plan for plan in plans if eligible(plan)]
+        while free_slots > 0 and active:
+            total = sum(settings.SCAN_PLAN_WEIGHTS[plan] for plan in active)
+            for plan in active:
+                credits[plan] = credits.get(plan, 0.0) + settings.SCAN_PLAN_WEIGHTS[plan]
+            plan = max(active, key=lambda p: credits[p])
+            credits[plan] -= total
+            request = _next_request(r, plan)
+            if request is not None and send(request):
+                mark_dispatched(request["scan_id"], plan)
+                inflight[plan] += 1
+                rates[plan] += 1
+                dispatched[plan] += 1
+                free_slots -= 1
+            if request is None or not eligible(plan):
+                # A plan leaving the rotation keeps no credit (it would burst on return)
+                credits[plan] = 0.0
+                active.remove(plan)
+        
+        r.hset(CREDITS_KEY, mapping={plan: credits.get(plan, 0.0) for plan in plans})
+        return dispatched
+    finally:
+        r.delete(DISPATCH_LOCK_KEY)
+
+def get_scheduler_stats() -> Dict[str, Dict]:
+    """Backlog, tenants waiting, in-flight scans and this minute's dispatches per plan"""
+    r = get_redis()
+    minute = _minute()
+    stats = {}
+    for plan in settings.SCAN_PLAN_WEIGHTS:
+        tenants: List[str] = r.lrange(TENANTS_KEY.format(plan=plan), 0, -1)
+        pipe = r.pipeline()
+        for user_id in tenants:
+            pipe.llen(PENDING_KEY.format(user_id=user_id))
+        backlog = pipe.execute() if tenants else []
+        stats[plan] = {
+            "tenants_waiting": len(tenants),
+            "pending_scans": sum(backlog),
+            "largest_tenant_backlog": max(backlog, default=0),
+            "in_flight": _inflight(r, plan),
+            "dispatched_this_minute": int(r.get(RATE_KEY.format(plan=plan, minute=minute)) or 0),
+            "concurrency_limit": settings.SCAN_PLAN_CONCURRENCY.get(plan, 1),
+            "rate_limit_per_minute": settings.SCAN_PLAN_RATE_PER_MINUTE.get(plan, 1),
+            "weight": settings.SCAN_PLAN_WEIGHTS[plan],
+        }
+    return stats
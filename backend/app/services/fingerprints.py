@@ -0,0 +1,72 @@
+import hashlib
+from datetime import datetime
+from typing import Dict, List, Optional
+from ..core.config import settings
+from ..core.redis import get_redis
+
+STATS_KEY = "pivotwatch:state-match-stats"
+
+def content_fingerprint(text: str, html_hash: str, snapshot_id: str) -> Dict:
+    """Compact, JSON-serializable fingerprint of a snapshot's content"""
+    normalized = ' '.join((text or '').lower().split())
+    return {
+        'snapshot_id': snapshot_id,
+        'html_hash': html_hash,
+        'text_hash': hashlib.sha256(normalized.encode()).hexdigest()[:32],
+        'seen_at': datetime.utcnow().isoformat(),
+    }
+
+def find_recent_match(fingerprint: Dict, history: List[Dict], previous: Dict) -> Optional[Dict]:
+    """
+    Look for a recently seen state matching `fingerprint`
+    
+    Only states other than `previous` (the predecessor's fingerprint) count:
+    every history entry holding the predecessor's content is dropped, since
+    on a stable page older entries repeat it. A match needs the same
+    normalized-text hash; near duplicates are left to the diff, as a small
+    real edit is a near duplicate too. A state that already appears more
+    than once in the history is reported as an oscillation.
+    """
+    candidates = [
+        entry for entry in history
+        if entry.get('snapshot_id') != previous.get('snapshot_id')
+        and entry.get('html_hash') != previous.get('html_hash')
+        and entry.get('text_hash') != previous.get('text_hash')
+    ]
+    matches = [entry for entry in candidates if entry.get('text_hash') == fingerprint['text_hash']]
+    if not matches:
+        return None
+    latest = matches[-1]
+    return {
+        'snapshot_id': latest.get('snapshot_id'),
+        'exact': latest.get('html_hash') == fingerprint['html_hash'],  # Same markup too, not only the same text
+        'kind': 'oscillation' if len(matches) > 1 else 'revert',
+    }
+
+def append_history(history: List[Dict], fingerprint: Dict) -> List[Dict]:
+    """Add a fingerprint, keeping only the most recent entries"""
+    return (list(history) + [fingerprint])[-settings.CONTENT_HISTORY_SIZE:]
+
+def record_state_check(match: Optional[Dict]):
+    """Count a history lookup so the hit rate can be reported"""
+    r = get_redis()
+    pipe = r.pipeline()
+    pipe.hincrby(STATS_KEY, 'checks', 1)
+    if match:
+        pipe.hincrby(STATS_KEY, 'hits', 1)
+        pipe.hincrby(STATS_KEY, match['kind'], 1)
+    pipe.execute()
+
+def get_state_match_stats() -> Dict:
+    """Hit rate of revert/oscillation detection (each hit is one analysis skipped)"""
+    raw = get_redis().hgetall(STATS_KEY)
+    checks = int(raw.get('checks', 0))
+    hits = int(raw.get('hits', 0))
+    return {
+        'checks': checks,
+        'hits': hits,
+        'reverts': int(raw.get('revert', 0)),
+        'oscillations': int(raw.get('oscillation', 0)),
+        'hit_rate': hits / checks if checks else 0.0,
+        'analyses_skipped': hits,
+    }
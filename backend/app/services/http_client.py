@@ -0,0 +1,27 @@
+import asyncio
+import weakref
+import httpx
+from ..core.config import settings
+
+USER_AGENT = 'PivotWatch/1.0 (Competitor Monitoring Bot)'
+
+# One pooled client per event loop; httpx clients cannot cross loops
+_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = weakref.WeakKeyDictionary()
+
+def get_http_client() -> httpx.AsyncClient:
+    """Return the shared HTTP/2 connection pool for the running event loop"""
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None or client.is_closed:
+        client = httpx.AsyncClient(
+            http2=True,
+            follow_redirects=True,
+            timeout=httpx.Timeout(30.0, connect=10.0),
+            limits=httpx.Limits(
+                max_connections=settings.HTTP_POOL_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.HTTP_POOL_MAX_KEEPALIVE,
+            ),
+            headers={'User-Agent': USER_AGENT},
+        )
+        _clients[loop] = client
+    return client
@@ -0,0 +1,186 @@
+import asyncio
+import random
+from datetime import datetime
+from email.message import EmailMessage
+from typing import Awaitable, Callable, Collection, Dict, List, Optional
+from urllib.parse import urlparse
+import aiosmtplib
+from ..core.config import settings
+from .http_client import get_http_client
+from .webhooks import check_webhook_url, ensure_public
+
+EMAIL = 'email'
+SLACK = 'slack'
+WEBHOOK = 'webhook'
+
+def build_digest(user: Dict, changes: List[Dict]) -> Dict:
+    """
+    Render one digest covering all of a user's pending changes
+    
+    `user` has `email` and `notification_settings`; each change has
+    `company_name`, `significance_score`, `category`, `summary`, `region`,
+    `page_url` and `detected_at`.
+    """
+    changes = sorted(changes, key=lambda c: c['significance_score'] or 0, reverse=True)
+    top = changes[0]
+    subject = f"PivotWatch: {len(changes)} competitor change{'s' if len(changes) != 1 else ''}" \
+              f" (top: {top['company_name']}, {top['significance_score']}%)"
+    
+    lines = []
+    for c in changes:
+        where = f" [{c['region']}]" if c.get('region') else ""
+        if c.get('page_url'):
+            where += f" ({urlparse(c['page_url']).path})"
+        lines.append(f"- {c['company_name']}{where}: {c['summary']} "
+                     f"({c['category']}, {c['significance_score']}%)")
+    text = "New significant changes detected:\n\n" + "\n".join(lines)
+    
+    return {
+        'subject': subject,
+        'text': text,
+        'slack': {
+            'text': subject,
+            'blocks': [
+                {'type': 'section', 'text': {'type': 'mrkdwn', 'text': f"*{subject}*"}},
+                {'type': 'section', 'text': {'type': 'mrkdwn', 'text': "\n".join(lines[:20])}},
+            ],
+        },
+        'webhook': {
+            'event': 'changes.digest',
+            'generated_at': datetime.utcnow().isoformat(),
+            'changes': [
+                {
+                    'id': c['id'],
+                    'company_name': c['company_name'],
+                    'significance_score': c['significance_score'],
+                    'category': c['category'],
+                    'summary': c['summary'],
+                    'region': c.get('region'),
+                    'page_url': c.get('page_url'),
+                    'detected_at': c['detected_at'].isoformat() if c.get('detected_at') else None,
+                }
+                for c in changes
+            ],
+        },
+    }
+
+class SMTPPool:
+    """Small pool of persistent SMTP connections shared by one dispatch run"""
+    
+    def __init__(self, size: int):
+        self.size = size
+        self._idle: asyncio.Queue = asyncio.Queue()
+        self._created = 0
+    
+    async def _connect(self) -> aiosmtplib.SMTP:
+        client = aiosmtplib.SMTP(
+            hostname=settings.SMTP_HOST,
+            port=settings.SMTP_PORT,
+            start_tls=settings.SMTP_START_TLS,
+            timeout=30,
+        )
+        await client.connect()
+        if settings.SMTP_USERNAME:
+            await client.login(settings.SMTP_USERNAME, settings.SMTP_PASSWORD)
+        return client
+    
+    async def send(self, message: EmailMessage):
+        if self._idle.empty() and self._created < self.size:
+            self._created += 1
+            try:
+                client = await self._connect()
+            except Exception:
+                self._created -= 1
+                raise
+        else:
+            client = await self._idle.get()
+        
+        try:
+            if not client.is_connected:
+                client = await self._connect()
+            await client.send_message(message)
+        except Exception:
+            # Drop the connection; the retry will open a fresh one
+            client.close()
+            self._created -= 1
+            raise
+        self._idle.put_nowait(client)
+    
+    async def close(self):
+        while not self._idle.empty():
+            client = self._idle.get_nowait()
+            try:
+                await client.quit()
+            except Exception:
+                client.close()
+
+class NotificationDispatcher:
+    """Delivers digests over pooled async connections with retries and backoff"""
+    
+    def __init__(self):
+        self.smtp = SMTPPool(settings.SMTP_POOL_SIZE)
+        self.semaphore = asyncio.Semaphore(settings.NOTIFY_CONCURRENCY)
+    
+    async def _with_retries(self, send: Callable[[], Awaitable[None]]) -> Optional[str]:
+        """Run `send` with exponential backoff and jitter; returns the last error or None"""
+        error = None
+        for attempt in range(settings.NOTIFY_MAX_ATTEMPTS):
+            if attempt:
+                delay = settings.NOTIFY_BACKOFF_SECONDS * (2 ** (attempt - 1))
+                await asyncio.sleep(delay * random.uniform(0.5, 1.5))
+            try:
+                async with self.semaphore:
+                    await send()
+                return None
+            except Exception as e:
+                error = f"{type(e).__name__}: {e}"
+        return error
+    
+    async def _post_json(self, url: str, payload: Dict):
+        # Re-checked on every attempt: the name may resolve differently by now
+        await ensure_public(url)
+        response = await get_http_client().post(url, json=payload, follow_redirects=False)
+        response.raise_for_status()  # Redirects included: they could point anywhere
+    
+    async def _send_email(self, to: str, digest: Dict):
+        message = EmailMessage()
+        message['From'] = settings.NOTIFY_FROM_EMAIL
+        message['To'] = to
+        message['Subject'] = digest['subject']
+        message.set_content(digest['text'])
+        await self.smtp.send(message)
+    
+    async def deliver(self, user: Dict, digest: Dict, skip: Collection[str] = ()) -> Dict[str, Optional[str]]:
+        """
+        Send one digest on every channel the user has configured; returns channel -> error
+        
+        Channels in `skip` (already delivered on an earlier run) are left
+        out. A webhook URL that fails `check_webhook_url` is reported as an
+        error without being requested.
+        """
+        prefs = user.get('notification_settings') or {}
+        jobs = {}
+        rejected = {}
+        if prefs.get('email', True) and user.get('email'):
+            jobs[EMAIL] = lambda: self._send_email(user['email'], digest)
+        if prefs.get('slack_webhook_url'):
+            rejected[SLACK] = check_webhook_url(prefs['slack_webhook_url'], slack=True)
+            jobs[SLACK] = lambda: self._post_json(prefs['slack_webhook_url'], digest['slack'])
+        if prefs.get('webhook_url'):
+            rejected[WEBHOOK] = check_webhook_url(prefs['webhook_url'])
+            jobs[WEBHOOK] = lambda: self._post_json(prefs['webhook_url'], digest['webhook'])
+        for channel in skip:
+            jobs.pop(channel, None)
+        rejected = {channel: error for channel, error in rejected.items() if error and channel in jobs}
+        for channel in rejected:
+            del jobs[channel]
+        
+        errors = await asyncio.gather(*(self._with_retries(send) for send in jobs.values()))
+        return {**rejected, **dict(zip(jobs.keys(), errors))}
+    
+    async def deliver_all(self, batches: List[Dict]) -> List[Dict[str, Optional[str]]]:
+        """Deliver many digests concurrently; each batch is {'user': ..., 'digest': ..., 'skip': ...}"""
+        try:
+            return await asyncio.gather(*(self.deliver(b['user'], b['digest'], b.get('skip', ())) for b in batches))
+        finally:
+            await self.smtp.close()
@@ -0,0 +1,102 @@
+import re
+from datetime import datetime
+from typing import Dict, Optional
+from ..core.config import settings
+
+BROWSER = 'browser'
+HTTP = 'http'
+PROBE = 'probe'  # Render with both and compare
+
+_TOKEN_RE = re.compile(r'\w+')
+
+class RenderModeClassifier:
+    """
+    Decides per company whether a page needs a real browser
+
+    State lives in the snapshot metadata (`render_mode_state`) so each scan
+    picks up where the previous one left off. A site is moved to plain HTTP
+    only after several consecutive probes where the HTTP and browser
+    extractions agree, and is re-verified against the browser periodically.
+    HTTP scans take no screenshot; the periodic probe renders in the browser,
+    so an HTTP site still gets one every `probe_interval` scans.
+    """
+
+    def __init__(self,
+                 required_agreements: int = None,
+                 threshold: float = None,
+                 probe_interval: int = None,
+                 history_size: int = None):
+        self.required_agreements = required_agreements or settings.RENDER_MODE_REQUIRED_AGREEMENTS
+        self.threshold = threshold or settings.RENDER_MODE_AGREEMENT_THRESHOLD
+        self.probe_interval = probe_interval or settings.RENDER_MODE_PROBE_INTERVAL
+        self.history_size = history_size or settings.RENDER_MODE_HISTORY_SIZE
+
+    def initial_state(self) -> Dict:
+        return {
+            'mode': BROWSER,
+            'consecutive_agreements': 0,
+            'consecutive_disagreements': 0,
+            'scans_since_probe': 0,
+            'history': [],
+        }
+
+    def plan(self, state: Optional[Dict]) -> str:
+        """Pick how to render the next scan: browser, http or probe"""
+        state = state or self.initial_state()
+        due = state.get('scans_since_probe', 0) + 1 >= self.probe_interval
+
+        if state.get('mode') == HTTP:
+            return PROBE if due else HTTP
+
+        # Still building confidence; HTTP fetches are cheap so probe every scan
+        # until the site has shown it disagrees a few times in a row
+        if state.get('consecutive_disagreements', 0) < self.required_agreements:
+            return PROBE
+        return PROBE if due else BROWSER
+
+    def advance(self, state: Optional[Dict], plan: str) -> Dict:
+        """Record a scan that did not probe"""
+        state = dict(state or self.initial_state())
+        if plan != PROBE:
+            state['scans_since_probe'] = state.get('scans_since_probe', 0) + 1
+        return state
+
+    def record_probe(self, state: Optional[Dict], http_text: Optional[str], browser_text: str) -> Dict:
+        """Compare both extractions and update the mode decision"""
+        state = dict(state or self.initial_state())
+        similarity = self.similarity(http_text, browser_text) if http_text is not None else 0.0
+        agree = similarity >= self.threshold
+
+        if agree:
+            state['consecutive_agreements'] = state.get('consecutive_agreements', 0) + 1
+            state['consecutive_disagreements'] = 0
+            if state['consecutive_agreements'] >= self.required_agreements:
+                state['mode'] = HTTP
+        else:
+            state['consecutive_agreements'] = 0
+            state['consecutive_disagreements'] = state.get('consecutive_disagreements', 0) + 1
+            state['mode'] = BROWSER
+
+        state['scans_since_probe'] = 0
+        history = list(state.get('history', []))
+        history.append({
+            'at': datetime.utcnow().isoformat(),
+            'agree': agree,
+            'similarity': round(similarity, 4),
+        })
+        state['history'] = history[-self.history_size:]
+        return state
+
+    @staticmethod
+    def similarity(a: str, b: str) -> float:
+        """Jaccard similarity of word bigrams, insensitive to whitespace and layout"""
+        def shingles(text: str) -> set:
+            tokens = _TOKEN_RE.findall(text.lower())
+            if len(tokens) < 2:
+                return set(tokens)
+            return {(tokens[i], tokens[i + 1]) for i in range(len(tokens) - 1)}
+
+        sa, sb = shingles(a or ''), shingles(b or '')
+        if not sa and not sb:
+            return 1.0
+        return len(sa & sb) / len(sa | sb)
@@ -0,0 +1,266 @@
+import difflib
+import io
+import os
+import shutil
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Set, Tuple
+from ..core.config import settings
+from .storage import BlobStore
+
+# Screenshot renditions. Full-page PNGs run to tens of megabytes, so each
+# screenshot is rendered once, off the scan pipeline, into WebP files the
+# change view can load piecemeal: a thumbnail of the first screen, the page
+# in fixed-height tiles, and crops around the regions that changed since the
+# previous snapshot (before and after). The manifest is stored in
+# snapshot_metadata['renditions'] and the files in the blob store, so the API
+# serves them without decoding anything. Pillow is imported inline: only
+# media workers render.
+
+PREFIX = "renditions"
+MEDIA_TYPE = "image/webp"
+VERSION = 1
+
+# Changed regions are located on grayscale copies reduced by this factor,
+# quantized to 16 levels so anti-aliasing noise doesn't count as change
+DIFF_REDUCTION = 4
+DIFF_QUANTUM = 16
+# Changed row bands this close (in reduced rows) are cropped together
+MERGE_GAP = 8
+# WebP caps dimensions at 16383px; crops are clipped well below that
+MAX_CROP_HEIGHT = 4096
+
+def rendition_prefix(company_id: str, snapshot_id: str) -> str:
+    return f"{PREFIX}/{company_id}/{snapshot_id}"
+
+def rendition_names(manifest: Optional[Dict]) -> List[str]:
+    """Every file a manifest lists (thumb, tile-N, crop-N, crop-N-before)"""
+    if not manifest:
+        return []
+    names = [manifest['thumb']['name']] if manifest.get('thumb') else []
+    names += [tile['name'] for tile in manifest.get('tiles', [])]
+    for crop in manifest.get('crops', []):
+        names.append(crop['name'])
+        if crop.get('before_name'):
+            names.append(crop['before_name'])
+    return names
+
+def rendition_ref(manifest: Optional[Dict], name: str) -> Optional[str]:
+    """Blob reference of a named rendition, or None when the manifest doesn't list it"""
+    if name not in rendition_names(manifest):
+        return None
+    return f"{manifest['prefix']}/{name}.webp"
+
+def _save(store: BlobStore, prefix: str, name: str, image) -> int:
+    buffer = io.BytesIO()
+    image.save(buffer, "WEBP", quality=settings.RENDITION_QUALITY, method=4)
+    store.put_bytes(f"{prefix}/{name}.webp", buffer.getvalue())
+    return buffer.tell()
+
+def _open_rgb(path: Optional[str]):
+    """Decode a screenshot as RGB, or None when missing, unreadable or over RENDITION_MAX_PIXELS"""
+    from PIL import Image
+    
+    if not path or not os.path.exists(path):
+        return None
+    try:
+        with Image.open(path) as source:
+            width, height = source.size
+            if width * height > settings.RENDITION_MAX_PIXELS:
+                return None
+            return source.convert("RGB")
+    except (OSError, ValueError, Image.DecompressionBombError):
+        return None
+
+def _reduced(image):
+    """Grayscale copy reduced by DIFF_REDUCTION and quantized, with its rows as bytes"""
+    levels = [v - v % DIFF_QUANTUM for v in range(256)]
+    small = image.convert("L").reduce(DIFF_REDUCTION).point(levels)
+    data = small.tobytes()
+    return small, [data[i:i + small.width] for i in range(0, len(data), small.width)]
+
+def _runs(rows: List[bytes]) -> Tuple[List[Tuple[bytes, int]], List[int]]:
+    """
+    Run-length encode rows: (row, repeat) tokens and each token's first row
+    
+    Blank stretches collapse into single tokens, which keeps the sequence
+    match below fast on long pages.
+    """
+    tokens, starts = [], []
+    for index, row in enumerate(rows):
+        if tokens and tokens[-1][0] == row:
+            tokens[-1] = (row, tokens[-1][1] + 1)
+        else:
+            tokens.append((row, 1))
+            starts.append(index)
+    starts.append(len(rows))
+    return tokens, starts
+
+def _content_span(band) -> Optional[Tuple[int, int]]:
+    """Horizontal extent of whatever differs from the band's background (top-left pixel)"""
+    from PIL import Image, ImageChops
+    
+    if band.height == 0:
+        return None
+    background = Image.new("L", band.size, band.getpixel((0, 0)))
+    bbox = ImageChops.difference(band, background).getbbox()
+    return (bbox[0], bbox[2]) if bbox else None
+
+def changed_regions(new_image, old_image) -> List[Dict]:
+    """
+    Boxes around what changed between two screenshots of the same page
+    
+    Rows are aligned with a sequence match rather than compared in place, so
+    a banner inserted near the top yields one region instead of flagging
+    everything it pushed down. Returns at most RENDITION_MAX_CROPS regions,
+    top to bottom, as full-resolution `box` (new screenshot) and
+    `before_box` (old screenshot; None when the content is new) in
+    (left, top, right, bottom) form.
+    """
+    if new_image.width != old_image.width:
+        return []  # Different viewport: nothing lines up
+    new_small, new_rows = _reduced(new_image)
+    old_small, old_rows = _reduced(old_image)
+    new_tokens, new_starts = _runs(new_rows)
+    old_tokens, old_starts = _runs(old_rows)
+    matcher = difflib.SequenceMatcher(None, old_tokens, new_tokens, autojunk=False)
+    
+    # Changed bands in reduced rows: [new_top, new_bottom, old_top, old_bottom]
+    bands = []
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == 'equal':
+            continue
+        band = [new_starts[j1], new_starts[j2], old_starts[i1], old_starts[i2]]
+        if bands and band[0] - bands[-1][1] <= MERGE_GAP:
+            bands[-1][1], bands[-1][3] = band[1], band[3]
+        else:
+            bands.append(band)
+    
+    regions = []
+    for new_top, new_bottom, old_top, old_bottom in bands:
+        spans = [_content_span(new_small.crop((0, new_top, new_small.width, new_bottom))),
+                 _content_span(old_small.crop((0, old_top, old_small.width, old_bottom)))]
+        spans = [span for span in spans if span]
+        left = min((span[0] for span in spans), default=0)
+        right = max((span[1] for span in spans), default=new_small.width)
+        regions.append({
+            'box': (left, new_top, right, new_bottom),
+            'before_box': (left, old_top, right, old_bottom) if old_bottom > old_top else None,
+            'area': (right - left) * max(new_bottom - new_top, old_bottom - old_top, 1)
+        })
+    
+    # Largest first for the cap, then back in page order
+    regions = sorted(regions, key=lambda r: r['area'], reverse=True)[:settings.RENDITION_MAX_CROPS]
+    regions.sort(key=lambda r: r['box'][1])
+    return [{
+        'box': _full_box(region['box'], new_image.size),
+        'before_box': _full_box(region['before_box'], old_image.size) if region['before_box'] else None
+    } for region in regions]
+
+def _full_box(box: Tuple[int, int, int, int], size: Tuple[int, int]) -> List[int]:
+    """Scale a reduced box back up, pad it with RENDITION_CROP_PADDING and clip it to the image"""
+    pad = settings.RENDITION_CROP_PADDING
+    left, top, right, bottom = (value * DIFF_REDUCTION for value in box)
+    left, top = max(0, left - pad), max(0, top - pad)
+    right, bottom = min(size[0], right + pad), min(size[1], bottom + pad, top + MAX_CROP_HEIGHT)
+    return [left, top, right, max(bottom, top + 1)]
+
+def _fit_width(image, width: int):
+    from PIL import Image
+    
+    if image.width <= width:
+        return image
+    return image.resize((width, max(1, round(image.height * width / image.width))),
+                        Image.LANCZOS, reducing_gap=2.0)
+
+def render_snapshot(store: BlobStore, company_id: str, snapshot_id: str, screenshot_path: Optional[str],
+                    previous_path: Optional[str] = None, previous_snapshot_id: Optional[str] = None) -> Optional[Dict]:
+    """
+    Write a screenshot's renditions to the blob store and return the manifest
+    
+    Tiles cover the whole page at RENDITION_TILE_WIDTH (screenshots are never
+    scaled up); `previous_path` adds crops around the regions that changed
+    since that screenshot. Returns None when the screenshot can't be
+    decoded.
+    """
+    image = _open_rgb(screenshot_path)
+    if image is None:
+        return None
+    prefix = rendition_prefix(company_id, snapshot_id)
+    width, height = image.size
+    size = 0
+    
+    scaled = _fit_width(image, settings.RENDITION_TILE_WIDTH)
+    tiles = []
+    for index, top in enumerate(range(0, scaled.height, settings.RENDITION_TILE_HEIGHT)):
+        tile = scaled.crop((0, top, scaled.width, min(top + settings.RENDITION_TILE_HEIGHT, scaled.height)))
+        size += _save(store, prefix, f"tile-{index}", tile)
+        tiles.append({'name': f"tile-{index}", 'top': top, 'height': tile.height})
+    
+    # The first screen, at the scraper's 16:9 viewport
+    first_screen = scaled.crop((0, 0, scaled.width, min(scaled.height, scaled.width * 9 // 16)))
+    thumb = _fit_width(first_screen, settings.RENDITION_THUMB_WIDTH)
+    size += _save(store, prefix, "thumb", thumb)
+    del scaled, first_screen
+    
+    crops = []
+    old_image = _open_rgb(previous_path) if previous_path else None
+    if old_image is not None:
+        for index, region in enumerate(changed_regions(image, old_image)):
+            crop = {'name': f"crop-{index}", 'box': region['box'],
+                    'before_name': None, 'before_box': region['before_box']}
+            size += _save(store, prefix, crop['name'],
+                          _fit_width(image.crop(region['box']), settings.RENDITION_TILE_WIDTH))
+            if region['before_box']:
+                crop['before_name'] = f"crop-{index}-before"
+                size += _save(store, prefix, crop['before_name'],
+                              _fit_width(old_image.crop(region['before_box']), settings.RENDITION_TILE_WIDTH))
+            crops.append(crop)
+    
+    return {
+        'version': VERSION,
+        'prefix': prefix,
+        'width': width,
+        'height': height,
+        'tile_width': min(width, settings.RENDITION_TILE_WIDTH),
+        'tiles': tiles,
+        'thumb': {'name': "thumb", 'width': thumb.width, 'height': thumb.height},
+        'crops': crops,
+        'compared_with': previous_snapshot_id if old_image is not None else None,
+        'bytes': size,
+        'rendered_at': datetime.utcnow().isoformat()
+    }
+
+def delete_renditions(store: BlobStore, manifest: Optional[Dict], keep: Set[str] = frozenset()) -> int:
+    """Remove a manifest's files (except names in `keep`), returning the bytes freed"""
+    freed = 0
+    for name in rendition_names(manifest):
+        if name not in keep:
+            freed += store.delete(f"{manifest['prefix']}/{name}.webp")
+    if manifest and not keep:
+        try:
+            os.rmdir(store.path(manifest['prefix']))
+        except OSError:
+            pass  # Missing, or not empty
+    return freed
+
+def find_orphaned_renditions(store: BlobStore, company_ids: Set[str], grace: timedelta) -> List[str]:
+    """Rendition directories of companies that no longer exist, older than the grace period"""
+    root = store.path(PREFIX)
+    if not os.path.isdir(root):
+        return []
+    cutoff = (datetime.utcnow() - grace).timestamp()
+    with os.scandir(root) as entries:
+        return [entry.path for entry in entries
+                if entry.is_dir() and entry.name not in company_ids and entry.stat().st_mtime < cutoff]
+
+def remove_tree(path: str) -> int:
+    """Delete a directory of renditions, returning the bytes freed"""
+    freed = 0
+    for parent, _, files in os.walk(path):
+        for name in files:
+            try:
+                freed += os.path.getsize(os.path.join(parent, name))
+            except OSError:
+                pass
+    shutil.rmtree(path, ignore_errors=True)
+    return freed
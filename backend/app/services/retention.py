@@ -0,0 +1,116 @@
+import gzip
+import os
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from ..core.config import settings
+from .storage import BlobStore
+
+def get_retention_policy(plan: Optional[str]) -> Dict:
+    """Look up the retention tiers for a plan, defaulting to the free tier"""
+    return settings.RETENTION_POLICIES.get(plan or "free", settings.RETENTION_POLICIES["free"])
+
+def select_snapshots_to_prune(snapshots: Iterable[Tuple[object, datetime]],
+                              protected: Set,
+                              policy: Dict,
+                              now: Optional[datetime] = None) -> List:
+    """
+    Apply tiered retention to one company's snapshot history
+    
+    `snapshots` are (id, timestamp) pairs. The newest snapshot in each daily
+    or weekly bucket survives; protected ids (those referenced by a Change)
+    and the latest snapshot are always kept and count as their bucket's
+    survivor. Returns the ids to delete.
+    """
+    now = now or datetime.utcnow()
+    full_cutoff = now - timedelta(days=policy["full_days"])
+    daily_cutoff = now - timedelta(days=policy["daily_days"])
+    weekly_days = policy.get("weekly_days")
+    weekly_cutoff = now - timedelta(days=weekly_days) if weekly_days is not None else None
+    
+    def bucket(ts: datetime):
+        if ts >= full_cutoff:
+            return None  # Full fidelity
+        if ts >= daily_cutoff:
+            return ("day", ts.date())
+        if weekly_cutoff is None or ts >= weekly_cutoff:
+            year, week, _ = ts.isocalendar()
+            return ("week", year, week)
+        return ("expired",)
+    
+    ordered = sorted(snapshots, key=lambda s: s[1], reverse=True)
+    if not ordered:
+        return []
+    
+    # Protected snapshots claim their bucket first so nothing else is kept beside them
+    claimed = {bucket(ts) for sid, ts in ordered if sid in protected}
+    latest_id = ordered[0][0]
+    
+    prune = []
+    for sid, ts in ordered:
+        key = bucket(ts)
+        if sid in protected or sid == latest_id or key is None:
+            continue
+        if key == ("expired",) or key in claimed:
+            prune.append(sid)
+        else:
+            claimed.add(key)
+    return prune
+
+def offload_html(store: BlobStore, company_id: str, html_content: str) -> Tuple[str, int]:
+    """
+    Move snapshot HTML into compressed blob storage; returns (ref, bytes saved)
+    
+    The blob is an archive: nothing reads snapshot HTML back (diffs, search
+    and exports use text_content), so it is only removed with the snapshot.
+    """
+    data = gzip.compress(html_content.encode(), compresslevel=9)
+    ref = store.put_bytes(store.new_ref(f"snapshots/{company_id}", ".html.gz"), data)
+    return ref, max(0, len(html_content.encode()) - len(data))
+
+def reencode_screenshot(path: str) -> Tuple[Optional[str], int]:
+    """
+    Re-encode a PNG screenshot as lossy WebP
+    
+    Returns (new path, bytes saved), or (None, 0) when the image cannot be
+    converted (WebP caps dimensions at 16383px, which tall full-page
+    screenshots can exceed). The original is left for the caller to remove
+    once the new path is committed.
+    """
+    from PIL import Image
+    
+    if not path or not path.endswith(".png") or not os.path.exists(path):
+        return None, 0
+    webp_path = path[:-4] + ".webp"
+    try:
+        with Image.open(path) as img:
+            if max(img.size) > 16383:
+                return None, 0
+            img.save(webp_path, "WEBP", quality=80, method=4)
+    except (OSError, ValueError):
+        if os.path.exists(webp_path):
+            os.remove(webp_path)
+        return None, 0
+    return webp_path, os.path.getsize(path) - os.path.getsize(webp_path)
+
+def remove_file(path: Optional[str]) -> int:
+    """Delete a file if present, returning the bytes freed"""
+    if not path:
+        return 0
+    try:
+        size = os.path.getsize(path)
+        os.remove(path)
+        return size
+    except FileNotFoundError:
+        return 0
+
+def find_orphaned_screenshots(screenshot_dir: str, referenced: Set[str], grace: timedelta) -> List[str]:
+    """List screenshot files no snapshot points at, older than the grace period"""
+    cutoff = (datetime.utcnow() - grace).timestamp()
+    orphans = []
+    with os.scandir(screenshot_dir) as entries:
+        for entry in entries:
+            if not entry.is_file() or entry.name in referenced:
+                continue
+            if entry.stat().st_mtime < cutoff:
+                orphans.append(entry.path)
+    return orphans
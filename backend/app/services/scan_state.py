@@ -0,0 +1,75 @@
+import uuid
+from typing import Dict, Optional
+from ..core.config import settings
+from ..core.redis import get_redis
+from .fair_scheduler import release_slot
+
+LEASE_KEY = "pivotwatch:scan-lease:{subject}"  # company id, or company:page for crawled subpages
+CHECKPOINT_KEY = "pivotwatch:scan-checkpoint:{scan_id}"
+
+# Delete the lease only if it still belongs to this scan
+_RELEASE_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+# Take the lease if free (or already ours) and reset its TTL
+_TAKE_SCRIPT = """
+local holder = redis.call('get', KEYS[1])
+if not holder or holder == ARGV[1] then
+    redis.call('set', KEYS[1], ARGV[1], 'EX', ARGV[2])
+    return 1
+end
+return 0
+"""
+
+def _lease_key(company_id: str, page_id: Optional[str]) -> str:
+    return LEASE_KEY.format(subject=f"{company_id}:{page_id}" if page_id else company_id)
+
+def new_scan_id() -> str:
+    return uuid.uuid4().hex
+
+def acquire_scan_lease(company_id: str, page_id: Optional[str] = None) -> Optional[str]:
+    """
+    Take the per-company (or per-page, in multi-page mode) scan lease
+
+    Returns a new scan id, or None when another scan already holds the lease.
+    """
+    scan_id = new_scan_id()
+    acquired = get_redis().set(
+        _lease_key(company_id, page_id), scan_id,
+        nx=True, ex=settings.SCAN_LEASE_TTL
+    )
+    return scan_id if acquired else None
+
+def holds_scan_lease(company_id: str, scan_id: str, page_id: Optional[str] = None) -> bool:
+    """
+    Check the lease belongs to `scan_id`, taking it if it is free
+    
+    Either way the lease gets a fresh SCAN_LEASE_TTL, so a scan that waited
+    in its fair queue or was deferred starts with a full lease.
+    """
+    return bool(get_redis().eval(_TAKE_SCRIPT, 1, _lease_key(company_id, page_id), scan_id, settings.SCAN_LEASE_TTL))
+
+def scan_in_progress(company_id: str, page_id: Optional[str] = None) -> bool:
+    return bool(get_redis().exists(_lease_key(company_id, page_id)))
+
+def release_scan_lease(company_id: str, scan_id: str, page_id: Optional[str] = None):
+    """Release the lease and drop the scan's checkpoints"""
+    r = get_redis()
+    r.eval(_RELEASE_SCRIPT, 1, _lease_key(company_id, page_id), scan_id)
+    r.delete(CHECKPOINT_KEY.format(scan_id=scan_id))
+    release_slot(scan_id)  # Frees the plan's concurrency slot
+
+def get_checkpoint(scan_id: str) -> Dict[str, str]:
+    """Return the stage outputs recorded so far for a scan"""
+    return get_redis().hgetall(CHECKPOINT_KEY.format(scan_id=scan_id))
+
+def set_checkpoint(scan_id: str, stage: str, value: str):
+    """Record a completed stage so a retry can resume after it"""
+    r = get_redis()
+    key = CHECKPOINT_KEY.format(scan_id=scan_id)
+    r.hset(key, stage, value)
+    r.expire(key, settings.SCAN_LEASE_TTL)
@@ -1,64 +1,416 @@
 import asyncio
 import hashlib
+import time
 from datetime import datetime
-from typing import Dict, Optional, Tuple
-from playwright.async_api import async_playwright, Page, Browser
-from bs4 import BeautifulSoup
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+from urllib.parse import urlparse
 import os
 from ..core.config import settings
+from ..core import metrics, tracing
+from . import render_mode
+from .http_client import get_http_client
+from .render_mode import RenderModeClassifier
+from .storage import BlobStore, TextSpool
+from .watch_regions import NAME_MAX_CHARS as REGION_NAME_MAX_CHARS
+
+# Playwright and BeautifulSoup are imported where they are used: HTTP-only
+# capture never needs a browser, and the API never needs either
+if TYPE_CHECKING:
+    from playwright.async_api import Page, Route
+
+# Resolves once the DOM has seen no mutations for `quietMs`, or after `maxMs`
+DOM_QUIET_SCRIPT = '''([quietMs, maxMs]) => new Promise((resolve) => {
+    const start = performance.now();
+    let quietTimer = null;
+    let capTimer = null;
+    const observer = new MutationObserver(() => {
+        clearTimeout(quietTimer);
+        quietTimer = setTimeout(() => done(true), quietMs);
+    });
+    const done = (stable) => {
+        observer.disconnect();
+        clearTimeout(quietTimer);
+        clearTimeout(capTimer);
+        resolve({stable: stable, waited: performance.now() - start});
+    };
+    observer.observe(document, {subtree: true, childList: true, attributes: true, characterData: true});
+    quietTimer = setTimeout(() => done(true), quietMs);
+    capTimer = setTimeout(() => done(false), maxMs);
+})'''
+
+# Extracts cleaned text (up to maxChars) and per-block FNV-1a hashes without shipping the DOM back
+IN_PAGE_EXTRACT_SCRIPT = '''(maxChars) => {
+    const fnv1a = (str) => {
+        let h = 0x811c9dc5;
+        for (let i = 0; i < str.length; i++) {
+            h ^= str.charCodeAt(i);
+            h = Math.imul(h, 0x01000193);
+        }
+        return (h >>> 0).toString(16).padStart(8, '0');
+    };
+    const body = document.body;
+    const raw = body ? body.innerText : '';
+    const blocks = [];
+    let total = 0;
+    let truncated = false;
+    for (const line of raw.split('\\n')) {
+        const block = line.trim();
+        if (!block) continue;
+        if (total + block.length > maxChars) {
+            truncated = true;
+            break;
+        }
+        blocks.push(block);
+        total += block.length + 1;
+    }
+    return {
+        title: document.title,
+        text: blocks.join('\\n'),
+        block_hashes: blocks.map(fnv1a),
+        html_length: document.documentElement.outerHTML.length,
+        truncated: truncated,
+    };
+}'''
+
+# Text of each configured watch region (CSS or XPath), null when nothing matches
+REGION_EXTRACT_SCRIPT = '''(regions) => {
+    const clean = (text) => text.split('\\n').map((line) => line.trim()).filter(Boolean).join('\\n');
+    const out = {};
+    for (const region of regions) {
+        let nodes = [];
+        try {
+            if (region.type === 'xpath') {
+                const res = document.evaluate(region.selector, document, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+                for (let i = 0; i < res.snapshotLength; i++) {
+                    nodes.push(res.snapshotItem(i));
+                }
+            } else {
+                nodes = Array.from(document.querySelectorAll(region.selector));
+            }
+        } catch (e) {
+            nodes = [];
+        }
+        out[region.name] = nodes.length
+            ? clean(nodes.map((n) => n.innerText !== undefined ? n.innerText : n.textContent).join('\\n'))
+            : null;
+    }
+    return out;
+}'''
+
+# A change's stored context never copies more than this much of the page
+MAX_CONTEXT_CHARS = 2000
+
+# Elements whose own text BeautifulSoup's get_text() leaves out (their tails still count)
+LXML_SKIPPED_TEXT = {'template', 'rt', 'rp'}
+
 
 class WebsiteScraper:
     """Main scraper service for capturing website content"""
     
     def __init__(self):
         self.screenshot_dir = settings.SCREENSHOT_PATH
+        self.classifier = RenderModeClassifier()
+        self.store = BlobStore()
         os.makedirs(self.screenshot_dir, exist_ok=True)
     
-    async def scrape(self, url: str, company_id: str) -> Dict:
+    async def scrape(self, url: str, company_id: str, options: Optional[Dict] = None,
+                     render_state: Optional[Dict] = None) -> Dict:
         """
         Scrape a website and return structured content
+        
+        `options` carries the company's `scrape_config`; see `_resolve_options`.
+        `render_state` is the previous snapshot's `render_mode_state`, used to
+        decide whether this page can be fetched without a browser.
+        """
+        capture = await self.capture(url, company_id, options, render_state)
+        return self.finalize(capture)
+    
+    async def capture(self, url: str, company_id: str, options: Optional[Dict] = None,
+                      render_state: Optional[Dict] = None, degraded: bool = False,
+                      validators: Optional[Dict] = None) -> Dict:
         """
+        Render or fetch a page without parsing it
+        
+        This is the I/O-bound half of `scrape`; the returned capture is
+        JSON-serializable and is turned into a result by `finalize`, which
+        may run in a different (CPU-bound) worker. Raw HTML over
+        SCRAPE_SPILL_BYTES is written to a blob (`raw_html_ref`) rather than
+        carried in the capture. `degraded` (worker under memory pressure)
+        asks the browser for text only, a viewport screenshot and half the
+        usual size cap.
+        
+        `validators` (`etag`/`last_modified` from the page's previous fetch)
+        make the fetch conditional: when the server answers 304 the capture
+        comes back with `not_modified` set and nothing to finalize.
+        """
+        opts = self._resolve_options(options)
+        if degraded:
+            opts.update(in_page_extraction=True, full_page_screenshot=False,
+                        max_html_bytes=opts['max_html_bytes'] // 2)
+            metrics.SCRAPE_SAFEGUARDS.labels('degraded').inc()
+        
+        plan = opts['render_mode']
+        if plan == 'auto':
+            plan = self.classifier.plan(render_state)
+        
+        validators = validators if validators and any(validators.values()) else None
+        if validators and plan != render_mode.HTTP and await self._revalidate(url, validators):
+            return self._not_modified_capture(url)
+        
+        probe = {}
+        if plan == render_mode.PROBE:
+            capture, http_capture = await asyncio.gather(
+                self._capture_browser(url, company_id, opts),
+                self._capture_http(url, company_id, opts)
+            )
+            if http_capture['success']:
+                probe = {'probe_html': http_capture.get('raw_html'), 'probe_html_ref': http_capture.get('raw_html_ref')}
+        elif plan == render_mode.HTTP:
+            capture = await self._capture_http(url, company_id, opts, validators)
+            if capture.get('not_modified'):
+                return capture
+            if not capture['success']:
+                # Plain fetch refused or failed; the browser is the source of truth
+                print(f"↩️  HTTP fetch failed for {url}, falling back to browser")
+                plan = render_mode.PROBE
+                capture = await self._capture_browser(url, company_id, opts)
+        else:
+            capture = await self._capture_browser(url, company_id, opts)
+        
+        capture.update({
+            'watch_regions': opts['watch_regions'],
+            'plan': plan,
+            'auto': opts['render_mode'] == 'auto',
+            'render_state': render_state,
+            **probe,
+        })
+        if not capture['success']:
+            self.discard_capture(probe)
+        elif degraded:
+            capture['metadata']['memory_degraded'] = True
+        return capture
+    
+    def finalize(self, capture: Dict) -> Dict:
+        """Parse and hash a capture, and update the render mode decision"""
+        if not capture['success']:
+            return capture
+        
+        result = dict(capture)
+        raw_html = result.pop('raw_html', None)
+        raw_html_ref = result.pop('raw_html_ref', None)
+        plan = result.pop('plan')
+        auto = result.pop('auto')
+        state = result.pop('render_state', None)
+        probe_html = result.pop('probe_html', None)
+        probe_html_ref = result.pop('probe_html_ref', None)
+        watch_regions = result.pop('watch_regions', None) or []
+        region_texts = result.pop('region_texts', None)
+        metadata = result['metadata']
+        
+        if raw_html is not None or raw_html_ref is not None:
+            with metrics.timed(metrics.SCRAPE_STAGE_SECONDS, 'extract', span='scrape.extract'):
+                if watch_regions and region_texts is None:
+                    region_html = raw_html if raw_html is not None else self._read_spilled(raw_html_ref)
+                    region_texts = self.extract_regions(region_html, watch_regions)
+                    del region_html
+                cleaned_html, text_content, title, parser = self._extract(raw_html, raw_html_ref)
+            del raw_html
+            metadata['parser'] = parser
+            result['title'] = result.get('title') or title
+            result['html_content'] = cleaned_html
+            result['text_content'] = text_content
+            result['html_hash'] = hashlib.sha256(cleaned_html.encode()).hexdigest()
+            del cleaned_html
+        else:
+            # Extracted in-page; there is no HTML to hash. metadata['extraction']
+            # records which one the hash covers, and only like is compared with like
+            result['html_content'] = None
+            result['html_hash'] = hashlib.sha256(result['text_content'].encode()).hexdigest()
+        
+        if len(result['text_content']) > settings.SCRAPE_MAX_TEXT_CHARS:
+            result['text_content'] = result['text_content'][:settings.SCRAPE_MAX_TEXT_CHARS]
+            metadata['text_truncated'] = True
+        if watch_regions:
+            metadata['regions'] = self._region_fingerprints(watch_regions, region_texts or {})
+        if plan == render_mode.PROBE:
+            http_text = None
+            if probe_html is not None or probe_html_ref is not None:
+                http_text = self._extract(probe_html, probe_html_ref)[1]
+            state = self.classifier.record_probe(state, http_text, result['text_content'])
+        if auto:
+            metadata['render_mode_state'] = self.classifier.advance(state, plan)
+        metadata['render_mode'] = render_mode.HTTP if plan == render_mode.HTTP else render_mode.BROWSER
+        return result
+    
+    def discard_capture(self, capture: Dict):
+        """Delete the blobs a capture spilled to disk (once it has been finalized or abandoned)"""
+        for key in ('raw_html_ref', 'probe_html_ref'):
+            if capture.get(key):
+                self.store.delete(capture[key])
+    
+    def _spool(self, company_id: Optional[str], opts: Dict) -> TextSpool:
+        return TextSpool(self.store, f"captures/{company_id or 'adhoc'}", opts['max_html_bytes'],
+                         settings.SCRAPE_SPILL_BYTES)
+    
+    @staticmethod
+    def _spool_metadata(spool: TextSpool) -> Dict:
+        """Size fields for capture metadata, counting the safeguards that applied"""
+        if spool.truncated:
+            metrics.SCRAPE_SAFEGUARDS.labels('truncated').inc()
+        if spool.ref:
+            metrics.SCRAPE_SAFEGUARDS.labels('spilled').inc()
+        return {'html_bytes': spool.size, 'html_truncated': spool.truncated, 'html_spilled': spool.ref is not None}
+    
+    @staticmethod
+    def _conditional_headers(validators: Optional[Dict]) -> Dict:
+        headers = {}
+        if validators and validators.get('etag'):
+            headers['If-None-Match'] = validators['etag']
+        if validators and validators.get('last_modified'):
+            headers['If-Modified-Since'] = validators['last_modified']
+        return headers
+    
+    @staticmethod
+    def _response_validators(headers) -> Dict:
+        """Cache validators to send back on the next fetch of the page"""
+        return {'etag': headers.get('etag'), 'last_modified': headers.get('last-modified')}
+    
+    @staticmethod
+    def _not_modified_capture(url: str) -> Dict:
+        return {
+            'success': True,
+            'not_modified': True,
+            'url': url,
+            'timestamp': datetime.utcnow().isoformat()
+        }
+    
+    async def _revalidate(self, url: str, validators: Dict) -> bool:
+        """Conditional GET ahead of a browser render; True when the server answers 304 Not Modified"""
+        try:
+            with tracing.span('http.revalidate', 'http', url=url):
+                # The body (if any) is never read: closing the stream drops it
+                async with get_http_client().stream('GET', url, headers=self._conditional_headers(validators)) as response:
+                    return response.status_code == 304
+        except Exception as e:
+            print(f"⚠️  Revalidation of {url} failed, rendering anyway: {str(e)}")
+            return False
+    
+    async def _capture_http(self, url: str, company_id: Optional[str] = None, opts: Optional[Dict] = None,
+                            validators: Optional[Dict] = None) -> Dict:
+        """Fetch a server-rendered page over the pooled HTTP/2 client, streaming the body into a spool"""
+        opts = opts or self._resolve_options(None)
+        spool = self._spool(company_id, opts)
+        try:
+            started = time.perf_counter()
+            with tracing.span('http.fetch', 'http', url=url):
+                async with get_http_client().stream('GET', url, headers=self._conditional_headers(validators)) as response:
+                    if response.status_code == 304:
+                        spool.discard()
+                        return self._not_modified_capture(url)
+                    if response.is_error:
+                        raise Exception(f"HTTP {response.status_code}: {response.reason_phrase}")
+                    # Stop reading at the size cap; the rest of the body is never downloaded
+                    async for chunk in response.aiter_text():
+                        if not spool.write(chunk):
+                            break
+            load_time = (time.perf_counter() - started) * 1000
+            metrics.SCRAPE_STAGE_SECONDS.labels('capture_http').observe(load_time / 1000)
+            
+            metadata = {
+                'url': url,
+                'status_code': response.status_code,
+                'load_time': load_time,
+                'content_length': spool.chars,
+                'http_version': response.http_version,
+                'extraction': 'html',
+                'validators': self._response_validators(response.headers),
+                **self._spool_metadata(spool),
+            }
+            
+            return {
+                'success': True,
+                'title': None,
+                **spool.close(),
+                'screenshot_path': None,
+                'metadata': metadata,
+                'timestamp': datetime.utcnow().isoformat()
+            }
+        
+        except Exception as e:
+            spool.discard()
+            print(f"❌ Error fetching {url}: {str(e)}")
+            metrics.SCRAPE_FAILURES.labels('http').inc()
+            return {
+                'success': False,
+                'error': str(e),
+                'url': url,
+                'timestamp': datetime.utcnow().isoformat()
+            }
+    
+    async def _capture_browser(self, url: str, company_id: str, opts: Dict) -> Dict:
+        """Render the page in headless Chromium"""
+        from playwright.async_api import async_playwright
+        started = time.perf_counter()
         async with async_playwright() as p:
             # Launch browser
-            browser = await p.chromium.launch(headless=True)
+            with tracing.span('browser.launch', 'browser'):
+                browser = await p.chromium.launch(headless=True)
             context = await browser.new_context(
                 viewport={'width': 1920, 'height': 1080},
                 user_agent='PivotWatch/1.0 (Competitor Monitoring Bot)'
             )
             page = await context.new_page()
             
+            blocked = {'count': 0}
+            if opts['lean']:
+                await page.route('**/*', self._make_route_filter(opts, blocked))
+            
+            capture = {}
+            metrics.BROWSERS_OPEN.inc()
             try:
                 # Navigate to URL
                 print(f"🌐 Scraping {url}...")
-                response = await page.goto(url, wait_until='networkidle', timeout=30000)
+                wait_until = 'load' if opts['lean'] else 'networkidle'
+                with metrics.timed(metrics.SCRAPE_STAGE_SECONDS, 'navigate', span='browser.navigate'):
+                    response = await page.goto(url, wait_until=wait_until, timeout=30000)
                 
                 if not response.ok:
                     raise Exception(f"HTTP {response.status}: {response.status_text}")
                 
                 # Wait for page to stabilize
-                await page.wait_for_timeout(2000)
+                with metrics.timed(metrics.SCRAPE_STAGE_SECONDS, 'dom_wait', span='browser.dom_wait'):
+                    stability = await self._wait_for_dom_quiet(page, opts['dom_quiet_ms'], opts['dom_max_wait_ms'])
                 
                 # Extract data
-                title = await page.title()
-                html_content = await page.content()
-                
-                # Clean HTML for storage (remove scripts, etc.)
-                soup = BeautifulSoup(html_content, 'lxml')
-                for script in soup(["script", "style", "meta", "link"]):
-                    script.decompose()
-                
-                cleaned_html = str(soup)
-                text_content = soup.get_text(separator='\n', strip=True)
-                
-                # Generate hash for comparison
-                html_hash = hashlib.sha256(cleaned_html.encode()).hexdigest()
+                capture = {'success': True}
+                size_metadata = {}
+                if opts['in_page_extraction']:
+                    extracted = await page.evaluate(IN_PAGE_EXTRACT_SCRIPT, settings.SCRAPE_MAX_TEXT_CHARS)
+                    capture['title'] = extracted['title']
+                    capture['text_content'] = extracted['text']
+                    content_length = extracted['html_length']
+                    if extracted['truncated']:
+                        size_metadata['text_truncated'] = True
+                        metrics.SCRAPE_SAFEGUARDS.labels('truncated').inc()
+                else:
+                    capture['title'] = await page.title()
+                    spool = self._spool(company_id, opts)
+                    html_content = await page.content()
+                    content_length = len(html_content)
+                    spool.write(html_content)
+                    del html_content  # Large pages now live on disk only
+                    capture.update(spool.close())
+                    size_metadata = self._spool_metadata(spool)
+                if opts['watch_regions']:
+                    capture['region_texts'] = await page.evaluate(REGION_EXTRACT_SCRIPT, opts['watch_regions'])
                 
                 # Take screenshot
                 timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
                 screenshot_filename = f"{company_id}_{timestamp}.png"
                 screenshot_path = os.path.join(self.screenshot_dir, screenshot_filename)
                 
-                await page.screenshot(path=screenshot_path, full_page=True)
+                with metrics.timed(metrics.SCRAPE_STAGE_SECONDS, 'screenshot', span='browser.screenshot'):
+                    await page.screenshot(path=screenshot_path, full_page=opts['full_page_screenshot'])
                 
                 # Get page metadata
                 metadata = {
@@ -66,33 +418,220 @@ class WebsiteScraper:
                     'status_code': response.status,
                     'load_time': await self._get_load_time(page),
                     'viewport_size': {'width': 1920, 'height': 1080},
-                    'content_length': len(html_content),
+                    'content_length': content_length,
+                    'lean_mode': opts['lean'],
+                    'blocked_requests': blocked['count'],
+                    'dom_stable': stability['stable'],
+                    'dom_wait_ms': stability['waited'],
+                    'extraction': 'in_page' if opts['in_page_extraction'] else 'html',
+                    'validators': self._response_validators(response.headers),
+                    **size_metadata,
                 }
+                if opts['in_page_extraction']:
+                    metadata['block_hashes'] = extracted['block_hashes']
                 
-                return {
-                    'success': True,
-                    'title': title,
-                    'html_content': cleaned_html,
-                    'text_content': text_content,
-                    'html_hash': html_hash,
+                capture.update({
                     'screenshot_path': screenshot_path,
                     'metadata': metadata,
                     'timestamp': datetime.utcnow().isoformat()
-                }
-                
+                })
+                metrics.SCRAPE_STAGE_SECONDS.labels('capture_browser').observe(time.perf_counter() - started)
+                return capture
+            
             except Exception as e:
                 print(f"❌ Error scraping {url}: {str(e)}")
+                metrics.SCRAPE_FAILURES.labels('browser').inc()
+                self.discard_capture(capture)
                 return {
                     'success': False,
                     'error': str(e),
                     'url': url,
                     'timestamp': datetime.utcnow().isoformat()
                 }
-                
+            
             finally:
                 await browser.close()
+                metrics.BROWSERS_OPEN.dec()
+    
+    def _resolve_options(self, options: Optional[Dict]) -> Dict:
+        """Merge per-company scrape options over the global defaults"""
+        options = options or {}
+        return {
+            'lean': options.get('lean_mode', settings.SCRAPE_LEAN_MODE),
+            'in_page_extraction': options.get('in_page_extraction', settings.SCRAPE_IN_PAGE_EXTRACTION),
+            'blocked_resource_types': set(options.get('blocked_resource_types', settings.SCRAPE_BLOCKED_RESOURCE_TYPES)),
+            'blocked_domains': list(settings.SCRAPE_BLOCKED_DOMAINS) + list(options.get('blocked_domains', [])),
+            'allowed_domains': set(options.get('allowed_domains', [])),
+            'dom_quiet_ms': options.get('dom_quiet_ms', settings.SCRAPE_DOM_QUIET_MS),
+            'dom_max_wait_ms': options.get('dom_max_wait_ms', settings.SCRAPE_DOM_MAX_WAIT_MS),
+            'render_mode': options.get('render_mode', settings.RENDER_MODE_DEFAULT),
+            'full_page_screenshot': options.get('full_page_screenshot', True),
+            'max_html_bytes': min(options.get('max_html_bytes', settings.SCRAPE_MAX_HTML_BYTES),
+                                  settings.SCRAPE_MAX_HTML_BYTES),
+            # Validated on save; names are capped again for configs stored before that
+            'watch_regions': [
+                {'name': r['name'][:REGION_NAME_MAX_CHARS], 'selector': r['selector'], 'type': r.get('type', 'css')}
+                for r in options.get('watch_regions', [])
+            ],
+        }
+    
+    def _make_route_filter(self, opts: Dict, blocked: Dict):
+        """Build a Playwright route handler that aborts unneeded requests"""
+        async def route_filter(route: 'Route'):
+            request = route.request
+            if request.resource_type in opts['blocked_resource_types'] or \
+                    self._is_blocked_host(request.url, opts['blocked_domains'], opts['allowed_domains']):
+                blocked['count'] += 1
+                await route.abort()
+            else:
+                await route.continue_()
+        return route_filter
+    
+    @staticmethod
+    def _is_blocked_host(url: str, blocked_domains: List[str], allowed_domains: set) -> bool:
+        """Check whether a request URL belongs to a blocked (tracker) domain"""
+        host = (urlparse(url).hostname or '').lower()
+        if not host or host in allowed_domains:
+            return False
+        return any(host == d or host.endswith('.' + d) for d in blocked_domains)
+    
+    async def _wait_for_dom_quiet(self, page: 'Page', quiet_ms: int, max_wait_ms: int) -> Dict:
+        """Wait until the DOM stops mutating instead of sleeping a fixed time"""
+        try:
+            return await page.evaluate(DOM_QUIET_SCRIPT, [quiet_ms, max_wait_ms])
+        except Exception:
+            # Navigation during the wait destroys the execution context
+            return {'stable': False, 'waited': 0}
+    
+    def _read_spilled(self, ref: str) -> str:
+        return self.store.get_bytes(ref).decode('utf-8')
+    
+    def _extract(self, raw_html: Optional[str], raw_html_ref: Optional[str]) -> Tuple[str, str, str, str]:
+        """
+        Clean and extract in-memory or spilled HTML; returns (cleaned, text, title, parser)
+        
+        Pages over SCRAPE_LARGE_PAGE_BYTES skip BeautifulSoup, whose tree
+        costs around ten times the document size, and are parsed with lxml
+        straight from the spilled file.
+        """
+        size = len(raw_html) if raw_html is not None else self.store.size(raw_html_ref)
+        if size <= settings.SCRAPE_LARGE_PAGE_BYTES:
+            html_content = raw_html if raw_html is not None else self._read_spilled(raw_html_ref)
+            return (*self.extract_content(html_content), 'bs4')
+        metrics.SCRAPE_SAFEGUARDS.labels('lxml').inc()
+        if raw_html is not None:
+            return (*self.extract_content_lxml(raw_html), 'lxml')
+        return (*self.extract_content_lxml(path=self.store.path(raw_html_ref)), 'lxml')
     
-    async def _get_load_time(self, page: Page) -> float:
+    @staticmethod
+    def extract_content(html_content: str) -> Tuple[str, str, str]:
+        """Clean raw HTML for storage and pull out its visible text and title"""
+        from bs4 import BeautifulSoup
+        soup = BeautifulSoup(html_content, 'lxml')
+        title = soup.title.get_text(strip=True) if soup.title else ''
+        for script in soup(["script", "style", "meta", "link"]):
+            script.decompose()
+        
+        cleaned_html = str(soup)
+        text_content = soup.get_text(separator='\n', strip=True)
+        soup.decompose()  # Break the tree's reference cycles so it is freed now, not at the next GC
+        return cleaned_html, text_content, title
+    
+    @staticmethod
+    def extract_content_lxml(html_content: Optional[str] = None, path: Optional[str] = None,
+                             max_chars: Optional[int] = None) -> Tuple[str, str, str]:
+        """
+        `extract_content` for large pages: lxml only, from HTML text or a file
+        
+        Produces the same text as the BeautifulSoup path (strings of
+        non-script elements, stripped, newline-joined; comments and
+        template/ruby annotation text skipped) and stops collecting it at
+        `max_chars` (default SCRAPE_MAX_TEXT_CHARS).
+        """
+        from lxml import html as lxml_html
+        if path is not None:
+            # Spools are always UTF-8, whatever the page's own <meta charset> says
+            root = lxml_html.parse(path, lxml_html.HTMLParser(encoding='utf-8')).getroot()
+        else:
+            root = lxml_html.document_fromstring(html_content) if html_content.strip() else None
+        if root is None:
+            return '', '', ''
+        
+        title_node = root.find('.//title')
+        title = title_node.text_content().strip() if title_node is not None else ''
+        for node in root.xpath('//script | //style | //meta | //link'):
+            node.drop_tree()  # Keeps the node's tail text, as decompose() does
+        
+        max_chars = max_chars or settings.SCRAPE_MAX_TEXT_CHARS
+        parts = []
+        total = 0
+        stack = [(root, False)]
+        while stack and total < max_chars:
+            node, closed = stack.pop()
+            if closed:
+                text = node.tail.strip() if node.tail else ''
+            else:
+                stack.append((node, True))
+                if not isinstance(node.tag, str) or node.tag in LXML_SKIPPED_TEXT:
+                    continue  # Comments, processing instructions, template/ruby text
+                stack.extend((child, False) for child in reversed(node))
+                text = node.text.strip() if node.text else ''
+            if text:
+                parts.append(text)
+                total += len(text) + 1
+        
+        text_content = '\n'.join(parts)
+        del parts
+        cleaned_html = lxml_html.tostring(root, encoding='unicode')
+        return cleaned_html, text_content, title
+    
+    @staticmethod
+    def extract_regions(html_content: str, regions: List[Dict]) -> Dict[str, Optional[str]]:
+        """Pull the text of each watch region out of raw HTML (CSS via soupsieve, XPath via lxml)"""
+        texts = {}
+        soup = None
+        tree = None
+        for region in regions:
+            try:
+                if region.get('type') == 'xpath':
+                    if tree is None:
+                        from lxml import html as lxml_html
+                        tree = lxml_html.fromstring(html_content)
+                    parts = []
+                    for node in tree.xpath(region['selector']):
+                        if isinstance(node, str):
+                            parts.append(node.strip())
+                        else:
+                            parts.extend(t.strip() for t in node.itertext())
+                else:
+                    if soup is None:
+                        from bs4 import BeautifulSoup
+                        soup = BeautifulSoup(html_content, 'lxml')
+                    parts = [node.get_text(separator='\n', strip=True) for node in soup.select(region['selector'])]
+                text = '\n'.join(p for p in parts if p)
+                texts[region['name']] = text or None
+            except Exception as e:
+                print(f"⚠️  Watch region '{region['name']}' failed: {e}")
+                texts[region['name']] = None
+        return texts
+    
+    @staticmethod
+    def _region_fingerprints(regions: List[Dict], texts: Dict[str, Optional[str]]) -> Dict:
+        """Per-region hash and capped text, stored on the snapshot for region diffs"""
+        fingerprints = {}
+        for region in regions:
+            text = texts.get(region['name'])
+            # Hash what is stored, so a hash change always shows up in the diff
+            capped = (text or '')[:settings.WATCH_REGION_MAX_CHARS]
+            fingerprints[region['name']] = {
+                'selector': region['selector'],
+                'found': text is not None,
+                'hash': hashlib.sha256(capped.encode()).hexdigest(),
+                'text': capped,
+            }
+        return fingerprints
+    
+    async def _get_load_time(self, page: 'Page') -> float:
         """Get page load performance metrics"""
         try:
             metrics = await page.evaluate('''() => {
@@ -103,9 +642,13 @@ class WebsiteScraper:
         except:
             return 0.0
     
-    def compare_with_previous(self, current: Dict, previous: Dict) -> Dict:
+    def compare_with_previous(self, current: Dict, previous: Dict, kind: str = 'page') -> Dict:
         """
         Compare current scrape with previous version
+        
+        Texts are matched line by line (see `differ.line_opcodes`); changed
+        sections and their context are then cut from the text by character
+        offset. `kind` labels the diff metrics ('page' or 'region').
         """
         if not previous:
             return {'has_changes': False, 'is_first': True}
@@ -116,30 +659,72 @@ class WebsiteScraper:
         if not html_changed:
             return {'has_changes': False}
         
-        # Find differences in text
-        from difflib import SequenceMatcher
+        # Browser and HTTP renders (and the bs4 and lxml parsers) serialize markup
+        # differently, and in-page extraction hashes text rather than HTML; only
+        # text counts across a switch
+        current_metadata = current.get('metadata', {})
+        if current.get('text_content') == previous.get('text_content'):
+            if current_metadata.get('render_mode') != previous.get('render_mode'):
+                return {'has_changes': False, 'render_mode_switch': True}
+            if (current_metadata.get('parser') or 'bs4') != (previous.get('parser') or 'bs4'):
+                return {'has_changes': False, 'parser_switch': True}
+            if (current_metadata.get('extraction') or 'html') != (previous.get('extraction') or 'html'):
+                return {'has_changes': False, 'extraction_switch': True}
+        elif current_metadata.get('render_mode') != previous.get('render_mode'):
+            # The two renders of one page rarely match exactly; allow what the
+            # classifier allowed when it judged them equivalent
+            similarity = self.classifier.similarity(previous.get('text_content'), current.get('text_content'))
+            if similarity >= self.classifier.threshold:
+                return {'has_changes': False, 'render_mode_switch': True}
+        
+        from .differ import line_opcodes
         
-        old_text = previous.get('text_content', '')
-        new_text = current.get('text_content', '')
+        old_text = previous.get('text_content') or ''
+        new_text = current.get('text_content') or ''
+        old_lines = old_text.split('\n')
+        new_lines = new_text.split('\n')
         
-        matcher = SequenceMatcher(None, old_text, new_text)
-        similarity_ratio = matcher.ratio()
+        started = time.perf_counter()
+        with tracing.span('diff.compare', 'diff', kind=kind, chars=len(old_text) + len(new_text)):
+            opcodes = line_opcodes(old_lines, new_lines)
+        unchanged = sum(i2 - i1 for tag, i1, i2, _, _ in opcodes if tag == 'equal')
+        total = len(old_lines) + len(new_lines)
+        similarity_ratio = 2.0 * unchanged / total if total else 1.0
         
-        # Extract changed sections
+        # Character offset of each line start; a run of lines ends one before
+        # the next start, leaving its last newline out
+        old_offsets = [0]
+        for line in old_lines:
+            old_offsets.append(old_offsets[-1] + len(line) + 1)
+        new_offsets = [0]
+        for line in new_lines:
+            new_offsets.append(new_offsets[-1] + len(line) + 1)
+        
+        # Extract changed sections; only the 10 that are stored get context copies
         changes = []
-        for tag, i1, i2, j1, j2 in matcher.get_opcodes():
-            if tag != 'equal':
+        change_count = 0
+        for tag, i1, i2, j1, j2 in opcodes:
+            if tag == 'equal':
+                continue
+            change_count += 1
+            if len(changes) < 10:
+                i1, i2 = old_offsets[i1], max(old_offsets[i1], old_offsets[i2] - 1)
+                j1, j2 = new_offsets[j1], max(new_offsets[j1], new_offsets[j2] - 1)
                 changes.append({
                     'type': tag,  # 'replace', 'delete', 'insert'
-                    'old_section': old_text[i1:i2][:200],  # Truncate for storage
-                    'new_section': new_text[j1:j2][:200],
-                    'old_context': old_text[max(0, i1-100):min(len(old_text), i2+100)],
-                    'new_context': new_text[max(0, j1-100):min(len(new_text), j2+100)]
+                    'old_section': old_text[i1:min(i2, i1 + 200)],  # Truncate for storage
+                    'new_section': new_text[j1:min(j2, j1 + 200)],
+                    'old_context': old_text[max(0, i1-100):min(len(old_text), i2+100, i1 + MAX_CONTEXT_CHARS)],
+                    'new_context': new_text[max(0, j1-100):min(len(new_text), j2+100, j1 + MAX_CONTEXT_CHARS)]
                 })
+        del opcodes, old_lines, new_lines, old_offsets, new_offsets
+        
+        metrics.DIFF_SECONDS.labels(kind).observe(time.perf_counter() - started)
+        metrics.DIFF_INPUT_CHARS.labels(kind).observe(len(old_text) + len(new_text))
         
         return {
             'has_changes': True,
             'similarity_ratio': similarity_ratio,
-            'change_count': len(changes),
-            'changes': changes[:10]  # Limit to top 10 changes
-        }
\ No newline at end of file
+            'change_count': change_count,
+            'changes': changes  # Top 10 changes
+        }
@@ -0,0 +1,140 @@
+import html
+from datetime import datetime
+from typing import Dict, List, Optional
+from sqlalchemy import String, cast, func, literal, literal_column, null, select, union_all
+from sqlalchemy.orm import Session
+from ..models.change import Change
+from ..models.company import Company
+from ..models.snapshot import Snapshot
+
+SNAPSHOTS = "snapshots"
+CHANGES = "changes"
+
+# Must match the configuration the tsvector columns are built with
+TS_CONFIG = literal_column("'english'::regconfig")
+# Snippets are HTML: the source text (scraped pages, model output) is
+# escaped and matches wrapped in <mark>. ts_headline can't escape, so it
+# delimits matches with control characters, stripped from the input first,
+# and _snippet_html swaps them for tags after escaping.
+START_SEL, STOP_SEL = "\x02", "\x03"
+HEADLINE_OPTIONS = f"MaxFragments=2, MaxWords=25, MinWords=8, StartSel={START_SEL}, StopSel={STOP_SEL}"
+# ts_headline re-parses its whole input on every call; snapshot text (up to
+# SCRAPE_MAX_TEXT_CHARS) is cut to this much first. A match further in still
+# ranks the snapshot, it just gets a snippet from the start of the page.
+HEADLINE_MAX_CHARS = 100000
+
+def _headline(text, query):
+    return func.ts_headline(TS_CONFIG, func.translate(text, START_SEL + STOP_SEL, ""), query, HEADLINE_OPTIONS)
+
+def _snippet_html(headline: Optional[str]) -> Optional[str]:
+    if headline is None:
+        return None
+    return html.escape(headline, quote=False).replace(START_SEL, "<mark>").replace(STOP_SEL, "</mark>")
+
+def _snapshot_hits(user_id, query, company_id, from_date, to_date):
+    stmt = select(
+        literal("snapshot", String).label("type"),
+        Snapshot.id.label("id"),
+        Snapshot.company_id.label("company_id"),
+        Company.name.label("company_name"),
+        Snapshot.timestamp.label("at"),
+        Snapshot.title.label("title"),
+        cast(null(), String).label("category"),
+        func.ts_rank_cd(Snapshot.search_vector, query).label("rank"),
+    )\
+        .join(Company, Company.id == Snapshot.company_id)\
+        .where(Company.user_id == user_id, Snapshot.search_vector.op("@@")(query))
+    if company_id:
+        stmt = stmt.where(Snapshot.company_id == company_id)
+    if from_date:
+        stmt = stmt.where(Snapshot.timestamp >= from_date)
+    if to_date:
+        stmt = stmt.where(Snapshot.timestamp <= to_date)
+    return stmt
+
+def _change_hits(user_id, query, company_id, from_date, to_date, category):
+    stmt = select(
+        literal("change", String).label("type"),
+        Change.id.label("id"),
+        Change.company_id.label("company_id"),
+        Company.name.label("company_name"),
+        Change.detected_at.label("at"),
+        Change.summary.label("title"),
+        Change.category.label("category"),
+        func.ts_rank_cd(Change.search_vector, query).label("rank"),
+    )\
+        .join(Company, Company.id == Change.company_id)\
+        .where(Company.user_id == user_id, Change.search_vector.op("@@")(query))
+    if company_id:
+        stmt = stmt.where(Change.company_id == company_id)
+    if from_date:
+        stmt = stmt.where(Change.detected_at >= from_date)
+    if to_date:
+        stmt = stmt.where(Change.detected_at <= to_date)
+    if category:
+        stmt = stmt.where(Change.category == category)
+    return stmt
+
+def search(db: Session, user_id, q: str, kinds=(SNAPSHOTS, CHANGES), company_id=None,
+           from_date: Optional[datetime] = None, to_date: Optional[datetime] = None,
+           category: Optional[str] = None, limit: int = 20, offset: int = 0) -> Dict:
+    """
+    Ranked full-text search over snapshot text and change summaries/analysis
+    
+    `q` uses web-search syntax: quoted phrases, `or`, and `-term`. Matching
+    runs against the GIN-indexed tsvector columns Postgres maintains on
+    insert, so new snapshots are searchable as soon as they are committed.
+    Snippets are only generated for the returned page, as escaped HTML with
+    matches in <mark>.
+    """
+    query = func.websearch_to_tsquery(TS_CONFIG, q)
+    parts = []
+    # Categories only exist on changes
+    if SNAPSHOTS in kinds and not category:
+        parts.append(_snapshot_hits(user_id, query, company_id, from_date, to_date))
+    if CHANGES in kinds:
+        parts.append(_change_hits(user_id, query, company_id, from_date, to_date, category))
+    if not parts:
+        return {"results": [], "has_more": False}
+    
+    hits = (union_all(*parts) if len(parts) > 1 else parts[0]).subquery()
+    rows = db.execute(
+        select(hits)
+        .order_by(hits.c.rank.desc(), hits.c.at.desc())
+        .offset(offset)
+        .limit(limit + 1)
+    ).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    
+    snippets = {}
+    snapshot_ids = [row.id for row in rows if row.type == "snapshot"]
+    change_ids = [row.id for row in rows if row.type == "change"]
+    if snapshot_ids:
+        snippets.update(db.execute(
+            select(Snapshot.id, _headline(func.left(Snapshot.text_content, HEADLINE_MAX_CHARS), query))
+            .where(Snapshot.id.in_(snapshot_ids))
+        ).all())
+    if change_ids:
+        snippets.update(db.execute(
+            select(Change.id, _headline(
+                func.coalesce(Change.summary, "") + " " + func.coalesce(Change.analysis, ""), query
+            ))
+            .where(Change.id.in_(change_ids))
+        ).all())
+    
+    results: List[Dict] = [
+        {
+            "type": row.type,
+            "id": row.id,
+            "company_id": row.company_id,
+            "company_name": row.company_name,
+            "at": row.at,
+            "title": row.title,
+            "category": row.category,
+            "rank": round(float(row.rank), 6),
+            "snippet": _snippet_html(snippets.get(row.id)),
+        }
+        for row in rows
+    ]
+    return {"results": results, "has_more": has_more}
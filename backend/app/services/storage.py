@@ -0,0 +1,157 @@
+import gzip
+import json
+import os
+import uuid
+from typing import Any, Iterable, Iterator, Optional
+from ..core.config import settings
+
+class BlobStore:
+    """
+    Local blob storage for pipeline payloads and exports
+
+    Blobs are addressed by a relative reference (e.g. `captures/<company>/<id>.json.gz`)
+    so Celery messages only ever carry the reference, never the content.
+    """
+
+    def __init__(self, root: Optional[str] = None):
+        self.root = root or settings.BLOB_PATH
+        os.makedirs(self.root, exist_ok=True)
+
+    def new_ref(self, prefix: str, suffix: str) -> str:
+        """Allocate a fresh reference under `prefix`"""
+        return f"{prefix.strip('/')}/{uuid.uuid4().hex}{suffix}"
+
+    def path(self, ref: str) -> str:
+        """Resolve a reference to a filesystem path, refusing to escape the root"""
+        root = os.path.realpath(self.root)
+        path = os.path.realpath(os.path.join(root, ref))
+        if not path.startswith(root + os.sep):
+            raise ValueError(f"Invalid blob reference: {ref}")
+        return path
+
+    def put_bytes(self, ref: str, data: bytes) -> str:
+        path = self.path(ref)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)  # Readers never see a partial blob
+        return ref
+
+    def put_stream(self, ref: str, chunks: Iterable[bytes]) -> int:
+        """Write a blob from an iterable of chunks without buffering it; returns its size"""
+        path = self.path(ref)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        size = 0
+        try:
+            with open(tmp_path, 'wb') as f:
+                for chunk in chunks:
+                    f.write(chunk)
+                    size += len(chunk)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+        os.replace(tmp_path, path)
+        return size
+    
+    def iter_bytes(self, ref: str, chunk_size: int = 64 * 1024) -> Iterator[bytes]:
+        with open(self.path(ref), 'rb') as f:
+            while True:
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+    
+    def get_bytes(self, ref: str) -> bytes:
+        with open(self.path(ref), 'rb') as f:
+            return f.read()
+
+    def put_json(self, prefix: str, obj: Any) -> str:
+        """Store a JSON document gzip-compressed and return its reference"""
+        ref = self.new_ref(prefix, '.json.gz')
+        return self.put_bytes(ref, gzip.compress(json.dumps(obj).encode(), compresslevel=5))
+
+    def get_json(self, ref: str) -> Any:
+        return json.loads(gzip.decompress(self.get_bytes(ref)))
+
+    def exists(self, ref: str) -> bool:
+        return os.path.exists(self.path(ref))
+
+    def size(self, ref: str) -> int:
+        return os.path.getsize(self.path(ref))
+
+    def delete(self, ref: str) -> int:
+        """Remove a blob, returning the number of bytes freed"""
+        path = self.path(ref)
+        try:
+            size = os.path.getsize(path)
+            os.remove(path)
+            return size
+        except FileNotFoundError:
+            return 0
+
+class TextSpool:
+    """
+    Text accumulated in memory up to `spill_bytes`, then streamed to a blob
+    
+    Writes beyond `max_bytes` are dropped (`truncated` is set), so a page's
+    size never decides how much memory a worker needs.
+    """
+    
+    def __init__(self, store: BlobStore, prefix: str, max_bytes: int, spill_bytes: int):
+        self.store = store
+        self.prefix = prefix
+        self.max_bytes = max_bytes
+        self.spill_bytes = spill_bytes
+        self.size = 0
+        self.chars = 0
+        self.truncated = False
+        self.ref: Optional[str] = None
+        self._parts = []
+        self._file = None
+    
+    def write(self, text: str) -> bool:
+        """Append text; False once the size cap is reached and further writes are pointless"""
+        if self.truncated:
+            return False
+        data = text.encode('utf-8')
+        room = self.max_bytes - self.size
+        if len(data) > room:
+            # Cut on a character boundary
+            text = data[:room].decode('utf-8', 'ignore')
+            data = text.encode('utf-8')
+            self.truncated = True
+        self.size += len(data)
+        self.chars += len(text)
+        if self._file is None and self.size > self.spill_bytes:
+            self.ref = self.store.new_ref(self.prefix, '.html')
+            path = self.store.path(self.ref)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            self._file = open(f"{path}.tmp", 'wb')
+            self._file.writelines(self._parts)
+            self._parts = []
+        if self._file is not None:
+            self._file.write(data)
+        else:
+            self._parts.append(data)
+        return not self.truncated
+    
+    def close(self) -> dict:
+        """Finish the spool: `{'raw_html': text}` when it stayed in memory, else `{'raw_html_ref': ref}`"""
+        if self._file is None:
+            text = b''.join(self._parts).decode('utf-8')
+            self._parts = []
+            return {'raw_html': text}
+        self._file.close()
+        path = self.store.path(self.ref)
+        os.replace(f"{path}.tmp", path)
+        return {'raw_html_ref': self.ref}
+    
+    def discard(self):
+        """Drop everything written so far"""
+        self._parts = []
+        if self._file is not None:
+            self._file.close()
+            os.remove(f"{self.store.path(self.ref)}.tmp")
+            self._file = None
@@ -0,0 +1,92 @@
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from ..core.config import settings
+
+class VectorIndex:
+    """
+    In-memory cosine index over unit vectors, backed by one growable array
+    
+    Rows live in a float32 matrix that doubles in capacity as it fills, so
+    adding is amortized O(1) and an exact search is a single matrix-vector
+    product. Past CHANGE_LSH_MIN_ROWS rows, search narrows to candidates
+    from random-hyperplane LSH tables (CHANGE_LSH_TABLES tables of
+    CHANGE_LSH_BITS bits) and re-ranks those exactly: approximate, since a
+    neighbor that shares no bucket with the query is missed.
+    """
+    
+    def __init__(self, dim: int, seed: int = 0, capacity: int = 256):
+        self.dim = dim
+        self.ids: List[str] = []
+        self._rows: Dict[str, int] = {}
+        self._vectors = np.zeros((capacity, dim), dtype=np.float32)
+        self._times = np.zeros(capacity, dtype=np.float64)  # Unix seconds, for windowed search
+        # Same seed, same hyperplanes: indexes rebuilt in other processes bucket identically
+        rng = np.random.default_rng(seed)
+        self._planes = rng.standard_normal((settings.CHANGE_LSH_TABLES, settings.CHANGE_LSH_BITS, dim))\
+            .astype(np.float32)
+        self._weights = (1 << np.arange(settings.CHANGE_LSH_BITS)).astype(np.int64)
+        self._buckets: List[Dict[int, List[int]]] = [defaultdict(list) for _ in range(settings.CHANGE_LSH_TABLES)]
+    
+    def __len__(self) -> int:
+        return len(self.ids)
+    
+    def __contains__(self, item_id: str) -> bool:
+        return item_id in self._rows
+    
+    def _signatures(self, vector: np.ndarray) -> np.ndarray:
+        """One bucket key per table: the sign pattern of the vector against its hyperplanes"""
+        return ((self._planes @ vector) > 0).astype(np.int64) @ self._weights
+    
+    def add(self, item_id: str, vector: np.ndarray, timestamp: float = 0.0):
+        """Add a unit vector; an id already in the index is left as it is"""
+        if item_id in self._rows:
+            return
+        row = len(self.ids)
+        if row == len(self._vectors):
+            self._vectors = np.concatenate([self._vectors, np.zeros_like(self._vectors)])
+            self._times = np.concatenate([self._times, np.zeros_like(self._times)])
+        self.ids.append(item_id)
+        self._rows[item_id] = row
+        self._vectors[row] = vector
+        self._times[row] = timestamp
+        for table, key in enumerate(self._signatures(vector)):
+            self._buckets[table][int(key)].append(row)
+    
+    def vector(self, item_id: str) -> Optional[np.ndarray]:
+        row = self._rows.get(item_id)
+        return None if row is None else self._vectors[row]
+    
+    def _candidates(self, vector: np.ndarray) -> np.ndarray:
+        if len(self.ids) < settings.CHANGE_LSH_MIN_ROWS:
+            return np.arange(len(self.ids))
+        rows = set()
+        for table, key in enumerate(self._signatures(vector)):
+            rows.update(self._buckets[table].get(int(key), ()))
+        return np.fromiter(rows, dtype=np.int64, count=len(rows))
+    
+    def search(self, vector: np.ndarray, k: int = 10, min_score: float = 0.0,
+               since: Optional[float] = None, exclude: Optional[str] = None) -> List[Tuple[str, float]]:
+        """
+        Up to `k` (id, cosine) pairs at or above `min_score`, best first
+        
+        `since` drops rows timestamped before it; `exclude` drops one id
+        (typically the query's own).
+        """
+        rows = self._candidates(vector)
+        if since is not None and len(rows):
+            rows = rows[self._times[rows] >= since]
+        if not len(rows):
+            return []
+        scores = self._vectors[rows] @ vector
+        keep = scores >= min_score
+        rows, scores = rows[keep], scores[keep]
+        order = np.argsort(-scores)
+        results = []
+        for i in order:
+            item_id = self.ids[rows[i]]
+            if item_id != exclude:
+                results.append((item_id, float(scores[i])))
+                if len(results) >= k:
+                    break
+        return results
@@ -0,0 +1,48 @@
+from typing import Dict, List, Optional
+
+# Watch regions (scrape_config['watch_regions']) are checked when a company's
+# scrape_config is saved: a region's name ends up in Change.region and in
+# snapshot metadata keys, so it has to fit the column and be unique.
+
+NAME_MAX_CHARS = 100  # Change.region
+SELECTOR_MAX_CHARS = 1000
+MAX_REGIONS = 20
+TYPES = ('css', 'xpath')
+
+def normalize_watch_regions(regions: Optional[List]) -> List[Dict]:
+    """
+    Validated copy of a watch region list; raises ValueError on the first bad entry
+    
+    Names and selectors are stripped; `type` defaults to css.
+    """
+    if regions is None:
+        return []
+    if not isinstance(regions, list):
+        raise ValueError("watch_regions must be a list")
+    if len(regions) > MAX_REGIONS:
+        raise ValueError(f"At most {MAX_REGIONS} watch regions")
+    
+    normalized = []
+    names = set()
+    for index, region in enumerate(regions, start=1):
+        if not isinstance(region, dict):
+            raise ValueError(f"Watch region {index} must be an object")
+        name = region.get('name')
+        selector = region.get('selector')
+        region_type = region.get('type', 'css')
+        if not isinstance(name, str) or not name.strip():
+            raise ValueError(f"Watch region {index} needs a name")
+        name = name.strip()
+        if len(name) > NAME_MAX_CHARS:
+            raise ValueError(f"Watch region name '{name[:20]}...' is over {NAME_MAX_CHARS} characters")
+        if name in names:
+            raise ValueError(f"Duplicate watch region name '{name}'")
+        if not isinstance(selector, str) or not selector.strip():
+            raise ValueError(f"Watch region '{name}' needs a selector")
+        if len(selector) > SELECTOR_MAX_CHARS:
+            raise ValueError(f"Watch region '{name}' selector is over {SELECTOR_MAX_CHARS} characters")
+        if region_type not in TYPES:
+            raise ValueError(f"Watch region '{name}' type must be one of {', '.join(TYPES)}")
+        names.add(name)
+        normalized.append({'name': name, 'selector': selector.strip(), 'type': region_type})
+    return normalized
@@ -0,0 +1,62 @@
+import asyncio
+import ipaddress
+import socket
+from typing import Optional
+from urllib.parse import urlparse
+
+# Slack and generic webhooks are user-supplied URLs that workers POST to
+# from inside the cluster, so they must never reach a private network (the
+# metadata service, Redis, the database). URLs are checked when they are
+# saved and again, after DNS resolution, right before each delivery;
+# redirects are not followed.
+
+SLACK_HOST = "hooks.slack.com"
+BLOCKED_SUFFIXES = (".localhost", ".local", ".internal")
+
+def _is_public(address: str) -> bool:
+    try:
+        return ipaddress.ip_address(address).is_global
+    except ValueError:
+        return False
+
+def check_webhook_url(url: str, slack: bool = False) -> Optional[str]:
+    """
+    Why a webhook URL can't be used, or None when it can
+    
+    Only http(s) URLs with a host name or public IP literal pass; Slack
+    webhooks must be https on hooks.slack.com.
+    """
+    try:
+        parsed = urlparse(url)
+        host = parsed.hostname
+        parsed.port  # Raises on a malformed port
+    except ValueError:
+        return "Malformed URL"
+    if parsed.scheme not in ("http", "https") or not host:
+        return "Must be an http(s) URL with a host"
+    if slack and (parsed.scheme != "https" or host != SLACK_HOST):
+        return f"Slack webhooks must be https://{SLACK_HOST}/... URLs"
+    if parsed.username or parsed.password:
+        return "Credentials in the URL are not allowed"
+    host = host.rstrip(".").lower()
+    if host == "localhost" or host.endswith(BLOCKED_SUFFIXES):
+        return "Local host names are not allowed"
+    try:
+        ipaddress.ip_address(host)
+    except ValueError:
+        return None  # A name; checked again once resolved
+    if not _is_public(host):
+        return "Private, loopback and link-local addresses are not allowed"
+    return None
+
+async def ensure_public(url: str):
+    """Raise ValueError unless every address the URL's host resolves to is public"""
+    parsed = urlparse(url)
+    infos = await asyncio.get_running_loop().getaddrinfo(
+        parsed.hostname, parsed.port or (443 if parsed.scheme == "https" else 80), type=socket.SOCK_STREAM
+    )
+    if not infos:
+        raise ValueError(f"{parsed.hostname} did not resolve")
+    for *_, sockaddr in infos:
+        if not _is_public(sockaddr[0]):
+            raise ValueError(f"{parsed.hostname} resolves to a non-public address")
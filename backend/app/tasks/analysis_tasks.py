@@ -1,16 +1,25 @@
 import json
 from celery import shared_task
 from sqlalchemy.orm import Session
+from ..core import metrics
+from ..core.cache import invalidate_user_cache
 from ..models.base import SessionLocal
 from ..models.change import Change
 from ..models.snapshot import Snapshot
 from ..services.analyzer import ChangeAnalyzer
-import asyncio
+from ..services.change_grouping import assign_cluster, describe_change
+from ..services.events import CHANGE_ANALYZED, publish_event
+from ..services.dashboard_stats import record_analyzed_change
+from .runtime import run_async
 
 @shared_task(bind=True, max_retries=2)
 def analyze_change(self, change_id: str):
     """
     Analyze a detected change for business significance
+    
+    The change is first grouped with the tenant's similar recent changes
+    (see change_grouping); when a near-identical one was already analyzed,
+    its analysis is reused and the LLM is not called.
     """
     db = SessionLocal()
     try:
@@ -19,32 +28,63 @@ def analyze_change(self, change_id: str):
         if not change:
             return {"error": "Change not found"}
         
-        old_snapshot = db.query(Snapshot).filter(Snapshot.id == change.old_snapshot_id).first()
-        new_snapshot = db.query(Snapshot).filter(Snapshot.id == change.new_snapshot_id).first()
+        # Redelivered task; the analysis was already committed
+        if change.analysis:
+            return {"success": True, "change_id": change_id, "skipped": True}
         
-        if not old_snapshot or not new_snapshot:
-            return {"error": "Snapshots not found"}
+        # Grouping is an optimization; analysis goes ahead without it
+        grouping = None
+        if change.company:
+            try:
+                grouping = assign_cluster(db, change, change.company.user_id)
+            except Exception as e:
+                db.rollback()
+                print(f"⚠️  Could not group change {change_id}: {e}")
+        reused = grouping['reuse_from'] if grouping else None
         
-        # Get company name
-        company_name = change.company.name if change.company else "Unknown Company"
-        
-        # Run analysis
-        analyzer = ChangeAnalyzer()
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        
-        # Extract changes from change_data
-        change_data = change.change_data or {}
-        detected_changes = change_data.get('changes', [])
-        
-        analysis = loop.run_until_complete(
-            analyzer.analyze_significance(
-                company_name=company_name,
-                old_content=old_snapshot.text_content or "",
-                new_content=new_snapshot.text_content or "",
-                detected_changes=detected_changes
+        if reused:
+            if reused.company_id == change.company_id:
+                analysis = dict(json.loads(reused.analysis).get('full_analysis') or {})
+                analysis.update(score=reused.significance_score, category=reused.category, summary=reused.summary)
+            else:
+                # Another company's wording (summary, justification) names that company; only the verdict carries over
+                analysis = {
+                    'score': reused.significance_score,
+                    'category': reused.category,
+                    'summary': describe_change(change.change_data),
+                    'justification': "Same change as one already analyzed for another tracked company",
+                    'recommended_action': ''
+                }
+            metrics.CHANGE_GROUPING.labels('analysis_reused').inc()
+        else:
+            old_snapshot = db.query(Snapshot).filter(Snapshot.id == change.old_snapshot_id).first()
+            new_snapshot = db.query(Snapshot).filter(Snapshot.id == change.new_snapshot_id).first()
+            
+            if not old_snapshot or not new_snapshot:
+                return {"error": "Snapshots not found"}
+            
+            # Get company name
+            company_name = change.company.name if change.company else "Unknown Company"
+            if change.region:
+                company_name = f"{company_name} ({change.region} section)"
+            if change.page_url:
+                company_name = f"{company_name} ({change.page_url} page)"
+            
+            # Run analysis
+            analyzer = ChangeAnalyzer()
+            
+            # Extract changes from change_data
+            change_data = change.change_data or {}
+            detected_changes = change_data.get('changes', [])
+            
+            analysis = run_async(
+                analyzer.analyze_significance(
+                    company_name=company_name,
+                    old_content=old_snapshot.text_content or "",
+                    new_content=new_snapshot.text_content or "",
+                    detected_changes=detected_changes
+                )
             )
-        )
         
         # Update change record
         change.significance_score = analysis.get('score', 50)
@@ -53,18 +93,33 @@ def analyze_change(self, change_id: str):
         change.analysis = json.dumps({
             'justification': analysis.get('justification', ''),
             'recommended_action': analysis.get('recommended_action', ''),
-            'full_analysis': analysis
+            'full_analysis': analysis,
+            **({'reused_from': str(reused.id)} if reused else {})
         })
+        if change.company:
+            record_analyzed_change(db, change.company.user_id, change.company_id, change.detected_at,
+                                   change.category, change.significance_score)
         
         db.commit()
         
+        if change.company:
+            invalidate_user_cache(change.company.user_id)
+            publish_event(change.company.user_id, CHANGE_ANALYZED, {
+                "company_id": str(change.company_id),
+                "change_id": change_id,
+                "significance_score": change.significance_score,
+                "category": change.category
+            })
+        
         return {
             "success": True,
             "change_id": change_id,
             "significance": change.significance_score,
-            "category": change.category
+            "category": change.category,
+            "cluster_id": str(grouping['cluster_id']) if grouping else None,
+            "reused_from": str(reused.id) if reused else None
         }
-        
+    
     except Exception as e:
         self.retry(exc=e, countdown=60)
     finally:
@@ -1,11 +1,15 @@
+import time
 from celery import Celery
+from celery.signals import task_failure, task_postrun, task_prerun, task_retry, worker_init, worker_process_init
+from ..core import metrics, tracing
 from ..core.config import settings
 
 celery_app = Celery(
     "pivotwatch",
     broker=settings.REDIS_URL,
     backend=settings.REDIS_URL,
-    include=["app.tasks.scrape_tasks", "app.tasks.analysis_tasks"]
+    include=["app.tasks.scrape_tasks", "app.tasks.analysis_tasks", "app.tasks.maintenance_tasks",
+             "app.tasks.notification_tasks", "app.tasks.export_tasks", "app.tasks.media_tasks"]
 )
 
 # Configure Celery
@@ -20,10 +24,97 @@ celery_app.conf.update(
     task_soft_time_limit=25 * 60,  # 25 minutes
     worker_prefetch_multiplier=1,
     task_acks_late=True,
+    # Each pipeline stage gets its own queue so browser, CPU and LLM work
+    # can run on workers with a matching pool (see docker-compose.yaml)
+    task_routes={
+        "app.tasks.scrape_tasks.scrape_company": {"queue": "scrape"},  # Manual scans: scrape_priority
+        "app.tasks.scrape_tasks.discover_pages": {"queue": "scrape"},
+        "app.tasks.scrape_tasks.extract_snapshot": {"queue": "process"},
+        "app.tasks.scrape_tasks.diff_snapshot": {"queue": "process"},
+        "app.tasks.analysis_tasks.analyze_change": {"queue": "llm"},
+        "app.tasks.media_tasks.render_snapshot_images": {"queue": "media"},
+    },
     beat_schedule={
         "scrape-all-companies": {
             "task": "app.tasks.scrape_tasks.scrape_all_companies",
+            "schedule": settings.SCAN_SCHEDULER_INTERVAL,  # Sweeps for due scans; each company is scanned daily
+        },
+        "dispatch-scans": {
+            "task": "app.tasks.scrape_tasks.dispatch_scans",
+            "schedule": settings.SCAN_DISPATCH_INTERVAL,  # Feeds the scrape queue from the fair queues
+        },
+        "scrape-due-pages": {
+            "task": "app.tasks.scrape_tasks.scrape_due_pages",
+            "schedule": settings.SCAN_SCHEDULER_INTERVAL,  # Multi-page mode: subpages on their own back-off
+        },
+        "refresh-crawl-frontiers": {
+            "task": "app.tasks.scrape_tasks.refresh_crawl_frontiers",
+            "schedule": 3600.0,  # Hourly sweep; each frontier refreshes every CRAWL_DISCOVERY_INTERVAL_HOURS
+        },
+        "dispatch-notifications": {
+            "task": "app.tasks.notification_tasks.dispatch_notifications",
+            "schedule": 300.0,  # Every 5 minutes
+        },
+        "compact-snapshots": {
+            "task": "app.tasks.maintenance_tasks.compact_snapshots",
             "schedule": 86400.0,  # Daily
         },
     }
-)
\ No newline at end of file
+)
+
+# Metrics: every worker serves its registry on WORKER_METRICS_PORT; prefork
+# children (which run the tasks) each get WORKER_METRICS_PORT + 1 + index
+@worker_init.connect
+def start_worker_exporter(**kwargs):
+    if settings.TRACE_SAMPLE_RATE > 0 or settings.TRACE_TASKS:
+        from ..models.base import engine
+        tracing.install_db_spans(engine)
+    if settings.WORKER_METRICS_PORT:
+        metrics.register_runtime_collector(metrics.PIPELINE_QUEUES)
+        metrics.start_exporter(settings.WORKER_METRICS_PORT)
+
+@worker_process_init.connect
+def start_child_exporter(**kwargs):
+    if settings.WORKER_METRICS_PORT:
+        from billiard.process import current_process
+        metrics.start_exporter(settings.WORKER_METRICS_PORT + 1 + getattr(current_process(), "index", 0))
+
+_task_started = {}
+_task_traces = {}  # task id -> (trace, profile)
+
+def _task_selected(task, names) -> bool:
+    return task.name in names or task.name.rsplit(".", 1)[-1] in names
+
+@task_prerun.connect
+def record_task_start(task_id=None, task=None, **kwargs):
+    _task_started[task_id] = time.perf_counter()
+    if task is None:
+        return
+    # Tracing/profiling: TRACE_TASKS / PROFILE_TASKS always, other tasks at the sample rates
+    trace = tracing.start_trace(task.name, "task") \
+        if tracing.should_trace(_task_selected(task, settings.TRACE_TASKS)) else None
+    mode = tracing.profile_mode(settings.PROFILE_MODE if _task_selected(task, settings.PROFILE_TASKS) else None)
+    profile = tracing.Profile(mode, f"task-{task.name}") if mode else None
+    if profile and not profile.start():
+        profile = None
+    if trace or profile:
+        _task_traces[task_id] = (trace, profile)
+
+@task_postrun.connect
+def record_task_duration(task_id=None, task=None, **kwargs):
+    started = _task_started.pop(task_id, None)
+    if started is not None and task is not None:
+        metrics.TASK_SECONDS.labels(task.name).observe(time.perf_counter() - started)
+    trace, profile = _task_traces.pop(task_id, (None, None))
+    if profile:
+        profile.stop()
+    if trace:
+        tracing.finish_trace(trace)
+
+@task_failure.connect
+def record_task_failure(sender=None, **kwargs):
+    metrics.TASK_FAILURES.labels(getattr(sender, "name", "unknown"), "failed").inc()
+
+@task_retry.connect
+def record_task_retry(sender=None, **kwargs):
+    metrics.TASK_FAILURES.labels(getattr(sender, "name", "unknown"), "retried").inc()
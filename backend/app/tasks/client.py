@@ -0,0 +1,89 @@
+import time
+from typing import Dict, Optional
+from ..core import metrics
+from ..services import fair_scheduler
+from ..services.scan_state import acquire_scan_lease, holds_scan_lease, new_scan_id, scan_in_progress
+from .celery_app import celery_app
+
+# Producer-side entry points for the API. Tasks are sent by name so the API
+# process never imports the task modules (and with them Playwright,
+# BeautifulSoup and langchain); the names must match the task modules.
+SCRAPE_COMPANY = "app.tasks.scrape_tasks.scrape_company"
+DISCOVER_PAGES = "app.tasks.scrape_tasks.discover_pages"
+EXPORT_DATA = "app.tasks.export_tasks.export_data"
+
+# Manual scans skip the fair queue and go to a queue every scrape worker
+# consumes alongside `scrape`. Since the dispatcher keeps `scrape` no deeper
+# than SCAN_GLOBAL_CONCURRENCY, a manual scan waits behind at most that many.
+PRIORITY_SCRAPE_QUEUE = "scrape_priority"
+
+def send_scan(request: Dict, lane: str = fair_scheduler.LANE_SCHEDULED):
+    """Put one scan request (see fair_scheduler.submit) on its Celery queue"""
+    options = {"queue": PRIORITY_SCRAPE_QUEUE} if lane == fair_scheduler.LANE_MANUAL else {}
+    celery_app.send_task(
+        SCRAPE_COMPANY,
+        args=[request["company_id"], request["url"]],
+        kwargs={
+            "scan_id": request["scan_id"],
+            "queued_at": request["queued_at"],
+            "plan": request["plan"],
+            "lane": lane,
+            "page_id": request.get("page_id"),
+        },
+        task_id=f"scrape:{request['scan_id']}",
+        **options
+    )
+
+def dispatch_scan(request: Dict) -> bool:
+    """
+    Send a scan from the fair queue (see fair_scheduler.dispatch)
+    
+    The scan takes its lease here rather than when it was queued, so the
+    lease's TTL covers the run, not the wait. A company already being
+    scanned drops the request.
+    """
+    if not holds_scan_lease(request["company_id"], request["scan_id"], request.get("page_id")):
+        metrics.SCANS_SKIPPED.labels('in_progress').inc()
+        return False
+    send_scan(request)
+    return True
+
+def enqueue_scan(company_id: str, url: str, user_id: Optional[str] = None,
+                 plan: Optional[str] = None, manual: bool = False, page_id: Optional[str] = None) -> Optional[str]:
+    """
+    Queue a scan unless one is already running or waiting for the company (or page)
+    
+    Scheduled scans wait in the tenant's fair queue until the dispatcher
+    hands them to a worker; `manual` scans take the fast lane while the
+    tenant is within MANUAL_SCANS_PER_MINUTE. `page_id` scans one of the
+    company's crawled subpages (CrawlPage) at `url`. Returns the scan id, or
+    None when the request collapsed into a running or queued scan.
+    """
+    if scan_in_progress(company_id, page_id):
+        metrics.SCANS_SKIPPED.labels('in_progress').inc()
+        return None
+    plan = fair_scheduler.plan_of(plan)
+    user_id = user_id or "unknown"
+    if manual and fair_scheduler.allow_manual(user_id):
+        scan_id = acquire_scan_lease(company_id, page_id)
+        if not scan_id:
+            metrics.SCANS_SKIPPED.labels('in_progress').inc()
+            return None
+        request = {"company_id": company_id, "url": url, "scan_id": scan_id, "plan": plan,
+                   "queued_at": time.time(), "page_id": page_id}
+        send_scan(request, fair_scheduler.LANE_MANUAL)
+        fair_scheduler.mark_dispatched(scan_id, plan)
+        return scan_id
+    scan_id = new_scan_id()
+    if fair_scheduler.submit(company_id, url, scan_id, user_id, plan, page_id) < 0:
+        metrics.SCANS_SKIPPED.labels('queued').inc()
+        return None
+    return scan_id
+
+def enqueue_discovery(company_id: str):
+    """Queue a crawl frontier refresh (see scrape_tasks.discover_pages)"""
+    celery_app.send_task(DISCOVER_PAGES, args=[company_id])
+
+def enqueue_export(job_id: str, user_id: str, kind: str, fmt: str, filters: Dict):
+    """Queue a full export job (see export_tasks.export_data)"""
+    celery_app.send_task(EXPORT_DATA, args=[job_id, user_id, kind, fmt, filters])
@@ -0,0 +1,36 @@
+from celery import shared_task
+from datetime import datetime
+from ..models.base import SessionLocal
+from ..services.exporter import EXTENSIONS, iter_export, update_export_job
+from ..services.storage import BlobStore
+
+@shared_task(bind=True, max_retries=1)
+def export_data(self, job_id: str, user_id: str, kind: str, fmt: str, filters: dict):
+    """
+    Write a full export to the blob store for later download
+    
+    Rows are streamed from a server-side cursor straight into the blob, so
+    memory use does not grow with the export.
+    """
+    db = SessionLocal()
+    store = BlobStore()
+    try:
+        update_export_job(job_id, status="running", started_at=datetime.utcnow().isoformat())
+        # Dates arrive as ISO strings through the JSON serializer
+        filters = {
+            key: datetime.fromisoformat(value) if key in ("from_date", "to_date") and value else value
+            for key, value in filters.items()
+        }
+        ref = f"exports/{user_id}/{job_id}{EXTENSIONS[fmt]}"
+        size = store.put_stream(ref, iter_export(db, user_id, kind, fmt, filters))
+        update_export_job(job_id, status="completed", ref=ref, size=size,
+                          completed_at=datetime.utcnow().isoformat())
+        return {"success": True, "job_id": job_id, "size": size}
+    except Exception as e:
+        db.rollback()
+        if self.request.retries >= self.max_retries:
+            update_export_job(job_id, status="failed", error=f"{type(e).__name__}: {e}")
+            return {"error": str(e)}
+        self.retry(exc=e, countdown=60)
+    finally:
+        db.close()
@@ -0,0 +1,158 @@
+import os
+from collections import defaultdict
+from celery import shared_task
+from datetime import datetime, timedelta
+from sqlalchemy import or_
+from ..core.config import settings
+from ..models.base import SessionLocal
+from ..models.company import Company
+from ..models.snapshot import Snapshot
+from ..models.change import Change
+from ..models.user import User
+from ..services.storage import BlobStore
+from ..services import dashboard_stats
+from ..services.exporter import find_expired_exports
+from ..services.renditions import delete_renditions, find_orphaned_renditions, remove_tree
+from ..services.retention import (
+    get_retention_policy, select_snapshots_to_prune, offload_html, reencode_screenshot,
+    remove_file, find_orphaned_screenshots
+)
+
+def _chunks(items, size):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+@shared_task
+def compact_snapshots():
+    """
+    Apply per-plan snapshot retention and compact what is kept
+    
+    Work is done one company at a time in small batches, committing after
+    each, so no long-running transaction holds locks on `snapshots`. HTML
+    of snapshots past the re-encode age moves to gzipped blobs
+    (`html_ref`) kept for archival only; the app never reads it back.
+    """
+    db = SessionLocal()
+    store = BlobStore()
+    batch_size = settings.RETENTION_BATCH_SIZE
+    report = {
+        "companies": 0,
+        "snapshots_deleted": 0,
+        "html_offloaded": 0,
+        "screenshots_reencoded": 0,
+        "orphans_removed": 0,
+        "exports_removed": 0,
+        "bytes_reclaimed": 0,
+    }
+    try:
+        companies = db.query(Company.id, User.plan)\
+            .join(User, User.id == Company.user_id)\
+            .all()
+        reencode_cutoff = datetime.utcnow() - timedelta(days=settings.RETENTION_REENCODE_AFTER_DAYS)
+        
+        for company_id, plan in companies:
+            report["companies"] += 1
+            policy = get_retention_policy(plan)
+            
+            # Only ids and timestamps; content is never loaded to decide.
+            # Each crawled subpage is its own chain, retained like the main page.
+            histories = defaultdict(list)
+            for snapshot_id, timestamp, page_url in db.query(Snapshot.id, Snapshot.timestamp, Snapshot.page_url)\
+                    .filter(Snapshot.company_id == company_id):
+                histories[page_url].append((snapshot_id, timestamp))
+            protected = set()
+            for old_id, new_id in db.query(Change.old_snapshot_id, Change.new_snapshot_id)\
+                    .filter(Change.company_id == company_id):
+                protected.update((old_id, new_id))
+            db.commit()
+            
+            prune = [sid for history in histories.values() for sid in select_snapshots_to_prune(history, protected, policy)]
+            for batch in _chunks(prune, batch_size):
+                doomed = db.query(Snapshot.screenshot_path, Snapshot.snapshot_metadata)\
+                    .filter(Snapshot.id.in_(batch))\
+                    .all()
+                db.query(Snapshot).filter(Snapshot.id.in_(batch)).delete(synchronize_session=False)
+                db.commit()
+                
+                # Files go only after the rows are gone
+                for screenshot_path, metadata in doomed:
+                    report["bytes_reclaimed"] += remove_file(screenshot_path)
+                    html_ref = (metadata or {}).get("html_ref")
+                    if html_ref:
+                        report["bytes_reclaimed"] += store.delete(html_ref)
+                    report["bytes_reclaimed"] += delete_renditions(store, (metadata or {}).get("renditions"))
+                report["snapshots_deleted"] += len(batch)
+            
+            # Re-encode old survivors: HTML to compressed blobs, PNG to WebP
+            stale_ids = [sid for (sid,) in db.query(Snapshot.id)
+                         .filter(Snapshot.company_id == company_id,
+                                 Snapshot.timestamp < reencode_cutoff,
+                                 or_(Snapshot.html_content.isnot(None),
+                                     Snapshot.screenshot_path.like("%.png")))]
+            db.commit()
+            for batch in _chunks(stale_ids, batch_size):
+                replaced = []
+                for snapshot in db.query(Snapshot).filter(Snapshot.id.in_(batch)):
+                    metadata = dict(snapshot.snapshot_metadata or {})
+                    if snapshot.html_content is not None:
+                        metadata["html_ref"], saved = offload_html(store, str(company_id), snapshot.html_content)
+                        snapshot.html_content = None
+                        report["html_offloaded"] += 1
+                        report["bytes_reclaimed"] += saved
+                    if snapshot.screenshot_path and snapshot.screenshot_path.endswith(".png"):
+                        webp_path, saved = reencode_screenshot(snapshot.screenshot_path)
+                        if webp_path:
+                            replaced.append((snapshot.screenshot_path, saved))
+                            snapshot.screenshot_path = webp_path
+                    snapshot.snapshot_metadata = metadata
+                db.commit()
+                for png_path, saved in replaced:
+                    remove_file(png_path)
+                    report["screenshots_reencoded"] += 1
+                    report["bytes_reclaimed"] += saved
+        
+        # Screenshot files no snapshot points at (failed pipelines, deleted companies)
+        if os.path.isdir(settings.SCREENSHOT_PATH):
+            referenced = set()
+            rows = db.query(Snapshot.screenshot_path)\
+                .filter(Snapshot.screenshot_path.isnot(None))\
+                .yield_per(5000)
+            for (path,) in rows:
+                referenced.add(os.path.basename(path))
+            db.commit()
+            grace = timedelta(hours=settings.ORPHAN_SCREENSHOT_GRACE_HOURS)
+            for orphan in find_orphaned_screenshots(settings.SCREENSHOT_PATH, referenced, grace):
+                report["bytes_reclaimed"] += remove_file(orphan)
+                report["orphans_removed"] += 1
+        
+        # Renditions of deleted companies (the snapshot rows went with the company)
+        company_ids = {str(company_id) for company_id, _ in companies}
+        grace = timedelta(hours=settings.ORPHAN_SCREENSHOT_GRACE_HOURS)
+        for orphan in find_orphaned_renditions(store, company_ids, grace):
+            report["bytes_reclaimed"] += remove_tree(orphan)
+            report["orphans_removed"] += 1
+        
+        # Finished background exports past their download window
+        export_dir = store.path("exports")
+        for expired in find_expired_exports(export_dir, timedelta(hours=settings.EXPORT_RETENTION_HOURS)):
+            report["bytes_reclaimed"] += remove_file(expired)
+            report["exports_removed"] += 1
+        
+        print(f"🧹 Snapshot compaction: {report}")
+        return report
+    finally:
+        db.close()
+
+@shared_task
+def rebuild_dashboard_stats():
+    """
+    Recompute the dashboard counters from `changes`
+    
+    Not scheduled: the pipeline tasks maintain the counters incrementally.
+    Run once after deploying to backfill, or to repair drift.
+    """
+    db = SessionLocal()
+    try:
+        return {"rows": dashboard_stats.rebuild_dashboard_stats(db)}
+    finally:
+        db.close()
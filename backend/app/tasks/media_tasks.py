@@ -0,0 +1,60 @@
+from celery import shared_task
+from typing import Optional
+from sqlalchemy.orm import defer
+from ..models.base import SessionLocal
+from ..models.snapshot import Snapshot
+from ..core import metrics
+from ..services.renditions import delete_renditions, rendition_names, render_snapshot
+from ..services.storage import BlobStore
+
+@shared_task(bind=True, max_retries=2)
+def render_snapshot_images(self, snapshot_id: str, previous_snapshot_id: Optional[str] = None):
+    """
+    Render a snapshot's screenshot into WebP tiles, a thumbnail and change crops
+    
+    Queued by the diff stage once the scan is complete, on its own `media`
+    queue so image decoding never delays scans. `previous_snapshot_id` (the
+    snapshot a change was detected against) adds crops around the changed
+    regions. Re-running replaces the earlier renditions.
+    """
+    db = SessionLocal()
+    store = BlobStore()
+    try:
+        columns = (defer(Snapshot.html_content), defer(Snapshot.text_content))
+        snapshot = db.query(Snapshot).options(*columns).filter(Snapshot.id == snapshot_id).first()
+        if not snapshot or not snapshot.screenshot_path:
+            metrics.RENDITIONS.labels('no_screenshot').inc()
+            return {"success": False, "reason": "no screenshot"}
+        previous_path = None
+        if previous_snapshot_id:
+            previous_path = db.query(Snapshot.screenshot_path).filter(Snapshot.id == previous_snapshot_id).scalar()
+        screenshot_path = snapshot.screenshot_path
+        db.commit()  # Don't hold a transaction open while decoding
+        
+        manifest = render_snapshot(store, str(snapshot.company_id), snapshot_id, screenshot_path,
+                                   previous_path, previous_snapshot_id)
+        if manifest is None:
+            metrics.RENDITIONS.labels('failed').inc()
+            return {"success": False, "reason": "screenshot could not be decoded"}
+        
+        # Re-read: compaction may have re-encoded the screenshot meanwhile
+        snapshot = db.query(Snapshot).options(*columns).filter(Snapshot.id == snapshot_id).first()
+        if not snapshot:
+            delete_renditions(store, manifest)  # Pruned while rendering
+            return {"success": False, "reason": "snapshot deleted"}
+        metadata = dict(snapshot.snapshot_metadata or {})
+        replaced = metadata.get('renditions')
+        metadata['renditions'] = manifest
+        snapshot.snapshot_metadata = metadata
+        db.commit()
+        # Same names were overwritten in place; only files the new manifest lacks go
+        delete_renditions(store, replaced, keep=set(rendition_names(manifest)))
+        
+        metrics.RENDITIONS.labels('rendered').inc()
+        return {"success": True, "snapshot_id": snapshot_id, "tiles": len(manifest['tiles']),
+                "crops": len(manifest['crops']), "bytes": manifest['bytes']}
+    except Exception as e:
+        db.rollback()
+        self.retry(exc=e, countdown=120)
+    finally:
+        db.close()
@@ -0,0 +1,153 @@
+from collections import defaultdict
+from datetime import datetime, timedelta
+from celery import shared_task
+from redis.exceptions import LockError
+from sqlalchemy import func, or_
+from ..core.config import settings
+from ..core.redis import get_redis
+from ..models.base import SessionLocal
+from ..models.change import Change
+from ..models.company import Company
+from ..models.notification import Notification
+from ..models.user import User
+from ..services.notifier import NotificationDispatcher, build_digest
+from .runtime import run_async
+
+DISPATCH_LOCK = "pivotwatch:notification-dispatch"
+
+@shared_task
+def dispatch_notifications(max_batches: int = 20):
+    """
+    Send digests for analyzed changes at or above each company's alert threshold
+    
+    Changes are selected in batches of NOTIFY_BATCH_SIZE, grouped into one
+    digest per user and delivered concurrently. Delivery results are written
+    back with one bulk insert into `notifications` and bulk updates of
+    `changes` per batch.
+    
+    A change is marked `notified` once every channel has taken it. When one
+    fails, later runs retry only the channels without a `sent` notification,
+    NOTIFY_RETRY_INTERVAL apart (doubling), for at most NOTIFY_MAX_DISPATCHES
+    runs in all.
+    """
+    lock = get_redis().lock(DISPATCH_LOCK, timeout=15 * 60)
+    if not lock.acquire(blocking=False):
+        return {"skipped": True, "reason": "Dispatch already running"}
+    
+    db = SessionLocal()
+    report = {"batches": 0, "changes": 0, "digests": 0, "delivered": 0, "failed": 0}
+    try:
+        for _ in range(max_batches):
+            try:
+                lock.reacquire()  # Restart the timeout for this batch
+            except LockError:
+                report["lock_lost"] = True
+                break
+            
+            now = datetime.utcnow()
+            rows = db.query(
+                Change.id, Change.significance_score, Change.category, Change.summary,
+                Change.region, Change.page_url, Change.detected_at, Change.notify_attempts, Company.name,
+                User.id, User.email, User.notification_settings
+            )\
+                .join(Company, Company.id == Change.company_id)\
+                .join(User, User.id == Company.user_id)\
+                .filter(Change.notified == False,  # noqa: E712
+                        Change.significance_score.isnot(None),
+                        Change.significance_score >= Company.alert_threshold,
+                        func.coalesce(Change.notify_attempts, 0) < settings.NOTIFY_MAX_DISPATCHES,
+                        or_(Change.notify_retry_at.is_(None), Change.notify_retry_at <= now),
+                        User.is_active == True)\
+                .order_by(Change.detected_at)\
+                .limit(settings.NOTIFY_BATCH_SIZE)\
+                .all()
+            if not rows:
+                break
+            
+            # Channels that already took a change on an earlier run
+            sent = defaultdict(set)
+            retried = [row[0] for row in rows if row[7]]
+            if retried:
+                for change_id, channel in db.query(Notification.change_id, Notification.type)\
+                        .filter(Notification.change_id.in_(retried), Notification.status == 'sent'):
+                    sent[change_id].add(channel)
+            
+            # Group into one digest per user (and per set of channels already done)
+            users = {}
+            pending = defaultdict(list)
+            for change_id, score, category, summary, region, page_url, detected_at, attempts, company_name, \
+                    user_id, email, prefs in rows:
+                users[user_id] = {'id': user_id, 'email': email, 'notification_settings': prefs or {}}
+                pending[user_id, frozenset(sent[change_id])].append({
+                    'change_id': change_id,
+                    'id': str(change_id),
+                    'attempts': attempts or 0,
+                    'company_name': company_name,
+                    'significance_score': score,
+                    'category': category or 'other',
+                    'summary': summary or 'Website changes detected',
+                    'region': region,
+                    'page_url': page_url,
+                    'detected_at': detected_at,
+                })
+            
+            batches = [
+                {'user': users[user_id], 'digest': build_digest(users[user_id], changes), 'changes': changes,
+                 'skip': skip}
+                for (user_id, skip), changes in pending.items()
+            ]
+            results = run_async(NotificationDispatcher().deliver_all(batches))
+            
+            now = datetime.utcnow()
+            notification_rows = []
+            done = []
+            retries = defaultdict(list)  # attempts so far -> change ids
+            for batch, channel_errors in zip(batches, results):
+                for channel, error in channel_errors.items():
+                    if error:
+                        report["failed"] += 1
+                    else:
+                        report["delivered"] += 1
+                    for change in batch['changes']:
+                        notification_rows.append({
+                            'user_id': batch['user']['id'],
+                            'change_id': change['change_id'],
+                            'type': channel,
+                            'sent_at': None if error else now,
+                            'status': 'failed' if error else 'sent',
+                            'error_message': error,
+                            'created_at': now,
+                        })
+                if any(channel_errors.values()):
+                    for change in batch['changes']:
+                        retries[change['attempts']].append(change['change_id'])
+                else:
+                    done.extend(change['change_id'] for change in batch['changes'])
+            
+            # Failed channels were already retried with backoff within this run;
+            # later runs try them again
+            db.bulk_insert_mappings(Notification, notification_rows)
+            if done:
+                db.query(Change)\
+                    .filter(Change.id.in_(done))\
+                    .update({Change.notified: True}, synchronize_session=False)
+            for attempts, change_ids in retries.items():
+                db.query(Change)\
+                    .filter(Change.id.in_(change_ids))\
+                    .update({
+                        Change.notify_attempts: attempts + 1,
+                        Change.notify_retry_at: now + timedelta(seconds=settings.NOTIFY_RETRY_INTERVAL * 2 ** attempts)
+                    }, synchronize_session=False)
+            db.commit()
+            
+            report["batches"] += 1
+            report["changes"] += len(rows)
+            report["digests"] += len(batches)
+        
+        return report
+    finally:
+        db.close()
+        try:
+            lock.release()
+        except LockError:
+            pass  # Expired (and possibly taken over) during a long run
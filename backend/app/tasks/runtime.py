@@ -0,0 +1,18 @@
+import asyncio
+import threading
+
+_local = threading.local()
+
+def run_async(coro):
+    """
+    Run a coroutine on the calling worker thread's long-lived event loop
+
+    Reusing one loop per thread (instead of a fresh loop per task) lets pooled
+    async clients such as the shared httpx client survive between tasks.
+    """
+    loop = getattr(_local, "loop", None)
+    if loop is None or loop.is_closed():
+        loop = asyncio.new_event_loop()
+        _local.loop = loop
+    asyncio.set_event_loop(loop)
+    return loop.run_until_complete(coro)
@@ -1,113 +1,679 @@
-import asyncio
+import time
 from celery import shared_task
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, defer
 from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
 from ..models.base import SessionLocal
 from ..models.company import Company
+from ..models.user import User
 from ..models.snapshot import Snapshot
 from ..models.change import Change
+from ..models.crawl_page import CrawlPage
 from ..services.scraper import WebsiteScraper
+from ..core.cache import invalidate_user_cache
+from ..core.config import settings
+from ..core import memory, metrics
+from ..services.storage import BlobStore
+from ..services import crawl_frontier, events, fair_scheduler
+from ..services.events import publish_event
+from ..services.dashboard_stats import record_detected_change
+from ..services.fingerprints import content_fingerprint, find_recent_match, append_history, record_state_check
+from ..services.scan_state import (
+    acquire_scan_lease, holds_scan_lease, release_scan_lease, get_checkpoint, set_checkpoint
+)
 from .analysis_tasks import analyze_change
+from .media_tasks import render_snapshot_images
+from .client import PRIORITY_SCRAPE_QUEUE, dispatch_scan, enqueue_scan
+from .runtime import run_async
+
+# Pipeline: scrape_company (scrape queue) -> extract_snapshot (process queue)
+#           -> diff_snapshot (process queue) -> analyze_change (llm queue)
+#                                               -> render_snapshot_images (media queue)
+# Stages hand each other blob references or row ids, never page content.
+# A scan holds a per-company lease from dispatch until the diff completes, and
+# every stage is keyed by the scan id so redelivered or retried tasks resume
+# from the last completed stage instead of starting over.
+# In multi-page mode a company's crawled subpages (CrawlPage) run through the
+# same pipeline with a `page_id`: each page has its own lease, snapshot chain
+# (Snapshot.page_url) and content history, and its changes are recorded
+# against the company with Change.page_url set.
+
+# Snapshots searched back for a diff baseline past degraded captures
+BASELINE_LOOKBACK = 10
+
+def _retry_or_release(task, exc: Exception, company_id: str, scan_id: str, countdown: int,
+                      page_id: Optional[str] = None):
+    """Retry a stage, giving the lease back once retries are exhausted"""
+    if task.request.retries >= task.max_retries:
+        release_scan_lease(company_id, scan_id, page_id)
+    task.retry(exc=exc, countdown=countdown)
+
+def _same_page(page_url: Optional[str]):
+    """Snapshot filter for one page's chain; the company's own URL has no page_url"""
+    return Snapshot.page_url == page_url if page_url else Snapshot.page_url.is_(None)
+
+def _is_degraded(metadata: Optional[Dict]) -> bool:
+    """Captured under memory pressure: innerText, not parsed HTML, so not comparable with a normal capture"""
+    return bool((metadata or {}).get('memory_degraded'))
+
+def _previous_snapshot(db, new_snapshot: Snapshot) -> Optional[Snapshot]:
+    """The latest earlier snapshot of the same page that wasn't captured degraded"""
+    candidates = db.query(Snapshot.id, Snapshot.snapshot_metadata)\
+        .filter(Snapshot.company_id == new_snapshot.company_id,
+                _same_page(new_snapshot.page_url),
+                Snapshot.timestamp < new_snapshot.timestamp)\
+        .order_by(Snapshot.timestamp.desc())\
+        .limit(BASELINE_LOOKBACK)\
+        .all()
+    for candidate_id, metadata in candidates:
+        if not _is_degraded(metadata):
+            return db.query(Snapshot).options(defer(Snapshot.html_content))\
+                .filter(Snapshot.id == candidate_id).first()
+    return None
+
+def _retry_backoff(failures: int) -> timedelta:
+    """How long a scheduled scan has to complete before the company is due again"""
+    return timedelta(seconds=min(settings.SCAN_RETRY_BACKOFF * 2 ** failures, 86400))
+
+def _reschedule_page(page: CrawlPage, changed: Optional[bool] = None):
+    """Push a subpage's next scan out by its back-off interval (reset when it changed)"""
+    now = datetime.utcnow()
+    if changed:
+        page.unchanged_scans = 0
+        page.last_changed = now
+    elif changed is False:
+        page.unchanged_scans = (page.unchanged_scans or 0) + 1
+    page.next_scan = now + crawl_frontier.next_interval(page.unchanged_scans or 0)
 
 @shared_task(bind=True, max_retries=3)
-def scrape_company(self, company_id: str, url: str):
+def scrape_company(self, company_id: str, url: str, scan_id: Optional[str] = None,
+                   queued_at: Optional[float] = None, plan: Optional[str] = None, lane: Optional[str] = None,
+                   deferrals: int = 0, page_id: Optional[str] = None):
     """
-    Scrape a single company website
+    Scrape stage: render a company website and queue its capture for extraction
+    
+    With `page_id` the page is one of the company's crawled subpages; it is
+    fetched conditionally (ETag / Last-Modified from its last scan) and a
+    304 ends the scan there.
+    
+    Under memory pressure the scan is deferred (up to
+    SCRAPE_MEMORY_MAX_DEFERRALS times, keeping its lease) and then captured
+    in degraded mode rather than risking an OOM kill of the worker.
     """
+    if queued_at is not None and self.request.retries == 0:
+        metrics.SCAN_QUEUE_WAIT_SECONDS.labels(plan or "unknown", lane or "scheduled")\
+            .observe(max(time.time() - queued_at, 0))
+    if scan_id is None:
+        scan_id = acquire_scan_lease(company_id, page_id)
+        if not scan_id:
+            metrics.SCANS_SKIPPED.labels('in_progress').inc()
+            return {"skipped": True, "reason": "Scan already in progress"}
+    elif not holds_scan_lease(company_id, scan_id, page_id):
+        metrics.SCANS_SKIPPED.labels('lease_lost').inc()
+        fair_scheduler.release_slot(scan_id)  # The scan ends here; its plan slot must not wait for expiry
+        return {"skipped": True, "reason": "Lease held by another scan"}
+    
+    pressure = memory.memory_pressure()
+    if pressure >= settings.SCRAPE_MEMORY_HARD_LIMIT and deferrals < settings.SCRAPE_MEMORY_MAX_DEFERRALS:
+        metrics.SCRAPE_SAFEGUARDS.labels('deferred').inc()
+        print(f"⏸️  Memory at {pressure:.0%}, deferring scan of company {company_id}")
+        scrape_company.apply_async(
+            args=[company_id, url],
+            kwargs={"scan_id": scan_id, "plan": plan, "lane": lane, "deferrals": deferrals + 1, "page_id": page_id},
+            countdown=settings.SCRAPE_MEMORY_DEFER_SECONDS,
+            queue=PRIORITY_SCRAPE_QUEUE if lane == fair_scheduler.LANE_MANUAL else None
+        )
+        return {"deferred": True, "company_id": company_id, "memory_pressure": round(pressure, 3)}
+    
+    store = BlobStore()
     db = SessionLocal()
     try:
+        # A previous attempt may already have captured the page
+        capture_ref = get_checkpoint(scan_id).get("capture")
+        if capture_ref and store.exists(capture_ref):
+            extract_snapshot.apply_async(args=[company_id, capture_ref, scan_id], kwargs={"page_id": page_id},
+                                         task_id=f"extract:{scan_id}")
+            return {"success": True, "company_id": company_id, "capture_ref": capture_ref, "resumed": True}
+        
         # Get company
         company = db.query(Company).filter(Company.id == company_id).first()
         if not company:
+            release_scan_lease(company_id, scan_id, page_id)
             return {"error": "Company not found"}
+        page = None
+        validators = None
+        if page_id:
+            page = db.query(CrawlPage).filter(CrawlPage.id == page_id, CrawlPage.company_id == company_id).first()
+            if not page or page.status != "active":
+                release_scan_lease(company_id, scan_id, page_id)
+                metrics.SCANS_SKIPPED.labels('page_inactive').inc()
+                return {"skipped": True, "reason": "Page no longer monitored"}
+            url = page.url
+            validators = {"etag": page.etag, "last_modified": page.last_modified}
+        page_url = page.url if page else None
+        user_id = str(company.user_id)
+        publish_event(user_id, events.SCAN_STARTED, {"company_id": company_id, "scan_id": scan_id, "page_url": page_url})
         
-        # Get previous snapshot
-        previous_snapshot = db.query(Snapshot)\
-            .filter(Snapshot.company_id == company_id)\
+        # Only the render mode state is needed from the previous snapshot
+        previous_metadata = db.query(Snapshot.snapshot_metadata)\
+            .filter(Snapshot.company_id == company_id, _same_page(page_url))\
             .order_by(Snapshot.timestamp.desc())\
-            .first()
+            .limit(1)\
+            .scalar() or {}
+        scrape_config = company.scrape_config
+        db.rollback()  # Release the connection while the browser runs
         
         # Run scraper
         scraper = WebsiteScraper()
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        result = loop.run_until_complete(scraper.scrape(url, company_id))
+        with memory.PeakRss() as rss:
+            capture = run_async(scraper.capture(
+                url, company_id, scrape_config,
+                render_state=previous_metadata.get('render_mode_state'),
+                degraded=pressure >= settings.SCRAPE_MEMORY_SOFT_LIMIT,
+                validators=validators
+            ))
+        metrics.SCRAPE_PEAK_RSS_BYTES.labels('capture').observe(rss.peak)
         
-        if not result['success']:
-            # Update company status
-            company.status = "error"
-            company.last_scanned = datetime.utcnow()
+        if capture.get('not_modified'):
+            # 304: the page is as we last saw it, so there is nothing to extract or diff
+            page.last_scanned = datetime.utcnow()
+            _reschedule_page(page, changed=False)
+            db.commit()
+            release_scan_lease(company_id, scan_id, page_id)
+            metrics.SCANS_SKIPPED.labels('not_modified').inc()
+            publish_event(user_id, events.SCAN_COMPLETED, {
+                "company_id": company_id,
+                "page_url": page_url,
+                "has_changes": False
+            })
+            return {"skipped": True, "reason": "Not modified", "company_id": company_id, "page_url": page_url}
+        
+        if not capture['success']:
+            if page:
+                # A failing subpage backs off and is dropped after CRAWL_MAX_FAILURES; the company stays active
+                page.failures = (page.failures or 0) + 1
+                page.last_scanned = datetime.utcnow()
+                _reschedule_page(page)
+                if page.failures >= settings.CRAWL_MAX_FAILURES:
+                    page.status = "gone"
+            else:
+                # The scheduler already counted the attempt and pushed next_scan out;
+                # the company only goes to error after SCAN_MAX_FAILURES in a row
+                if (company.scan_failures or 0) >= settings.SCAN_MAX_FAILURES:
+                    company.status = "error"
+                company.last_scanned = datetime.utcnow()
             db.commit()
-            return {"error": result['error']}
+            release_scan_lease(company_id, scan_id, page_id)
+            invalidate_user_cache(user_id)
+            publish_event(user_id, events.SCAN_FAILED, {
+                "company_id": company_id,
+                "page_url": page_url,
+                "error": capture['error']
+            })
+            return {"error": capture['error']}
+        
+        capture['metadata']['memory'] = {
+            'capture': rss.summary(),
+            'pressure_at_start': round(pressure, 3),
+        }
+        capture_ref = store.put_json(f"captures/{company_id}", capture)
+        set_checkpoint(scan_id, "capture", capture_ref)
+        extract_snapshot.apply_async(args=[company_id, capture_ref, scan_id], kwargs={"page_id": page_id},
+                                     task_id=f"extract:{scan_id}")
+        
+        return {
+            "success": True,
+            "company_id": company_id,
+            "capture_ref": capture_ref
+        }
+    
+    except Exception as e:
+        _retry_or_release(self, e, company_id, scan_id, countdown=60 * 5, page_id=page_id)  # Retry in 5 minutes
+    finally:
+        db.close()
+
+def _discard_capture(scraper: WebsiteScraper, store: BlobStore, capture_ref: str, capture: Optional[Dict] = None):
+    """Delete a stored capture along with any HTML it spilled to its own blob"""
+    if capture is None:
+        capture = store.get_json(capture_ref) if store.exists(capture_ref) else {}
+    scraper.discard_capture(capture)
+    store.delete(capture_ref)
+
+@shared_task(bind=True, max_retries=3)
+def extract_snapshot(self, company_id: str, capture_ref: str, scan_id: Optional[str] = None,
+                     page_id: Optional[str] = None):
+    """
+    Extract stage: parse a stored capture into a new snapshot
+    """
+    db = SessionLocal()
+    store = BlobStore()
+    scraper = WebsiteScraper()
+    try:
+        # The snapshot may have been committed by an attempt that failed afterwards
+        existing_id = db.query(Snapshot.id).filter(Snapshot.scan_id == scan_id).scalar() if scan_id else None
+        if existing_id:
+            _discard_capture(scraper, store, capture_ref)
+            diff_snapshot.apply_async(args=[str(existing_id), scan_id], kwargs={"page_id": page_id},
+                                      task_id=f"diff:{scan_id}")
+            return {"success": True, "company_id": company_id, "snapshot_id": str(existing_id), "resumed": True}
+        
+        company = db.query(Company).filter(Company.id == company_id).first()
+        page = db.query(CrawlPage).filter(CrawlPage.id == page_id).first() if page_id else None
+        if not company or (page_id and not page):
+            _discard_capture(scraper, store, capture_ref)
+            if scan_id:
+                release_scan_lease(company_id, scan_id, page_id)
+            return {"error": "Page not found" if company else "Company not found"}
+        
+        capture = store.get_json(capture_ref)
+        spilled = {key: capture.get(key) for key in ('raw_html_ref', 'probe_html_ref')}
+        with memory.PeakRss() as rss:
+            result = scraper.finalize(capture)
+            del capture  # finalize dropped its own reference to the raw HTML
+        metrics.SCRAPE_PEAK_RSS_BYTES.labels('extract').observe(rss.peak)
+        result['metadata'].setdefault('memory', {})['extract'] = rss.summary()
         
         # Create new snapshot
         new_snapshot = Snapshot(
             company_id=company_id,
+            page_url=page.url if page else None,
             title=result['title'],
             html_hash=result['html_hash'],
             text_content=result['text_content'],
             html_content=result['html_content'],
             screenshot_path=result['screenshot_path'],
-            metadata=result['metadata']
+            snapshot_metadata=result['metadata'],
+            scan_id=scan_id
         )
         db.add(new_snapshot)
+        validators = result['metadata'].get('validators') or {}
+        del result
+        
+        if page:
+            # Validators for the next conditional fetch; diff settles the back-off
+            page.etag = validators.get('etag')
+            page.last_modified = validators.get('last_modified')
+            page.failures = 0
+            page.last_scanned = datetime.utcnow()
+            _reschedule_page(page)
+        else:
+            # Update company
+            company.status = "active"
+            company.scan_failures = 0
+            company.last_scanned = datetime.utcnow()
+            company.next_scan = datetime.utcnow() + timedelta(days=1)
         db.flush()
+        snapshot_id = str(new_snapshot.id)  # Read before commit expires it; a refresh would reload the page
+        user_id = company.user_id
+        db.commit()
+        invalidate_user_cache(user_id)
         
-        # Compare with previous
-        if previous_snapshot:
-            comparison = scraper.compare_with_previous(result, {
-                'html_hash': previous_snapshot.html_hash,
-                'text_content': previous_snapshot.text_content
-            })
+        _discard_capture(scraper, store, capture_ref, spilled)
+        diff_snapshot.apply_async(
+            args=[snapshot_id, scan_id],
+            kwargs={"page_id": page_id},
+            task_id=f"diff:{scan_id}" if scan_id else None
+        )
+        
+        return {
+            "success": True,
+            "company_id": company_id,
+            "snapshot_id": snapshot_id
+        }
+    
+    except Exception as e:
+        db.rollback()
+        if scan_id:
+            _retry_or_release(self, e, company_id, scan_id, countdown=60, page_id=page_id)
+        else:
+            self.retry(exc=e, countdown=60)
+    finally:
+        db.close()
+
+def _diff_regions(scraper: WebsiteScraper, new_regions: Dict, old_regions: Dict) -> List[Tuple[str, Dict]]:
+    """Diff only the watch regions whose fingerprint moved"""
+    comparisons = []
+    for name, region in new_regions.items():
+        old = old_regions.get(name)
+        if old is None or old.get('hash') == region.get('hash'):
+            continue  # No baseline yet, or unchanged: nothing to diff
+        comparison = scraper.compare_with_previous(
+            {'html_hash': region['hash'], 'text_content': region.get('text', '')},
+            {'html_hash': old.get('hash'), 'text_content': old.get('text', '')},
+            kind='region'
+        )
+        if comparison['has_changes']:
+            comparison['region'] = name
+            comparison['selector'] = region.get('selector')
+            comparisons.append((name, comparison))
+    return comparisons
+
+@shared_task(bind=True, max_retries=3)
+def diff_snapshot(self, snapshot_id: str, scan_id: Optional[str] = None, page_id: Optional[str] = None):
+    """
+    Diff stage: compare a snapshot with its predecessor and record any change
+    """
+    db = SessionLocal()
+    company_id = None
+    state_match = None
+    try:
+        # The diff reads text and hashes only; cleaned HTML (up to SCRAPE_MAX_HTML_BYTES each) stays in the DB
+        new_snapshot = db.query(Snapshot).options(defer(Snapshot.html_content))\
+            .filter(Snapshot.id == snapshot_id).first()
+        if not new_snapshot:
+            return {"error": "Snapshot not found"}
+        company_id = str(new_snapshot.company_id)
+        page_url = new_snapshot.page_url
+        
+        # Get previous snapshot; a degraded one is diffed against nothing
+        degraded = _is_degraded(new_snapshot.snapshot_metadata)
+        previous_snapshot = None if degraded else _previous_snapshot(db, new_snapshot)
+        
+        # A subpage keeps its own content history and back-off on its CrawlPage row
+        page = db.query(CrawlPage).filter(CrawlPage.id == page_id).first() if page_id else None
+        has_changes = False
+        new_change_ids = []
+        existing_change_ids = [cid for (cid,) in db.query(Change.id).filter(Change.new_snapshot_id == new_snapshot.id)]
+        if existing_change_ids:
+            # Already diffed by an earlier attempt; make sure analysis is queued
+            has_changes = True
+            for existing_change_id in existing_change_ids:
+                analyze_change.apply_async(args=[str(existing_change_id)], task_id=f"analyze:{existing_change_id}")
+        elif degraded:
+            # Leave history and baseline alone: the next full capture is diffed
+            # against the last one taken before memory pressure
+            metrics.SCANS_SKIPPED.labels('degraded').inc()
+            if page:
+                _reschedule_page(page)
+                db.commit()
+        elif previous_snapshot:
+            company = db.query(Company).filter(Company.id == new_snapshot.company_id).first()
+            history_owner = page or company
+            fingerprint = content_fingerprint(new_snapshot.text_content, new_snapshot.html_hash, snapshot_id)
+            # Drop our own entry in case an earlier attempt got as far as recording it
+            history = [e for e in (history_owner.content_history or []) if e.get('snapshot_id') != snapshot_id]
+            previous_fingerprint = content_fingerprint(previous_snapshot.text_content, previous_snapshot.html_hash,
+                                                       str(previous_snapshot.id))
+            if not history:
+                history = [previous_fingerprint]
+            
+            # A state seen recently (rotating banner, A/B variant) needs no diff or analysis
+            state_match = None
+            if new_snapshot.html_hash != previous_snapshot.html_hash:
+                state_match = find_recent_match(fingerprint, history, previous_fingerprint)
+                record_state_check(state_match)
             
-            if comparison['has_changes']:
+            comparisons = []  # (region name or None, comparison)
+            new_metadata = new_snapshot.snapshot_metadata or {}
+            previous_metadata = previous_snapshot.snapshot_metadata or {}
+            scraper = WebsiteScraper()
+            if state_match:
+                new_snapshot.snapshot_metadata = {**new_metadata, 'state_match': state_match}
+                metrics.SCANS_SKIPPED.labels('state_match').inc()
+                print(f"🔁 {state_match['kind'].capitalize()} detected for company {company_id}"
+                      f"{f' page {page_url}' if page_url else ''}, skipping analysis")
+            elif 'regions' in new_metadata:
+                comparisons = _diff_regions(scraper, new_metadata['regions'], previous_metadata.get('regions', {}))
+            else:
+                comparison = scraper.compare_with_previous({
+                    'html_hash': new_snapshot.html_hash,
+                    'text_content': new_snapshot.text_content,
+                    'metadata': new_metadata
+                }, {
+                    'html_hash': previous_snapshot.html_hash,
+                    'text_content': previous_snapshot.text_content,
+                    'render_mode': previous_metadata.get('render_mode'),
+                    'parser': previous_metadata.get('parser'),
+                    'extraction': previous_metadata.get('extraction')
+                })
+                if comparison['has_changes']:
+                    comparisons = [(None, comparison)]
+            
+            history_owner.content_history = append_history(history, fingerprint)
+            changes = []
+            for region, comparison in comparisons:
                 # Create change record
                 change = Change(
-                    company_id=company_id,
+                    company_id=new_snapshot.company_id,
                     old_snapshot_id=previous_snapshot.id,
                     new_snapshot_id=new_snapshot.id,
+                    region=region,
+                    page_url=page_url,
                     change_data=comparison,
                     detected_at=datetime.utcnow()
                 )
                 db.add(change)
-                db.flush()
-                
+                changes.append(change)
+                record_detected_change(db, company.user_id, new_snapshot.company_id, change.detected_at)
+            if page:
+                page.content_hash = new_snapshot.html_hash
+                _reschedule_page(page, changed=bool(changes))
+            db.commit()
+            
+            has_changes = bool(changes)
+            if not has_changes and not state_match:
+                metrics.SCANS_SKIPPED.labels('unchanged').inc()
+            new_change_ids = [str(change.id) for change in changes]
+            for change in changes:
                 # Trigger analysis asynchronously
-                analyze_change.delay(str(change.id))
+                analyze_change.apply_async(args=[str(change.id)], task_id=f"analyze:{change.id}")
+        else:
+            # First snapshot seeds the content history
+            history_owner = page or db.query(Company).filter(Company.id == new_snapshot.company_id).first()
+            history_owner.content_history = [
+                content_fingerprint(new_snapshot.text_content, new_snapshot.html_hash, snapshot_id)
+            ]
+            if page:
+                page.content_hash = new_snapshot.html_hash
+            db.commit()
         
-        # Update company
-        company.status = "active"
-        company.last_scanned = datetime.utcnow()
-        company.next_scan = datetime.utcnow() + timedelta(days=1)
-        db.commit()
+        if scan_id:
+            release_scan_lease(company_id, scan_id, page_id)
+        
+        # Screenshot renditions are made after the scan, on the media queue;
+        # a change also gets crops against the snapshot it was detected from
+        if settings.RENDITIONS_ENABLED and new_snapshot.screenshot_path:
+            compared_with = str(previous_snapshot.id) if has_changes and previous_snapshot else None
+            render_snapshot_images.apply_async(args=[snapshot_id, compared_with], task_id=f"render:{snapshot_id}")
+        
+        user_id = db.query(Company.user_id).filter(Company.id == company_id).scalar()
+        if new_change_ids:
+            invalidate_user_cache(user_id)
+        for change_id in new_change_ids:
+            publish_event(user_id, events.CHANGE_DETECTED, {
+                "company_id": company_id,
+                "change_id": change_id,
+                "page_url": page_url
+            })
+        publish_event(user_id, events.SCAN_COMPLETED, {
+            "company_id": company_id,
+            "snapshot_id": snapshot_id,
+            "page_url": page_url,
+            "has_changes": has_changes
+        })
         
         return {
             "success": True,
             "company_id": company_id,
-            "snapshot_id": str(new_snapshot.id),
-            "has_changes": bool(previous_snapshot and comparison['has_changes'])
+            "snapshot_id": snapshot_id,
+            "has_changes": has_changes,
+            "state_match": state_match['kind'] if state_match else None
         }
-        
+    
     except Exception as e:
-        self.retry(exc=e, countdown=60 * 5)  # Retry in 5 minutes
+        db.rollback()
+        if scan_id and company_id:
+            _retry_or_release(self, e, company_id, scan_id, countdown=60, page_id=page_id)
+        else:
+            self.retry(exc=e, countdown=60)
     finally:
         db.close()
 
 @shared_task
 def scrape_all_companies():
     """
-    Queue all active companies for scraping
+    Queue active companies whose next scan is due
+    
+    Runs every SCAN_SCHEDULER_INTERVAL and queues at most
+    SCAN_SCHEDULER_BATCH scans, oldest due first, so staggered `next_scan`
+    values (see bulk import) turn into a steady trickle of work. Scans land
+    in their tenant's fair queue; dispatch_scans decides when they run.
+    
+    A queued scan counts as a failure until it completes, and moves
+    `next_scan` out by a back-off that doubles with each failure in a row,
+    so a company whose scans keep failing (or crashing) isn't re-queued
+    every sweep. After SCAN_MAX_FAILURES it is marked error instead.
+    """
+    db = SessionLocal()
+    try:
+        now = datetime.utcnow()
+        companies = db.query(Company.id, Company.url, Company.user_id, Company.scan_failures, User.plan)\
+            .join(User, User.id == Company.user_id)\
+            .filter(
+                Company.status == "active",
+                Company.next_scan <= now
+            ).order_by(Company.next_scan)\
+            .limit(settings.SCAN_SCHEDULER_BATCH)\
+            .all()
+        
+        queued = errored = 0
+        for company_id, url, user_id, failures, plan in companies:
+            failures = failures or 0
+            if failures >= settings.SCAN_MAX_FAILURES:
+                db.query(Company).filter(Company.id == company_id)\
+                    .update({Company.status: "error"}, synchronize_session=False)
+                errored += 1
+                continue
+            if enqueue_scan(str(company_id), url, user_id=str(user_id), plan=plan):
+                queued += 1
+                db.query(Company).filter(Company.id == company_id).update({
+                    Company.scan_failures: failures + 1,
+                    Company.next_scan: now + _retry_backoff(failures)
+                }, synchronize_session=False)
+        db.commit()
+        
+        return {"queued": queued, "errored": errored, "skipped": len(companies) - queued - errored}
+    finally:
+        db.close()
+
+@shared_task
+def dispatch_scans():
+    """
+    Move scans from the per-tenant fair queues onto the scrape queue
+    
+    Runs every SCAN_DISPATCH_INTERVAL; see fair_scheduler.dispatch for the
+    ordering and quota rules.
+    """
+    dispatched = fair_scheduler.dispatch(dispatch_scan)
+    return {"dispatched": dispatched}
+
+def _multi_page_companies():
+    """Filter for active companies that turned on multi-page mode in scrape_config"""
+    return (Company.status == "active") & Company.scrape_config["multi_page"].as_boolean().is_(True)
+
+@shared_task(bind=True, max_retries=2)
+def discover_pages(self, company_id: str):
+    """
+    Refresh a company's crawl frontier from its sitemaps and internal links
+    
+    Ranks what it finds and keeps the best pages, up to the plan's
+    CRAWL_MAX_PAGES, active; see crawl_frontier.merge_frontier. Turning
+    multi-page mode off excludes every page.
+    """
+    db = SessionLocal()
+    try:
+        row = db.query(Company, User.plan)\
+            .join(User, User.id == Company.user_id)\
+            .filter(Company.id == company_id)\
+            .first()
+        if not row:
+            return {"error": "Company not found"}
+        company, plan = row
+        if not crawl_frontier.multi_page_enabled(company.scrape_config):
+            excluded = db.query(CrawlPage)\
+                .filter(CrawlPage.company_id == company_id, CrawlPage.status == "active")\
+                .update({CrawlPage.status: "excluded"}, synchronize_session=False)
+            db.commit()
+            return {"skipped": True, "reason": "Multi-page mode is off", "excluded": excluded}
+        url, scrape_config = company.url, company.scrape_config
+        max_pages = crawl_frontier.max_pages_for(plan, scrape_config)
+        db.rollback()  # Release the connection while discovery fetches
+        
+        discovered = run_async(crawl_frontier.discover_pages(url, scrape_config, max_pages))
+        company = db.query(Company).filter(Company.id == company_id).first()
+        if not company:
+            return {"error": "Company not found"}
+        report = crawl_frontier.merge_frontier(db, company, discovered, max_pages)
+        db.commit()
+        print(f"🗺️  Crawl frontier for company {company_id}: {report}")
+        return {"success": True, "company_id": company_id, **report}
+    
+    except Exception as e:
+        db.rollback()
+        self.retry(exc=e, countdown=60 * 10)
+    finally:
+        db.close()
+
+@shared_task
+def refresh_crawl_frontiers():
+    """
+    Queue frontier discovery for multi-page companies
+    
+    A company is due once CRAWL_DISCOVERY_INTERVAL_HOURS have passed since
+    its last discovery (or it has never had one).
+    """
+    db = SessionLocal()
+    try:
+        cutoff = datetime.utcnow() - timedelta(hours=settings.CRAWL_DISCOVERY_INTERVAL_HOURS)
+        company_ids = [str(cid) for (cid,) in db.query(Company.id)
+                       .filter(_multi_page_companies(),
+                               (Company.pages_discovered_at.is_(None)) | (Company.pages_discovered_at <= cutoff))
+                       .order_by(Company.pages_discovered_at.asc().nullsfirst())
+                       .limit(settings.CRAWL_SCHEDULER_BATCH)]
+        for company_id in company_ids:
+            discover_pages.delay(company_id)
+        return {"queued": len(company_ids)}
+    finally:
+        db.close()
+
+@shared_task
+def scrape_due_pages():
+    """
+    Queue scans of crawled subpages whose next scan is due
+    
+    Pages go through the same fair queues as company scans, oldest due
+    first and at most CRAWL_SCHEDULER_BATCH per sweep. A page whose sitemap
+    `lastmod` is no newer than its last scan is pushed back instead of
+    scanned, until CRAWL_MAX_INTERVAL_HOURS have passed since that scan
+    (lastmod is advisory and sometimes stale).
     """
     db = SessionLocal()
     try:
-        companies = db.query(Company).filter(
-            Company.status == "active",
-            Company.next_scan <= datetime.utcnow()
-        ).all()
+        now = datetime.utcnow()
+        rows = db.query(CrawlPage, Company.user_id, User.plan)\
+            .join(Company, Company.id == CrawlPage.company_id)\
+            .join(User, User.id == Company.user_id)\
+            .filter(
+                _multi_page_companies(),
+                CrawlPage.status == "active",
+                CrawlPage.next_scan <= now
+            ).order_by(CrawlPage.next_scan)\
+            .limit(settings.CRAWL_SCHEDULER_BATCH)\
+            .all()
         
-        for company in companies:
-            scrape_company.delay(str(company.id), company.url)
+        queued = deferred = 0
+        force_after = now - timedelta(hours=settings.CRAWL_MAX_INTERVAL_HOURS)
+        for page, user_id, plan in rows:
+            if page.sitemap_lastmod and page.last_scanned \
+                    and page.sitemap_lastmod <= page.last_scanned and page.last_scanned > force_after:
+                page.next_scan = now + crawl_frontier.next_interval(page.unchanged_scans or 0)
+                metrics.SCANS_SKIPPED.labels('lastmod_unchanged').inc()
+                deferred += 1
+                continue
+            if enqueue_scan(str(page.company_id), page.url, user_id=str(user_id), plan=plan, page_id=str(page.id)):
+                queued += 1
+        db.commit()
         
-        return {"queued": len(companies)}
+        return {"queued": queued, "lastmod_unchanged": deferred, "skipped": len(rows) - queued - deferred}
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
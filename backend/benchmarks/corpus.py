@@ -0,0 +1,125 @@
+"""
+Benchmark page corpus
+
+Each page has several versions produced by scripted mutations, so the diff
+and analysis stages always see a realistic "before/after" pair. Pages are
+generated deterministically (same bytes on every run); recorded pages can
+be added with `load_recorded`, which reads `<name>.v<N>.html` files.
+"""
+import os
+import random
+import re
+from typing import Callable, Dict, List
+
+PRODUCTS = ["Starter", "Growth", "Scale", "Enterprise", "Platform", "Insights", "Connect", "Shield"]
+WORDS = (
+    "secure fast scalable platform teams workflow automation analytics integration cloud "
+    "compliance dashboard realtime collaboration insight customers pricing plans support "
+    "enterprise reporting api developer onboarding migration performance reliability"
+).split()
+
+# Rows in the catalogue page. compare_with_previous matches characters, so its
+# time grows quadratically with page text; at ~1 MB of text it does not finish.
+HUGE_ROWS = int(os.getenv("BENCH_HUGE_ROWS", "1500"))
+
+def _sentence(rng: random.Random, words: int = 14) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(words)).capitalize() + "."
+
+def _page(title: str, body: str, head: str = "") -> str:
+    return (
+        f"<!DOCTYPE html><html><head><meta charset='utf-8'><title>{title}</title>{head}</head>"
+        f"<body><nav><a href='/'>Home</a> <a href='/pricing'>Pricing</a></nav>{body}"
+        f"<footer>© Example Corp</footer></body></html>"
+    )
+
+def small_page(version: int) -> str:
+    """A small (~2 KB) marketing landing page"""
+    rng = random.Random(1)
+    sections = [f"<section><h2>{p}</h2><p>{_sentence(rng)} {_sentence(rng)}</p></section>" for p in PRODUCTS[:4]]
+    price = 29 if version == 1 else 35
+    sections.append(f"<section id='pricing'><h2>Pricing</h2><p class='price'>Starter ${price}/month</p></section>")
+    if version >= 2:
+        sections.insert(1, "<section><h2>New: SOC 2 Type II</h2><p>We are now SOC 2 Type II certified.</p></section>")
+    return _page("Example Corp", "".join(sections))
+
+def huge_page(version: int) -> str:
+    """A large pricing catalogue (HUGE_ROWS table rows, ~250 KB by default)"""
+    rng = random.Random(2)
+    rows = []
+    for i in range(HUGE_ROWS):
+        price = rng.randint(5, 900)
+        if version >= 2 and i % 97 == 0:
+            price += 10  # A handful of price moves scattered through the table
+        rows.append(
+            f"<tr><td>SKU-{i:05d}</td><td>{rng.choice(PRODUCTS)} {rng.choice(WORDS)}</td>"
+            f"<td>{_sentence(rng, 10)}</td><td>${price}</td></tr>"
+        )
+    if version >= 2:
+        del rows[HUGE_ROWS // 2:HUGE_ROWS // 2 + 20]  # A discontinued block
+    table = "<table><thead><tr><th>SKU</th><th>Name</th><th>Description</th><th>Price</th></tr></thead>" \
+            f"<tbody>{''.join(rows)}</tbody></table>"
+    return _page("Catalogue", f"<h1>Full price list</h1>{table}")
+
+def js_heavy_page(version: int) -> str:
+    """Content rendered client-side, with a burst of DOM mutations after load"""
+    rng = random.Random(3)
+    items = [{"name": p, "blurb": _sentence(rng)} for p in PRODUCTS]
+    if version >= 2:
+        items[2]["blurb"] = "Now with AI-powered forecasting and usage-based pricing."
+        items.append({"name": "Copilot", "blurb": "Our new assistant for every workflow."})
+    data = repr(items).replace("'", '"')
+    script = f"""<script>
+    const items = {data};
+    window.addEventListener('DOMContentLoaded', () => {{
+        const root = document.getElementById('app');
+        items.forEach((item, i) => setTimeout(() => {{
+            const card = document.createElement('div');
+            card.className = 'card';
+            card.innerHTML = '<h3>' + item.name + '</h3><p>' + item.blurb + '</p>';
+            root.appendChild(card);
+        }}, 40 * i));
+        let ticks = 0;
+        const spinner = setInterval(() => {{
+            document.getElementById('status').textContent = 'Loading' + '.'.repeat(ticks % 4);
+            if (++ticks > 15) {{ clearInterval(spinner); document.getElementById('status').textContent = 'Ready'; }}
+        }}, 50);
+    }});
+    </script>"""
+    return _page("Product suite", "<h1>Products</h1><div id='status'></div><div id='app'></div>", head=script)
+
+def slow_page(version: int) -> str:
+    """Ordinary markup behind a slow response and a slow subresource"""
+    rng = random.Random(4)
+    paragraphs = [f"<p>{_sentence(rng)}</p>" for _ in range(30)]
+    if version >= 2:
+        paragraphs[10] = "<p>Leadership update: we welcome our new Chief Executive Officer.</p>"
+    return _page("About us", "<h1>About</h1><img src='/asset/slow.png?delay=800' alt=''>" + "".join(paragraphs))
+
+GENERATED: Dict[str, Callable[[int], str]] = {
+    "small": small_page,
+    "huge": huge_page,
+    "js_heavy": js_heavy_page,
+    "slow": slow_page,
+}
+
+# Server-side latency per page, in milliseconds
+RESPONSE_DELAY_MS = {"slow": 1500}
+
+VERSIONS = 2
+
+def build_corpus(include: List[str] = None) -> Dict[str, Dict[int, str]]:
+    """{page name: {version: html}} for the generated pages"""
+    names = include or list(GENERATED)
+    return {name: {v: GENERATED[name](v) for v in range(1, VERSIONS + 1)} for name in names}
+
+def load_recorded(directory: str) -> Dict[str, Dict[int, str]]:
+    """Recorded pages saved as `<name>.v<N>.html` (at least two versions each)"""
+    pages: Dict[str, Dict[int, str]] = {}
+    pattern = re.compile(r"^(?P<name>[\w-]+)\.v(?P<version>\d+)\.html$")
+    for filename in sorted(os.listdir(directory)):
+        match = pattern.match(filename)
+        if not match:
+            continue
+        with open(os.path.join(directory, filename), encoding="utf-8", errors="replace") as f:
+            pages.setdefault(f"recorded:{match['name']}", {})[int(match["version"])] = f.read()
+    return {name: versions for name, versions in pages.items() if len(versions) >= 2}
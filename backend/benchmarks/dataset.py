@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+"""
+Synthetic large-tenant dataset
+
+Bulk-loads users, companies, snapshots and changes into the configured
+database with COPY, so API behaviour can be measured at production scale
+(thousands of companies per tenant, millions of snapshots). Distributions:
+
+    tenants     a few "large" tenants plus many small ones (Pareto company counts)
+    companies   hourly / daily / weekly scan frequencies, a share in error status
+    snapshots   one per scan over --days of history, capped per company
+    changes     a fraction of consecutive snapshot pairs; most analyzed,
+                scores skewed low, categories weighted like real traffic
+
+Every generated user shares --password and an email under --email-domain,
+and a manifest (tenants, emails, company counts) is written for the load
+test. Re-running with the same --seed produces the same ids, so purge first:
+
+    cd backend
+    python -m benchmarks.dataset --tenants 50 --large-tenants 2 --large-companies 5000
+    python -m benchmarks.dataset --purge
+"""
+import argparse
+import csv
+import io
+import json
+import os
+import random
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List, Sequence
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.models.base import Base, SessionLocal, engine  # noqa: E402
+from app.core.security import get_password_hash  # noqa: E402
+from app.services.dashboard_stats import rebuild_dashboard_stats  # noqa: E402
+from benchmarks.corpus import PRODUCTS, WORDS  # noqa: E402
+
+CATEGORIES = [("pricing", 0.3), ("product", 0.3), ("messaging", 0.2), ("team", 0.1), ("legal", 0.05), ("other", 0.05)]
+INDUSTRIES = ["SaaS", "Fintech", "Healthcare", "Retail", "Security", "Developer tools", "Media"]
+FREQUENCIES = [("hourly", 0.05), ("daily", 0.75), ("weekly", 0.2)]
+SCAN_INTERVALS = {"hourly": timedelta(hours=1), "daily": timedelta(days=1), "weekly": timedelta(weeks=1)}
+
+USER_COLUMNS = ["id", "email", "password_hash", "name", "plan", "is_active", "notification_settings",
+                "created_at", "updated_at"]
+COMPANY_COLUMNS = ["id", "user_id", "name", "url", "industry", "scan_frequency", "alert_threshold", "status",
+                   "scrape_config", "content_history", "last_scanned", "next_scan", "created_at", "updated_at"]
+SNAPSHOT_COLUMNS = ["id", "company_id", "timestamp", "title", "html_hash", "text_content",
+                    "snapshot_metadata", "scan_id", "created_at"]
+CHANGE_COLUMNS = ["id", "company_id", "old_snapshot_id", "new_snapshot_id", "detected_at", "significance_score",
+                  "category", "summary", "analysis", "change_data", "notified", "created_at"]
+
+def _weighted(rng: random.Random, choices: Sequence) -> str:
+    return rng.choices([c for c, _ in choices], weights=[w for _, w in choices])[0]
+
+def _uuid(rng: random.Random) -> uuid.UUID:
+    return uuid.UUID(int=rng.getrandbits(128), version=4)
+
+class Generator:
+    def __init__(self, args):
+        self.args = args
+        self.rng = random.Random(args.seed)
+        self.now = datetime.utcnow().replace(microsecond=0)
+        self.password_hash = get_password_hash(args.password)
+        # A pool of paragraphs; snapshots are assembled from it instead of generating text per row
+        self.paragraphs = [self._sentence(40) for _ in range(400)]
+        self.counts = {"users": 0, "companies": 0, "snapshots": 0, "changes": 0}
+        self.manifest: Dict = {"password": args.password, "seed": args.seed, "tenants": []}
+
+    def _sentence(self, words: int) -> str:
+        return " ".join(self.rng.choice(WORDS) for _ in range(words)).capitalize() + "."
+
+    def _text(self, base: List[int]) -> str:
+        return "\n\n".join(self.paragraphs[i] for i in base)
+
+    def tenant_sizes(self) -> List[int]:
+        """Companies per tenant: the large tenants, then a Pareto tail of small ones"""
+        sizes = [self.args.large_companies] * self.args.large_tenants
+        cap = max(1, self.args.large_companies // 2)
+        for _ in range(self.args.tenants - self.args.large_tenants):
+            sizes.append(min(cap, max(1, int(self.rng.paretovariate(1.2) * 5))))
+        return sizes
+
+    def users(self) -> Iterator[List]:
+        for index, size in enumerate(self.tenant_sizes()):
+            user_id = _uuid(self.rng)
+            email = f"loadtest-{index}@{self.args.email_domain}"
+            plan = "enterprise" if size >= self.args.large_companies else self.rng.choice(["free", "pro"])
+            self.manifest["tenants"].append({"email": email, "plan": plan, "companies": size, "user_id": str(user_id)})
+            self.counts["users"] += 1
+            yield [user_id, email, self.password_hash, f"Load Test {index}", plan, True, "{}",
+                   self.now, self.now]
+
+    def companies(self) -> Iterator[List]:
+        for tenant in self.manifest["tenants"]:
+            for i in range(tenant["companies"]):
+                company_id = _uuid(self.rng)
+                frequency = _weighted(self.rng, FREQUENCIES)
+                status = "error" if self.rng.random() < 0.03 else "active"
+                created = self.now - timedelta(days=self.args.days)
+                last_scanned = self.now - timedelta(minutes=self.rng.randint(1, 60 * 24))
+                name = f"{self.rng.choice(PRODUCTS)} {self.rng.choice(WORDS).capitalize()} {i}"
+                self.counts["companies"] += 1
+                yield [company_id, tenant["user_id"], name, f"https://{company_id.hex[:12]}.example.com",
+                       self.rng.choice(INDUSTRIES), frequency, self.rng.choice([30, 50, 70]), status, "{}", "[]",
+                       last_scanned, last_scanned + SCAN_INTERVALS[frequency], created, created]
+
+    def history(self, company: List) -> Iterator[tuple]:
+        """Snapshot rows for one company, each paired with the change row it triggered (if any)"""
+        company_id, frequency, last_scanned = company[0], company[5], company[10]
+        interval = SCAN_INTERVALS[frequency]
+        scans = min(self.args.max_snapshots, max(1, int(timedelta(days=self.args.days) / interval)))
+        base = self.rng.sample(range(len(self.paragraphs)), self.args.paragraphs)
+        previous_id = None
+        for n in range(scans):
+            at = last_scanned - interval * (scans - 1 - n)
+            changed = previous_id is not None and self.rng.random() < self.args.change_rate
+            if changed:
+                base[self.rng.randrange(len(base))] = self.rng.randrange(len(self.paragraphs))
+            snapshot_id = _uuid(self.rng)
+            text = self._text(base)
+            snapshot = [snapshot_id, company_id, at, company[2], f"{self.rng.getrandbits(256):064x}", text,
+                        '{"render_mode": "http"}', snapshot_id.hex, at]
+            change = None
+            if changed:
+                analyzed = self.rng.random() < 0.95
+                score = min(100, int(self.rng.expovariate(1 / 30))) if analyzed else None
+                category = _weighted(self.rng, CATEGORIES) if analyzed else None
+                change = [_uuid(self.rng), company_id, previous_id, snapshot_id, at, score, category,
+                          self._sentence(12)[:500], self._sentence(80) if analyzed else None,
+                          json.dumps({"change_count": 1, "similarity": round(self.rng.uniform(0.8, 0.99), 3)}),
+                          analyzed, at]
+            previous_id = snapshot_id
+            yield snapshot, change
+
+    def snapshots_and_changes(self, companies: List[List]):
+        """Two row streams fed from one pass over each company's history"""
+        changes: List[List] = []
+        
+        def snapshots():
+            for company in companies:
+                for snapshot, change in self.history(company):
+                    self.counts["snapshots"] += 1
+                    if change:
+                        changes.append(change)
+                    yield snapshot
+        return snapshots(), changes
+
+def copy_rows(conn, table: str, columns: List[str], rows: Iterator[List], batch_rows: int) -> int:
+    """COPY rows into `table` in batches (one buffer per batch keeps memory flat)"""
+    written = 0
+    cursor = conn.cursor()
+    statement = f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)"
+    while True:
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        batch = 0
+        for row in rows:
+            writer.writerow(row)  # None -> empty unquoted field -> NULL
+            batch += 1
+            if batch >= batch_rows:
+                break
+        if not batch:
+            break
+        buffer.seek(0)
+        cursor.copy_expert(statement, buffer)
+        written += batch
+        if batch < batch_rows:
+            break
+    return written
+
+def purge(args):
+    with engine.begin() as conn:
+        result = conn.exec_driver_sql("DELETE FROM users WHERE email LIKE %s", (f"loadtest-%@{args.email_domain}",))
+        print(f"🧹 Removed {result.rowcount} generated tenants (companies, snapshots and changes cascade)")
+
+def generate(args):
+    Base.metadata.create_all(bind=engine)
+    generator = Generator(args)
+    started = time.perf_counter()
+    conn = engine.raw_connection()
+    try:
+        copy_rows(conn, "users", USER_COLUMNS, generator.users(), args.batch_rows)
+        companies = list(generator.companies())
+        copy_rows(conn, "companies", COMPANY_COLUMNS, iter(companies), args.batch_rows)
+        conn.commit()
+        print(f"👥 {generator.counts['users']} tenants, {generator.counts['companies']} companies")
+
+        # Companies are processed in slices so pending change rows stay bounded
+        for start in range(0, len(companies), args.company_slice):
+            snapshots, changes = generator.snapshots_and_changes(companies[start:start + args.company_slice])
+            copy_rows(conn, "snapshots", SNAPSHOT_COLUMNS, snapshots, args.batch_rows)
+            copy_rows(conn, "changes", CHANGE_COLUMNS, iter(changes), args.batch_rows)
+            conn.commit()
+            generator.counts["changes"] += len(changes)
+            print(f"   {min(start + args.company_slice, len(companies))}/{len(companies)} companies, "
+                  f"{generator.counts['snapshots']} snapshots, {generator.counts['changes']} changes")
+
+        cursor = conn.cursor()
+        for table in ("users", "companies", "snapshots", "changes"):
+            cursor.execute(f"ANALYZE {table}")
+        conn.commit()
+    finally:
+        conn.close()
+
+    db = SessionLocal()
+    try:
+        counters = rebuild_dashboard_stats(db)
+        db.commit()
+    finally:
+        db.close()
+
+    elapsed = time.perf_counter() - started
+    total_rows = sum(generator.counts.values())
+    print(f"✅ Loaded {total_rows} rows in {elapsed:.1f}s ({total_rows / elapsed:,.0f} rows/s), "
+          f"{counters} dashboard counters")
+    generator.manifest["counts"] = generator.counts
+    with open(args.manifest, "w") as f:
+        json.dump(generator.manifest, f, indent=2)
+    print(f"Manifest written to {args.manifest}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tenants", type=int, default=50, help="Total tenants (users)")
+    parser.add_argument("--large-tenants", type=int, default=2, help="Tenants with --large-companies companies")
+    parser.add_argument("--large-companies", type=int, default=2000, help="Companies per large tenant")
+    parser.add_argument("--days", type=int, default=90, help="Days of scan history")
+    parser.add_argument("--max-snapshots", type=int, default=120, help="Snapshot cap per company")
+    parser.add_argument("--change-rate", type=float, default=0.15, help="Share of scans that changed")
+    parser.add_argument("--paragraphs", type=int, default=12, help="Paragraphs per snapshot (~270 chars each)")
+    parser.add_argument("--password", default="loadtest-password", help="Password for every generated user")
+    parser.add_argument("--email-domain", default="loadtest.pivotwatch.local")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--batch-rows", type=int, default=20000, help="Rows per COPY statement")
+    parser.add_argument("--company-slice", type=int, default=500, help="Companies generated per commit")
+    parser.add_argument("--manifest", default="loadtest-manifest.json", help="Where to write the tenant manifest")
+    parser.add_argument("--purge", action="store_true", help="Delete previously generated tenants and exit")
+    cli_args = parser.parse_args()
+    if cli_args.large_tenants > cli_args.tenants:
+        parser.error("--large-tenants cannot exceed --tenants")
+    if cli_args.purge:
+        purge(cli_args)
+    else:
+        generate(cli_args)
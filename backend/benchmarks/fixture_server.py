@@ -0,0 +1,84 @@
+"""
+Local HTTP server for the benchmark corpus
+
+Serves `/<page>/v<N>` from an in-memory corpus, with optional per-page
+response delays, plus `/asset/slow.png?delay=<ms>` for slow subresources.
+Runs in a background thread so the benchmark's event loop stays free.
+"""
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional
+from urllib.parse import parse_qs, urlparse
+
+# 1x1 transparent PNG
+PIXEL = bytes.fromhex(
+    "89504e470d0a1a0a0000000d4948445200000001000000010806000000"
+    "1f15c4890000000b49444154789c6360000200000500017a5eab3f0000000049454e44ae426082"
+)
+
+class FixtureServer:
+    def __init__(self, corpus: Dict[str, Dict[int, str]], delays_ms: Optional[Dict[str, int]] = None,
+                 host: str = "127.0.0.1", port: int = 0):
+        self.corpus = corpus
+        self.delays_ms = delays_ms or {}
+        self.requests = 0
+        handler = self._make_handler()
+        self.httpd = ThreadingHTTPServer((host, port), handler)
+        self.httpd.daemon_threads = True
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def url(self, page: str, version: int) -> str:
+        return f"{self.base_url}/{page}/v{version}"
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def _make_handler(self):
+        server = self
+        page_path = re.compile(r"^/(?P<page>[^/]+)/v(?P<version>\d+)$")
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass  # Keep benchmark output clean
+
+            def _send(self, status: int, body: bytes, content_type: str):
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.send_header("Cache-Control", "no-store")
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                server.requests += 1
+                parsed = urlparse(self.path)
+                if parsed.path.startswith("/asset/"):
+                    delay = int(parse_qs(parsed.query).get("delay", ["0"])[0])
+                    time.sleep(delay / 1000)
+                    return self._send(200, PIXEL, "image/png")
+
+                match = page_path.match(parsed.path)
+                # Recorded page names contain a colon; it arrives percent-encoded or raw
+                page = match["page"].replace("%3A", ":") if match else None
+                versions = server.corpus.get(page) if page else None
+                if not versions or int(match["version"]) not in versions:
+                    return self._send(404, b"not found", "text/plain")
+
+                time.sleep(server.delays_ms.get(page, 0) / 1000)
+                self._send(200, versions[int(match["version"])].encode(), "text/html; charset=utf-8")
+
+        return Handler
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Change grouping benchmark
+
+Builds a synthetic set of changes, in which each "event" (a price rise, a
+new compliance badge, ...) is reworded across several competitors, and
+measures with the deterministic HashingEmbedder:
+    
+    embed         changes embedded per second
+    index         VectorIndex add and search latency, exact and LSH
+    recall@10     share of the exact top 10 (above CHANGE_CLUSTER_THRESHOLD)
+                  that the LSH search also returns
+    clustering    leader clustering purity (changes whose cluster is
+                  dominated by their own event) and cluster count vs events
+    
+    cd backend
+    python -m benchmarks.grouping --events 200 --per-event 8 --noise 2000
+"""
+import argparse
+import json
+import random
+import statistics
+import time
+from collections import Counter, defaultdict
+from typing import Dict, List, Tuple
+from app.core.config import settings
+from app.services.embeddings import HashingEmbedder
+from app.services.vector_index import VectorIndex
+
+SUBJECTS = ["pricing", "SOC 2 Type II", "enterprise plan", "free tier", "API rate limits", "SSO",
+            "data residency", "mobile app", "AI assistant", "partner program", "support hours", "uptime SLA"]
+VERBS = ["announced", "launched", "updated", "introduced", "changed", "expanded", "removed", "revised"]
+# Event wording is drawn from a larger vocabulary than the filler every competitor uses
+VOCABULARY = [f"w{i}" for i in range(5000)]
+FILLER = "our the new now for all and with to of your team customers today learn more".split()
+
+def _event(rng: random.Random) -> List[str]:
+    """Core wording shared by every competitor's version of the event"""
+    words = [rng.choice(VERBS), rng.choice(SUBJECTS)] + rng.sample(VOCABULARY, 10)
+    for _ in range(4):
+        words.insert(rng.randrange(len(words)), rng.choice(FILLER))
+    return words
+
+def _variant(rng: random.Random, words: List[str], competitor: int) -> str:
+    """One competitor's wording: the same sentence with a word or two dropped and its own name added"""
+    kept = [w for w in words if rng.random() > 0.1]
+    kept.insert(rng.randrange(len(kept) + 1), f"competitor{competitor}")
+    return " ".join(kept)
+
+def build_dataset(events: int, per_event: int, noise: int, seed: int) -> Tuple[List[str], List[int]]:
+    rng = random.Random(seed)
+    texts, labels = [], []
+    for event_id in range(events):
+        words = _event(rng)
+        for competitor in rng.sample(range(1000), per_event):
+            texts.append(_variant(rng, words, competitor))
+            labels.append(event_id)
+    for _ in range(noise):  # Unrelated one-off changes
+        texts.append(" ".join(_event(rng)))
+        labels.append(-1)
+    order = list(range(len(texts)))
+    rng.shuffle(order)
+    return [texts[i] for i in order], [labels[i] for i in order]
+
+def _ms(samples: List[float]) -> Dict:
+    return {"median_ms": round(statistics.median(samples) * 1000, 3),
+            "p95_ms": round(sorted(samples)[int(len(samples) * 0.95) - 1] * 1000, 3)}
+
+def run(events: int, per_event: int, noise: int, queries: int, seed: int) -> Dict:
+    texts, labels = build_dataset(events, per_event, noise, seed)
+    embedder = HashingEmbedder()
+    
+    started = time.perf_counter()
+    vectors = embedder.embed(texts)
+    embed_seconds = time.perf_counter() - started
+    
+    # Leader clustering in arrival order, as change_grouping.assign_cluster does it
+    index = VectorIndex(embedder.dim)
+    cluster_of: Dict[str, str] = {}
+    add_times, search_times = [], []
+    for i, vector in enumerate(vectors):
+        key = str(i)
+        started = time.perf_counter()
+        neighbors = index.search(vector, k=20, min_score=settings.CHANGE_CLUSTER_THRESHOLD)
+        search_times.append(time.perf_counter() - started)
+        cluster, best = key, None
+        for neighbor_id, _ in neighbors:
+            leader = cluster_of[neighbor_id]
+            score = float(index.vector(leader) @ vector)
+            if score >= settings.CHANGE_CLUSTER_THRESHOLD and (best is None or score > best):
+                cluster, best = leader, score
+        cluster_of[key] = cluster
+        started = time.perf_counter()
+        index.add(key, vector)
+        add_times.append(time.perf_counter() - started)
+    
+    # Recall of the LSH candidates against an exact scan
+    rng = random.Random(seed + 1)
+    sample = rng.sample(range(len(texts)), min(queries, len(texts)))
+    lsh_threshold = settings.CHANGE_LSH_MIN_ROWS
+    exact_times, lsh_times, recalls = [], [], []
+    for i in sample:
+        settings.CHANGE_LSH_MIN_ROWS = 10 ** 9
+        started = time.perf_counter()
+        exact = index.search(vectors[i], k=10, min_score=settings.CHANGE_CLUSTER_THRESHOLD, exclude=str(i))
+        exact_times.append(time.perf_counter() - started)
+        settings.CHANGE_LSH_MIN_ROWS = 0
+        started = time.perf_counter()
+        approx = index.search(vectors[i], k=10, min_score=settings.CHANGE_CLUSTER_THRESHOLD, exclude=str(i))
+        lsh_times.append(time.perf_counter() - started)
+        if exact:
+            recalls.append(len({a for a, _ in approx} & {e for e, _ in exact}) / len(exact))
+    settings.CHANGE_LSH_MIN_ROWS = lsh_threshold
+    
+    # Purity: share of event changes whose cluster's majority event is their own
+    members = defaultdict(list)
+    for key, cluster in cluster_of.items():
+        members[cluster].append(labels[int(key)])
+    pure = 0
+    for key, cluster in cluster_of.items():
+        label = labels[int(key)]
+        if label >= 0 and Counter(members[cluster]).most_common(1)[0][0] == label:
+            pure += 1
+    event_changes = sum(1 for label in labels if label >= 0)
+    event_clusters = sum(1 for labels_in in members.values() if len(labels_in) > 1)
+    
+    return {
+        "changes": len(texts),
+        "embedder": embedder.name,
+        "embed_per_second": round(len(texts) / embed_seconds),
+        "index_add": _ms(add_times),
+        "cluster_search": _ms(search_times),
+        "exact_search": _ms(exact_times),
+        "lsh_search": _ms(lsh_times),
+        "lsh_recall_at_10": round(statistics.mean(recalls), 3) if recalls else None,
+        "purity": round(pure / event_changes, 3) if event_changes else None,
+        "events": events,
+        "multi_member_clusters": event_clusters,
+        "singletons": sum(1 for labels_in in members.values() if len(labels_in) == 1),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--events", type=int, default=200)
+    parser.add_argument("--per-event", type=int, default=8)
+    parser.add_argument("--noise", type=int, default=2000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    print(json.dumps(run(args.events, args.per_event, args.noise, args.queries, args.seed), indent=2))
+
+if __name__ == "__main__":
+    main()
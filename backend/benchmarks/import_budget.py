@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+API cold-start import check
+
+Imports `app.main` in fresh interpreters and fails (exit 1) when
+- any worker-only stack (Playwright, BeautifulSoup, langchain, OpenAI,
+  the task modules) ends up in sys.modules, or
+- the cumulative import time of `app.main` (best of --repeats, from
+  `python -X importtime`) exceeds --budget-ms.
+
+    cd backend
+    python -m benchmarks.import_budget --budget-ms 1500
+
+The same checks run in the test suite (tests/test_import_budget.py,
+marked slow).
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+FORBIDDEN = [
+    "playwright",
+    "bs4",
+    "langchain",
+    "openai",
+    "aiosmtplib",
+    "numpy",
+    "PIL",
+    "app.services.scraper",
+    "app.services.analyzer",
+    "app.services.change_grouping",
+    "app.tasks.scrape_tasks",
+    "app.tasks.analysis_tasks",
+    "app.tasks.export_tasks",
+    "app.tasks.notification_tasks",
+    "app.tasks.maintenance_tasks",
+    "app.tasks.media_tasks",
+]
+
+def _run(args: List[str]) -> subprocess.CompletedProcess:
+    return subprocess.run([sys.executable, *args], cwd=BACKEND_DIR, capture_output=True, text=True)
+
+def loaded_forbidden() -> List[str]:
+    code = (
+        "import json, sys, app.main; "
+        f"print(json.dumps(sorted(m for m in {FORBIDDEN!r} if m in sys.modules)))"
+    )
+    result = _run(["-c", code])
+    if result.returncode != 0:
+        raise SystemExit(f"Importing app.main failed:\n{result.stderr}")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def import_times() -> Tuple[float, Dict[str, float]]:
+    """Cumulative ms for app.main, and cumulative ms per top-level package"""
+    result = _run(["-X", "importtime", "-c", "import app.main"])
+    if result.returncode != 0:
+        raise SystemExit(f"Importing app.main failed:\n{result.stderr}")
+    total = 0.0
+    packages: Dict[str, float] = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        try:
+            _, cumulative, name = [part.strip() for part in line[len("import time:"):].split("|")]
+            cumulative_ms = int(cumulative) / 1000
+        except ValueError:
+            continue  # Header line
+        if name == "app.main":
+            total = cumulative_ms
+        # Top-level entries (no indentation) are the packages app.main pulled in directly or first
+        if not line.split("|")[2].startswith("  "):
+            top = name.split(".")[0]
+            packages[top] = max(packages.get(top, 0.0), cumulative_ms)
+    return total, packages
+
+def main(args) -> int:
+    failed = False
+    forbidden = loaded_forbidden()
+    if forbidden:
+        failed = True
+        print(f"❌ app.main imports worker-only modules: {', '.join(forbidden)}")
+    else:
+        print("✅ No worker-only modules imported by app.main")
+
+    runs = [import_times() for _ in range(args.repeats)]
+    total, packages = min(runs, key=lambda run: run[0])
+    print(f"\napp.main cumulative import: {total:.0f} ms (best of {args.repeats}, budget {args.budget_ms:.0f} ms)")
+    print(f"\n{'package':<28}{'cumulative ms':>14}")
+    for name, ms in sorted(packages.items(), key=lambda item: -item[1])[:args.top]:
+        print(f"{name:<28}{ms:>14.1f}")
+
+    if total > args.budget_ms:
+        failed = True
+        print(f"\n❌ Cold start over budget by {total - args.budget_ms:.0f} ms")
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--budget-ms", type=float, default=float(os.getenv("IMPORT_BUDGET_MS", "1500")))
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--top", type=int, default=15, help="Slowest top-level packages to list")
+    sys.exit(main(parser.parse_args()))
@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+"""
+API load test
+
+Drives the auth, companies, changes and dashboard endpoints of a running API
+at a fixed concurrency, using the tenants from a `benchmarks.dataset`
+manifest, and reports p50/p95/p99 latency per endpoint. Start the API with
+QUERY_STATS_HEADER=true to also get DB statement counts and time per
+endpoint, and with RESPONSE_CACHE_ENABLED=false to measure uncached queries.
+
+    cd backend
+    python -m benchmarks.loadtest --manifest loadtest-manifest.json --concurrency 32 --duration 60
+    python -m benchmarks.loadtest --mix changes=5,dashboard=2 --tenant-filter large --output load.json
+
+Tenants are picked with probability proportional to their company count
+unless --tenant-filter narrows them down.
+"""
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import time
+from collections import defaultdict
+from typing import Callable, Dict, List, Optional
+
+import httpx
+
+DEFAULT_MIX = "changes=4,changes_filtered=2,change_detail=1,companies=2,company_detail=1,dashboard=2,auth=1"
+
+class Tenant:
+    def __init__(self, email: str, companies: int):
+        self.email = email
+        self.companies = companies
+        self.token: Optional[str] = None
+        self.company_ids: List[str] = []
+        self.change_ids: List[str] = []
+
+class Recorder:
+    """Latency, status and DB stats per endpoint"""
+
+    def __init__(self):
+        self.latency: Dict[str, List[float]] = defaultdict(list)
+        self.queries: Dict[str, List[int]] = defaultdict(list)
+        self.db_ms: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+
+    def record(self, endpoint: str, started: float, response: Optional[httpx.Response]):
+        self.latency[endpoint].append((time.perf_counter() - started) * 1000)
+        if response is None or response.status_code >= 400:
+            self.errors[endpoint] += 1
+            return
+        if "x-db-queries" in response.headers:
+            self.queries[endpoint].append(int(response.headers["x-db-queries"]))
+            self.db_ms[endpoint].append(float(response.headers["x-db-time-ms"]))
+
+    def report(self, elapsed: float) -> Dict:
+        endpoints = {}
+        for endpoint, samples in sorted(self.latency.items()):
+            ordered = sorted(samples)
+            row = {
+                "requests": len(ordered),
+                "errors": self.errors[endpoint],
+                "rps": round(len(ordered) / elapsed, 2),
+                "p50_ms": round(_percentile(ordered, 0.50), 2),
+                "p95_ms": round(_percentile(ordered, 0.95), 2),
+                "p99_ms": round(_percentile(ordered, 0.99), 2),
+                "max_ms": round(ordered[-1], 2),
+            }
+            if self.queries[endpoint]:
+                row["db_queries_avg"] = round(statistics.mean(self.queries[endpoint]), 2)
+                row["db_queries_max"] = max(self.queries[endpoint])
+                row["db_ms_p50"] = round(_percentile(sorted(self.db_ms[endpoint]), 0.50), 2)
+            endpoints[endpoint] = row
+        return endpoints
+
+def _percentile(ordered: List[float], q: float) -> float:
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+async def login(client: httpx.AsyncClient, email: str, password: str) -> httpx.Response:
+    return await client.post("/api/auth/token", data={"username": email, "password": password})
+
+async def prepare(client: httpx.AsyncClient, tenants: List[Tenant], password: str):
+    """Log every tenant in and collect ids for the detail endpoints"""
+    for tenant in tenants:
+        response = await login(client, tenant.email, password)
+        response.raise_for_status()
+        tenant.token = response.json()["access_token"]
+        headers = {"Authorization": f"Bearer {tenant.token}"}
+        companies = await client.get("/api/companies", headers=headers)
+        tenant.company_ids = [c["id"] for c in companies.json()][:200] if companies.status_code == 200 else []
+        changes = await client.get("/api/changes", params={"limit": 100}, headers=headers)
+        tenant.change_ids = [c["id"] for c in changes.json()] if changes.status_code == 200 else []
+
+def scenarios(password: str) -> Dict[str, Callable]:
+    """Endpoint name -> coroutine factory(client, tenant, rng)"""
+    def auth_headers(tenant: Tenant) -> Dict[str, str]:
+        return {"Authorization": f"Bearer {tenant.token}"}
+
+    async def changes(client, tenant, rng):
+        # Mostly first pages, with some deep pagination
+        offset = 0 if rng.random() < 0.7 else rng.randrange(0, 2000, 20)
+        return await client.get("/api/changes", params={"limit": 20, "offset": offset}, headers=auth_headers(tenant))
+
+    async def changes_filtered(client, tenant, rng):
+        params = {"limit": 50, "min_significance": rng.choice([40, 70])}
+        if tenant.company_ids and rng.random() < 0.5:
+            params["company_id"] = rng.choice(tenant.company_ids)
+        else:
+            params["category"] = rng.choice(["pricing", "product", "messaging"])
+        return await client.get("/api/changes", params=params, headers=auth_headers(tenant))
+
+    async def change_detail(client, tenant, rng):
+        if not tenant.change_ids:
+            return None
+        return await client.get(f"/api/changes/{rng.choice(tenant.change_ids)}", headers=auth_headers(tenant))
+
+    async def companies(client, tenant, rng):
+        return await client.get("/api/companies", headers=auth_headers(tenant))
+
+    async def company_detail(client, tenant, rng):
+        if not tenant.company_ids:
+            return None
+        return await client.get(f"/api/companies/{rng.choice(tenant.company_ids)}", headers=auth_headers(tenant))
+
+    async def dashboard(client, tenant, rng):
+        return await client.get("/api/dashboard/summary", headers=auth_headers(tenant))
+
+    async def auth(client, tenant, rng):
+        return await login(client, tenant.email, password)
+
+    return {
+        "changes": changes,
+        "changes_filtered": changes_filtered,
+        "change_detail": change_detail,
+        "companies": companies,
+        "company_detail": company_detail,
+        "dashboard": dashboard,
+        "auth": auth,
+    }
+
+def parse_mix(mix: str, available: Dict[str, Callable]) -> Dict[str, float]:
+    weights = {}
+    for part in mix.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in available:
+            raise SystemExit(f"Unknown endpoint '{name}' in --mix (choose from {', '.join(available)})")
+        weights[name] = float(weight or 1)
+    return weights
+
+async def worker(client, tenants, weights, calls, recorder, deadline, remaining, seed):
+    rng = random.Random(seed)
+    names, name_weights = list(weights), list(weights.values())
+    tenant_weights = [t.companies for t in tenants]
+    while time.perf_counter() < deadline:
+        if remaining is not None:
+            if remaining[0] <= 0:
+                return
+            remaining[0] -= 1
+        endpoint = rng.choices(names, weights=name_weights)[0]
+        tenant = rng.choices(tenants, weights=tenant_weights)[0]
+        started = time.perf_counter()
+        try:
+            response = await calls[endpoint](client, tenant, rng)
+        except httpx.HTTPError:
+            recorder.record(endpoint, started, None)
+            continue
+        if response is not None:  # None: nothing to request for this tenant
+            recorder.record(endpoint, started, response)
+
+def print_report(endpoints: Dict):
+    print(f"\n{'endpoint':<18}{'reqs':>7}{'err':>6}{'rps':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+          f"{'queries':>9}{'db p50':>9}")
+    for endpoint, row in endpoints.items():
+        queries = f"{row['db_queries_avg']:.1f}" if "db_queries_avg" in row else "-"
+        db_ms = f"{row['db_ms_p50']:.1f}" if "db_ms_p50" in row else "-"
+        print(f"{endpoint:<18}{row['requests']:>7}{row['errors']:>6}{row['rps']:>8.1f}{row['p50_ms']:>10.1f}"
+              f"{row['p95_ms']:>10.1f}{row['p99_ms']:>10.1f}{queries:>9}{db_ms:>9}")
+
+async def main(args):
+    with open(args.manifest) as f:
+        manifest = json.load(f)
+    password = manifest["password"]
+    tenants = [Tenant(t["email"], t["companies"]) for t in manifest["tenants"]]
+    if args.tenant_filter == "large":
+        cutoff = max(t.companies for t in tenants)
+        tenants = [t for t in tenants if t.companies >= cutoff]
+    elif args.tenant_filter == "small":
+        tenants = [t for t in tenants if t.companies < 100]
+    if args.max_tenants:
+        tenants = sorted(tenants, key=lambda t: -t.companies)[:args.max_tenants]
+    if not tenants:
+        raise SystemExit("No tenants match the filter")
+
+    calls = scenarios(password)
+    weights = parse_mix(args.mix, calls)
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=args.timeout, limits=limits) as client:
+        print(f"🔑 Logging in {len(tenants)} tenants")
+        await prepare(client, tenants, password)
+
+        recorder = Recorder()
+        remaining = [args.requests] if args.requests else None
+        started = time.perf_counter()
+        deadline = started + (args.duration if not args.requests else float("inf"))
+        print(f"🚀 {args.concurrency} workers, "
+              f"{f'{args.requests} requests' if args.requests else f'{args.duration}s'}, mix {weights}")
+        await asyncio.gather(*[
+            worker(client, tenants, weights, calls, recorder, deadline, remaining, args.seed + i)
+            for i in range(args.concurrency)
+        ])
+        elapsed = time.perf_counter() - started
+
+    endpoints = recorder.report(elapsed)
+    print_report(endpoints)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({
+                "base_url": args.base_url,
+                "concurrency": args.concurrency,
+                "elapsed_s": round(elapsed, 2),
+                "tenants": len(tenants),
+                "mix": weights,
+                "endpoints": endpoints,
+            }, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--manifest", default="loadtest-manifest.json", help="Written by benchmarks.dataset")
+    parser.add_argument("--concurrency", type=int, default=16, help="Concurrent in-flight requests")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds to run")
+    parser.add_argument("--requests", type=int, help="Stop after this many requests instead of --duration")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"Endpoint weights (default: {DEFAULT_MIX})")
+    parser.add_argument("--tenant-filter", choices=["all", "large", "small"], default="all")
+    parser.add_argument("--max-tenants", type=int, help="Only use the N largest tenants")
+    parser.add_argument("--timeout", type=float, default=30.0, help="Per-request timeout in seconds")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="Write results JSON here")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+"""
+Scrape pipeline benchmarks
+
+Serves the benchmark corpus from a local fixture server and times each
+pipeline stage per page:
+    
+    render_http   WebsiteScraper._capture_http
+    render        WebsiteScraper._capture_browser (navigation, DOM wait, screenshot)
+    screenshot    full-page screenshot of an already loaded page
+    extraction    WebsiteScraper.extract_content on the rendered HTML
+    hashing       sha256 of the cleaned HTML plus the content fingerprint
+    diff          WebsiteScraper.compare_with_previous (v1 -> v2)
+    diff_lines    differ.diff_texts (v1 -> v2), as used by the diff API
+    analysis      ChangeAnalyzer with a stubbed LLM (prompt building and parsing)
+
+Results are written as JSON. With --baseline, each stage's median is
+compared to the baseline and the run exits 1 if any stage is slower by more
+than --threshold (and by more than --min-delta-ms, to ignore timer noise).
+    
+    cd backend
+    python -m benchmarks.run --repeats 5 --output bench.json
+    python -m benchmarks.run --baseline benchmarks/baseline.json --update-baseline
+    python -m benchmarks.run --baseline benchmarks/baseline.json
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from types import SimpleNamespace
+from typing import Awaitable, Callable, Dict, List, Optional
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.scraper import WebsiteScraper  # noqa: E402
+from app.services.fingerprints import content_fingerprint  # noqa: E402
+from app.services.differ import diff_texts  # noqa: E402
+from benchmarks.corpus import RESPONSE_DELAY_MS, build_corpus, load_recorded  # noqa: E402
+from benchmarks.fixture_server import FixtureServer  # noqa: E402
+
+STUB_ANALYSIS = """```json
+{"score": 72, "category": "pricing", "justification": "Benchmark stub",
+ "recommended_action": "None", "summary": "Stubbed analysis"}
+```"""
+
+class StubLLM:
+    """Stands in for ChatOpenAI so analysis timings exclude the network"""
+    
+    def __init__(self, latency_ms: float = 0.0):
+        self.latency = latency_ms / 1000
+    
+    async def agenerate(self, messages):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return SimpleNamespace(generations=[[SimpleNamespace(text=STUB_ANALYSIS)]])
+
+def _summary(samples: List[float]) -> Dict:
+    ordered = sorted(samples)
+    return {
+        "runs": len(ordered),
+        "median_ms": round(statistics.median(ordered), 3),
+        "p95_ms": round(ordered[min(len(ordered) - 1, int(round(0.95 * (len(ordered) - 1))))], 3),
+        "min_ms": round(ordered[0], 3),
+    }
+
+def time_sync(fn: Callable, repeats: int) -> Dict:
+    samples = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return _summary(samples)
+
+async def time_async(fn: Callable[[], Awaitable], repeats: int) -> Dict:
+    samples = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        await fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return _summary(samples)
+
+def _capture_html(scraper: WebsiteScraper, capture: Dict) -> str:
+    """A capture's raw HTML, reading the spilled copy of large pages; removes the spill"""
+    html = capture.get('raw_html')
+    if html is None and capture.get('raw_html_ref'):
+        html = scraper._read_spilled(capture['raw_html_ref'])
+    scraper.discard_capture(capture)
+    return html or ''
+
+async def _discarded(scraper: WebsiteScraper, capture: Awaitable) -> Dict:
+    result = await capture
+    scraper.discard_capture(result)
+    return result
+
+async def _screenshot_timings(url: str, path: str, repeats: int) -> Dict:
+    from playwright.async_api import async_playwright
+    async with async_playwright() as p:
+        browser = await p.chromium.launch(headless=True)
+        try:
+            page = await browser.new_page(viewport={'width': 1920, 'height': 1080})
+            await page.goto(url, wait_until='load', timeout=60000)
+            return await time_async(lambda: page.screenshot(path=path, full_page=True), repeats)
+        finally:
+            await browser.close()
+
+async def bench_page(server: FixtureServer, name: str, args, workdir: str) -> Dict:
+    scraper = WebsiteScraper()
+    scraper.screenshot_dir = workdir
+    analyzer = _stub_analyzer(args.llm_latency_ms)
+    url_v1, url_v2 = server.url(name, 1), server.url(name, 2)
+    stages: Dict[str, Dict] = {}
+    
+    async def stage(label: str, coro_factory):
+        try:
+            stages[label] = await coro_factory()
+        except Exception as e:
+            stages[label] = {"error": f"{type(e).__name__}: {e}"}
+            print(f"   ⚠️  {label}: {stages[label]['error']}")
+    
+    # Raw HTML of both versions; the browser render wins when available (JS-built content)
+    raw = {}
+    for version, url in ((1, url_v1), (2, url_v2)):
+        raw[version] = _capture_html(scraper, await scraper._capture_http(url))
+    
+    await stage("render_http", lambda: time_async(
+        lambda: _discarded(scraper, scraper._capture_http(url_v1)), args.repeats
+    ))
+    if not args.skip_browser:
+        opts = scraper._resolve_options({'in_page_extraction': False})
+        await stage("render", lambda: time_async(
+            lambda: _discarded(scraper, scraper._capture_browser(url_v1, "bench", opts)), args.browser_repeats
+        ))
+        for version, url in ((1, url_v1), (2, url_v2)):
+            capture = await scraper._capture_browser(url, "bench", opts)
+            if capture.get('success'):
+                raw[version] = _capture_html(scraper, capture)
+        await stage("screenshot", lambda: _screenshot_timings(
+            url_v1, os.path.join(workdir, "screenshot.png"), args.browser_repeats
+        ))
+    
+    cleaned_v1, text_v1, _ = scraper.extract_content(raw[1])
+    cleaned_v2, text_v2, _ = scraper.extract_content(raw[2])
+    hash_v1 = hashlib.sha256(cleaned_v1.encode()).hexdigest()
+    hash_v2 = hashlib.sha256(cleaned_v2.encode()).hexdigest()
+    
+    async def sync_stage(fn, repeats=args.repeats):
+        return time_sync(fn, repeats)
+    
+    await stage("extraction", lambda: sync_stage(lambda: scraper.extract_content(raw[1])))
+    await stage("hashing", lambda: sync_stage(lambda: content_fingerprint(
+        text_v1, hashlib.sha256(cleaned_v1.encode()).hexdigest(), "bench"
+    )))
+    current = {'html_hash': hash_v2, 'text_content': text_v2, 'metadata': {}}
+    previous = {'html_hash': hash_v1, 'text_content': text_v1}
+    comparison = scraper.compare_with_previous(current, previous)
+    await stage("diff", lambda: sync_stage(lambda: scraper.compare_with_previous(current, previous)))
+    await stage("diff_lines", lambda: sync_stage(lambda: diff_texts(text_v1, text_v2)))
+    await stage("analysis", lambda: time_async(lambda: analyzer.analyze_significance(
+        company_name=name, old_content=text_v1, new_content=text_v2,
+        detected_changes=comparison.get('changes', [])
+    ), args.repeats))
+    
+    return {
+        "html_bytes": len(raw[1]),
+        "text_chars": len(text_v1),
+        "changes_detected": comparison.get('change_count', 0),
+        "stages": stages,
+    }
+
+def _stub_analyzer(latency_ms: float):
+    from app.services.analyzer import ChangeAnalyzer
+    analyzer = ChangeAnalyzer.__new__(ChangeAnalyzer)  # Skip building the real client
+    analyzer.llm = StubLLM(latency_ms)
+    return analyzer
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL,
+                                       text=True).strip()
+    except Exception:
+        return None
+
+def compare(results: Dict, baseline: Dict, threshold: float, min_delta_ms: float) -> List[Dict]:
+    """Stages whose median regressed beyond the threshold"""
+    regressions = []
+    for page, page_result in results["pages"].items():
+        base_page = baseline.get("pages", {}).get(page, {}).get("stages", {})
+        for stage, timing in page_result["stages"].items():
+            base = base_page.get(stage)
+            if not base or "median_ms" not in base or "median_ms" not in timing:
+                continue
+            current, previous = timing["median_ms"], base["median_ms"]
+            if current > previous * (1 + threshold) and current - previous > min_delta_ms:
+                regressions.append({
+                    "page": page,
+                    "stage": stage,
+                    "baseline_ms": previous,
+                    "current_ms": current,
+                    "change": round(current / previous - 1, 3) if previous else None,
+                })
+    return regressions
+
+def print_table(results: Dict):
+    print(f"\n{'page':<22}{'stage':<14}{'median ms':>12}{'p95 ms':>12}{'runs':>6}")
+    for page, page_result in results["pages"].items():
+        for stage, timing in page_result["stages"].items():
+            if "error" in timing:
+                print(f"{page:<22}{stage:<14}{'error':>12}")
+                continue
+            print(f"{page:<22}{stage:<14}{timing['median_ms']:>12.2f}{timing['p95_ms']:>12.2f}{timing['runs']:>6}")
+
+async def main(args) -> int:
+    corpus = build_corpus(args.pages.split(",") if args.pages else None)
+    if args.corpus_dir:
+        corpus.update(load_recorded(args.corpus_dir))
+    
+    results = {
+        "meta": {
+            "timestamp": datetime.utcnow().isoformat(),
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "repeats": args.repeats,
+            "browser_repeats": 0 if args.skip_browser else args.browser_repeats,
+        },
+        "pages": {},
+    }
+    with FixtureServer(corpus, RESPONSE_DELAY_MS) as server, tempfile.TemporaryDirectory() as workdir:
+        for name in corpus:
+            print(f"⏱️  {name}")
+            results["pages"][name] = await bench_page(server, name, args, workdir)
+    print_table(results)
+    
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to {args.output}")
+    
+    if not args.baseline:
+        return 0
+    if args.update_baseline or not os.path.exists(args.baseline):
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Baseline saved to {args.baseline}")
+        return 0
+    
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    regressions = compare(results, baseline, args.threshold, args.min_delta_ms)
+    if not regressions:
+        print(f"✅ No stage regressed by more than {args.threshold:.0%} against {args.baseline}")
+        return 0
+    print(f"❌ {len(regressions)} regression(s) against {args.baseline}:")
+    for r in regressions:
+        print(f"   {r['page']} / {r['stage']}: {r['baseline_ms']:.2f} -> {r['current_ms']:.2f} ms "
+              f"(+{r['change']:.0%})")
+    return 1
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeats", type=int, default=5, help="Runs per CPU/HTTP stage")
+    parser.add_argument("--browser-repeats", type=int, default=3, help="Runs per browser stage")
+    parser.add_argument("--pages", help="Comma-separated generated pages (default: all)")
+    parser.add_argument("--corpus-dir", help="Directory of recorded <name>.v<N>.html pages to include")
+    parser.add_argument("--skip-browser", action="store_true", help="Skip stages that need Chromium")
+    parser.add_argument("--llm-latency-ms", type=float, default=0.0, help="Simulated LLM latency")
+    parser.add_argument("--output", help="Write results JSON here")
+    parser.add_argument("--baseline", help="Baseline JSON to compare against (created if missing)")
+    parser.add_argument("--update-baseline", action="store_true", help="Overwrite the baseline with this run")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Allowed slowdown per stage (0.2 = 20%%)")
+    parser.add_argument("--min-delta-ms", type=float, default=2.0, help="Ignore slowdowns smaller than this")
+    sys.exit(asyncio.run(main(parser.parse_args())))
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Local stand-in servers for notification delivery
+
+Runs a minimal SMTP sink and an HTTP sink (Slack / generic webhooks) that
+print what they receive. Point the app at them with:
+
+    SMTP_HOST=localhost SMTP_PORT=1025
+    notification_settings = {"slack_webhook_url": "http://localhost:8025/slack",
+                             "webhook_url": "http://localhost:8025/webhook"}
+
+Use --fail-rate to make a fraction of requests fail and exercise retries.
+"""
+import argparse
+import asyncio
+import json
+import random
+
+stats = {"emails": 0, "http": 0, "rejected": 0}
+
+async def handle_smtp(reader: asyncio.StreamReader, writer: asyncio.StreamWriter, fail_rate: float):
+    """Speak just enough SMTP for aiosmtplib to deliver a message"""
+    async def reply(line: str):
+        writer.write((line + "\r\n").encode())
+        await writer.drain()
+
+    await reply("220 pivotwatch-sandbox ESMTP")
+    recipients = []
+    try:
+        while True:
+            line = (await reader.readline()).decode(errors="replace").rstrip("\r\n")
+            if not line:
+                break
+            command = line.split(" ", 1)[0].upper()
+            if command in ("EHLO", "HELO"):
+                await reply("250-pivotwatch-sandbox")
+                await reply("250 8BITMIME")
+            elif command == "MAIL":
+                recipients = []
+                await reply("250 OK")
+            elif command == "RCPT":
+                recipients.append(line.split(":", 1)[1].strip())
+                await reply("250 OK")
+            elif command == "DATA":
+                await reply("354 End data with <CR><LF>.<CR><LF>")
+                body = []
+                while True:
+                    data_line = (await reader.readline()).decode(errors="replace")
+                    if data_line in (".\r\n", ".\n", ""):
+                        break
+                    body.append(data_line)
+                if random.random() < fail_rate:
+                    stats["rejected"] += 1
+                    await reply("451 Sandbox: simulated temporary failure")
+                    continue
+                stats["emails"] += 1
+                subject = next((l for l in body if l.lower().startswith("subject:")), "Subject: ?").strip()
+                print(f"📧 [{stats['emails']}] to {', '.join(recipients)} | {subject}")
+                await reply("250 OK: queued")
+            elif command == "RSET":
+                recipients = []
+                await reply("250 OK")
+            elif command == "NOOP":
+                await reply("250 OK")
+            elif command == "QUIT":
+                await reply("221 Bye")
+                break
+            else:
+                await reply("502 Command not implemented")
+    finally:
+        writer.close()
+
+async def handle_http(reader: asyncio.StreamReader, writer: asyncio.StreamWriter, fail_rate: float):
+    """Accept POSTed JSON on any path (keep-alive aware)"""
+    try:
+        while True:
+            request_line = await reader.readline()
+            if not request_line:
+                break
+            method, path, _ = request_line.decode().split(" ", 2)
+            headers = {}
+            while True:
+                header = (await reader.readline()).decode().rstrip("\r\n")
+                if not header:
+                    break
+                name, value = header.split(":", 1)
+                headers[name.strip().lower()] = value.strip()
+            body = await reader.readexactly(int(headers.get("content-length", 0)))
+
+            if random.random() < fail_rate:
+                stats["rejected"] += 1
+                status, payload = "503 Service Unavailable", b'{"ok": false}'
+            else:
+                stats["http"] += 1
+                try:
+                    summary = json.loads(body).get("text") or json.loads(body).get("event")
+                except ValueError:
+                    summary = f"{len(body)} bytes"
+                print(f"🔔 [{stats['http']}] {method} {path} | {summary}")
+                status, payload = "200 OK", b'{"ok": true}'
+
+            writer.write(
+                f"HTTP/1.1 {status}\r\nContent-Type: application/json\r\n"
+                f"Content-Length: {len(payload)}\r\n\r\n".encode() + payload
+            )
+            await writer.drain()
+            if headers.get("connection", "").lower() == "close":
+                break
+    except (asyncio.IncompleteReadError, ConnectionResetError, ValueError):
+        pass
+    finally:
+        writer.close()
+
+async def main(smtp_port: int, http_port: int, fail_rate: float):
+    smtp = await asyncio.start_server(lambda r, w: handle_smtp(r, w, fail_rate), "0.0.0.0", smtp_port)
+    http = await asyncio.start_server(lambda r, w: handle_http(r, w, fail_rate), "0.0.0.0", http_port)
+    print(f"SMTP sink on :{smtp_port}, webhook sink on :{http_port} (fail rate {fail_rate:.0%})")
+    async with smtp, http:
+        await asyncio.gather(smtp.serve_forever(), http.serve_forever())
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--smtp-port", type=int, default=1025)
+    parser.add_argument("--http-port", type=int, default=8025)
+    parser.add_argument("--fail-rate", type=float, default=0.0)
+    args = parser.parse_args()
+    try:
+        asyncio.run(main(args.smtp_port, args.http_port, args.fail_rate))
+    except KeyboardInterrupt:
+        print(f"\nReceived: {stats}")
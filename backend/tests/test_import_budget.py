@@ -0,0 +1,19 @@
+import os
+import pytest
+from benchmarks import import_budget
+
+# The API cold-start budget from benchmarks/import_budget.py, enforced in the
+# suite; each check imports app.main in fresh interpreters
+pytestmark = pytest.mark.slow
+
+# Importing app.main needs the API stack installed
+pytest.importorskip("fastapi")
+pytest.importorskip("psycopg2")
+
+def test_api_imports_no_worker_modules():
+    assert import_budget.loaded_forbidden() == []
+
+def test_api_cold_start_within_budget():
+    budget_ms = float(os.getenv("IMPORT_BUDGET_MS", "1500"))
+    total = min(import_budget.import_times()[0] for _ in range(3))
+    assert total <= budget_ms, f"app.main imports in {total:.0f} ms, over the {budget_ms:.0f} ms budget"
@@ -0,0 +1,37 @@
+import { useEffect } from 'react';
+import { useQueryClient } from 'react-query';
+import { API_BASE_URL } from '../services/api';
+
+// Which cached queries each server event makes stale
+const INVALIDATIONS: Record<string, string[]> = {
+  'scan.started': ['companies', 'dashboard-summary'],
+  'scan.completed': ['companies', 'dashboard-summary'],
+  'scan.failed': ['companies', 'dashboard-summary'],
+  'change.detected': ['recent-changes', 'changes', 'dashboard-summary'],
+  'change.analyzed': ['recent-changes', 'changes', 'dashboard-summary'],
+};
+
+// Subscribe to the server-sent event stream and refetch only what an event touches.
+// EventSource reconnects on its own and resends Last-Event-ID, so nothing is missed.
+export const useLiveEvents = () => {
+  const queryClient = useQueryClient();
+
+  useEffect(() => {
+    const token = localStorage.getItem('access_token');
+    if (!token) return;
+
+    const source = new EventSource(
+      `${API_BASE_URL}/events/stream?access_token=${encodeURIComponent(token)}`
+    );
+    const listeners = Object.entries(INVALIDATIONS).map(([type, keys]) => {
+      const listener = () => keys.forEach((key) => queryClient.invalidateQueries(key));
+      source.addEventListener(type, listener);
+      return [type, listener] as const;
+    });
+
+    return () => {
+      listeners.forEach(([type, listener]) => source.removeEventListener(type, listener));
+      source.close();
+    };
+  }, [queryClient]);
+};
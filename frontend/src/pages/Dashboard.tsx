@@ -1,7 +1,8 @@
 import React from 'react';
 import { useQuery } from 'react-query';
-import { companies, changes, users as usersApi } from '../services/api';
+import { changes, dashboard, users as usersApi } from '../services/api';
 import { motion } from 'framer-motion';
+import { useLiveEvents } from '../hooks/useLiveEvents';
 import {
   ChartBarIcon,
   BuildingOfficeIcon,
@@ -10,34 +11,38 @@ import {
 } from '@heroicons/react/24/outline';
 
 const Dashboard: React.FC = () => {
-  const { data: companiesData } = useQuery('companies', () => companies.list());
+  // Data only goes stale when the event stream says so
+  useLiveEvents();
+  const { data: summary } = useQuery('dashboard-summary', () => dashboard.summary(), {
+    staleTime: Infinity,
+  });
   const { data: changesData } = useQuery('recent-changes', () => 
-    changes.list({ limit: 10 })
+    changes.list({ limit: 10 }), { staleTime: Infinity }
   );
   const { data: userStats } = useQuery('user-stats', () => usersApi.stats());
 
   const stats = [
     {
       name: 'Tracked Companies',
-      value: companiesData?.length || 0,
+      value: summary?.tracked_companies || 0,
       icon: BuildingOfficeIcon,
       color: 'bg-blue-500',
     },
     {
-      name: 'Recent Changes',
-      value: changesData?.length || 0,
+      name: 'Changes (7 days)',
+      value: summary?.changes_by_window?.last_7d || 0,
       icon: ArrowPathIcon,
       color: 'bg-green-500',
     },
     {
       name: 'High Significance',
-      value: changesData?.filter((c: any) => c.significance_score >= 70).length || 0,
+      value: summary?.by_band?.high || 0,
       icon: ExclamationTriangleIcon,
       color: 'bg-yellow-500',
     },
     {
       name: 'Categories',
-      value: new Set(changesData?.map((c: any) => c.category)).size || 0,
+      value: Object.keys(summary?.by_category || {}).filter((c) => c !== 'pending').length,
       icon: ChartBarIcon,
       color: 'bg-purple-500',
     },
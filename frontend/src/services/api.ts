@@ -1,6 +1,6 @@
 import axios from 'axios';
 
-const API_BASE_URL = process.env.REACT_APP_API_URL || 'http://localhost:8000/api';
+export const API_BASE_URL = process.env.REACT_APP_API_URL || 'http://localhost:8000/api';
 
 const api = axios.create({
   baseURL: API_BASE_URL,
@@ -79,6 +79,15 @@ export const companies = {
     const response = await api.post(`/companies/${id}/scan`);
     return response.data;
   },
+  
+  import: async (file: File) => {
+    const formData = new FormData();
+    formData.append('file', file);
+    const response = await api.post('/companies/import', formData, {
+      headers: { 'Content-Type': 'multipart/form-data' },
+    });
+    return response.data;
+  },
 };
 
 // Changes endpoints
@@ -94,6 +103,27 @@ export const changes = {
   },
 };
 
+// Snapshot endpoints
+export const snapshots = {
+  // Image URLs in the listing are signed, so they load as <img src> without the auth header
+  images: async (id: string) => {
+    const response = await api.get(`/snapshots/${id}/images`);
+    return response.data;
+  },
+};
+
+// Image URLs are server paths (/api/...); resolve them against the API host
+export const imageSrc = (path: string) =>
+  new URL(path, new URL(API_BASE_URL, window.location.origin)).toString();
+
+// Dashboard endpoints
+export const dashboard = {
+  summary: async () => {
+    const response = await api.get('/dashboard/summary');
+    return response.data;
+  },
+};
+
 // Users endpoints
 export const users = {
   stats: async () => {